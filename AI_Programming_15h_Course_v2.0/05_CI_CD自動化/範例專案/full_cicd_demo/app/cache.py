@@ -0,0 +1,289 @@
+"""
+讀取端點的回應快取
+
+- 預設使用行程內的 TTL + LRU 快取；設定 redis_url 時改用 Redis（多個 worker 共用）
+- 以 ASGI 中介層實作：快取命中時直接回傳已序列化的回應，不經過路由與 Pydantic
+- 快取鍵包含路徑與排序後的查詢參數；每個快取項目帶有標籤（tag），
+  寫入端點依標籤失效相關的快取
+"""
+import json
+import re
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from .conditional import etag_matches, not_modified_since
+from .config import get_settings, settings_provider
+
+
+class MemoryCache:
+    """
+    行程內 TTL + LRU 快取
+
+    除了 tag -> 快取鍵，也記錄快取鍵 -> tag，項目被淘汰或過期時一併移出標籤集合，
+    標籤集合的大小因此不會超過 max_entries
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Tuple[str, ...]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()) -> None:
+        self._discard(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._key_tags[key] = tags = tuple(tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries:
+            self._discard(next(iter(self._data)))
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._discard(key)
+
+    async def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+
+    def _discard(self, key: str) -> None:
+        """移除快取項目，並從它所屬的標籤集合中移除"""
+        self._data.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """
+    Redis 快取
+
+    標籤以 Redis SET 記錄所屬的快取鍵，失效時一次刪除
+    """
+
+    def __init__(self, client, prefix: str = "cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - 依安裝環境而定
+            raise RuntimeError("使用 Redis 快取需要安裝 redis 套件") from exc
+        return cls(redis_asyncio.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str] = ()) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, value, ex=ttl)
+            for tag in tags:
+                tag_key = f"{self.prefix}tag:{tag}"
+                pipe.sadd(tag_key, self.prefix + key)
+                pipe.expire(tag_key, ttl)
+            await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = await self.client.smembers(tag_key)
+            await self.client.delete(tag_key, *keys)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class ResponseCache:
+    """快取前端：處理回應序列化、TTL 與命中統計"""
+
+    def __init__(self, backend, ttl: int = 30):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(method: str, path: str, query_string: bytes) -> str:
+        """快取鍵：方法 + 路徑 + 排序後的查詢參數（參數順序不同仍共用快取）"""
+        query = urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+        return f"{method}:{path}?{query}"
+
+    async def get(self, key: str) -> Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes]]:
+        raw = await self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        meta, body = raw.split(b"\n", 1)
+        status, headers = json.loads(meta)
+        return status, [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers], body
+
+    async def set(
+        self,
+        key: str,
+        status: int,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        tags: Iterable[str],
+    ) -> None:
+        text_headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in headers]
+        meta = json.dumps([status, text_headers])
+        await self.backend.set(key, meta.encode() + b"\n" + body, self.ttl, tags)
+
+    async def invalidate(self, *tags: str) -> None:
+        await self.backend.invalidate(tags)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.__class__.__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+@lru_cache()
+def get_cache() -> ResponseCache:
+    """獲取快取（單例）：有設定 redis_url 時使用 Redis"""
+    settings = get_settings()
+    if settings.redis_url:
+        backend = RedisCache.from_url(settings.redis_url)
+    else:
+        backend = MemoryCache(max_entries=settings.cache_max_entries)
+    return ResponseCache(backend, ttl=settings.cache_ttl)
+
+
+settings_provider.reset_on_change(get_cache, {"redis_url", "cache_max_entries", "cache_ttl"})
+
+
+# 可快取的路徑與其標籤；寫入端點以相同標籤失效
+CacheRule = Tuple[Pattern[str], Callable[[re.Match], List[str]]]
+
+CACHE_RULES: List[CacheRule] = [
+    (re.compile(r"^/$"), lambda m: ["root"]),
+    (re.compile(r"^/api/items$"), lambda m: ["items", "items:list"]),
+    (re.compile(r"^/api/items/search$"), lambda m: ["items", "items:list"]),
+    (re.compile(r"^/api/items/(?P<item_id>\d+)$"), lambda m: ["items", f"items:{m['item_id']}"]),
+]
+
+# 不快取的回應標頭（每次回應都不同或與使用者相關）
+_SKIP_HEADERS = {b"set-cookie", b"date", b"server"}
+
+# 304 回應保留的驗證標頭
+_VALIDATOR_HEADERS = {b"etag", b"last-modified"}
+
+
+def _not_modified(scope, cached_headers: List[Tuple[bytes, bytes]]) -> bool:
+    """快取命中時也處理條件式請求，符合就回 304"""
+    request_headers = dict(scope["headers"])
+    stored = dict(cached_headers)
+
+    if_none_match = request_headers.get(b"if-none-match")
+    if if_none_match is not None:
+        etag = stored.get(b"etag")
+        return etag is not None and etag_matches(
+            if_none_match.decode("latin-1"), etag.decode("latin-1")
+        )
+
+    if_modified_since = request_headers.get(b"if-modified-since")
+    last_modified = stored.get(b"last-modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    last_modified_at = parsedate_to_datetime(last_modified.decode("latin-1"))
+    return not_modified_since(if_modified_since.decode("latin-1"), last_modified_at)
+
+
+class ResponseCacheMiddleware:
+    """
+    回應快取中介層（純 ASGI）
+
+    只快取 CACHE_RULES 內的 GET 請求與 200 回應；
+    回應帶 X-Cache: HIT / MISS 方便觀察
+    """
+
+    def __init__(self, app, rules: List[CacheRule] = CACHE_RULES):
+        self.app = app
+        self.rules = rules
+
+    def _match(self, path: str) -> Optional[List[str]]:
+        for pattern, tags in self.rules:
+            match = pattern.match(path)
+            if match:
+                return tags(match)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not get_settings().cache_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        tags = self._match(scope["path"])
+        if tags is None:
+            await self.app(scope, receive, send)
+            return
+
+        cache = get_cache()
+        key = cache.make_key(scope["method"], scope["path"], scope.get("query_string", b""))
+        cached = await cache.get(key)
+        if cached is not None:
+            status, headers, body = cached
+            if _not_modified(scope, headers):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(k, v) for k, v in headers if k in _VALIDATOR_HEADERS]
+                    + [(b"x-cache", b"HIT")],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers + [(b"x-cache", b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start_message = {}
+        chunks = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-cache", b"MISS")]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body") and start_message.get("status") == 200:
+                    headers = [
+                        (k, v) for k, v in start_message.get("headers", [])
+                        if k.lower() not in _SKIP_HEADERS
+                    ]
+                    await cache.set(key, 200, headers, b"".join(chunks), tags)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,207 @@
+"""
+回應壓縮（gzip / brotli）
+
+- 依 Accept-Encoding（含 q 值）協商；有安裝 brotli 且客戶端接受時優先使用 br
+- 小於 compression_minimum_size 的回應不壓縮：壓縮省下的位元組抵不過 CPU 與標頭成本
+- 串流回應（NDJSON 匯出）逐塊壓縮並立即 flush，客戶端不必等整個回應產生完
+- compression_profile 選擇壓縮等級：speed 省 CPU、size 省頻寬
+- 已經帶 Content-Encoding 的回應（例如 /api/items/export?gzip=true）不會重複壓縮
+- 壓縮後的回應 ETag 改為弱 ETag（W/），表示內容語意相同但位元組不同；
+  條件式請求本來就使用弱比較，304 不受影響
+"""
+import asyncio
+import re
+import zlib
+from typing import Dict, Optional
+
+from .config import get_settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    brotli = None
+
+# (gzip 等級, brotli 品質)；brotli 10 以上對動態內容太慢
+COMPRESSION_PROFILES: Dict[str, tuple] = {
+    "speed": (1, 1),
+    "balanced": (6, 4),
+    "size": (9, 9),
+}
+
+# 可壓縮的內容類型；圖片、zip 等本身已壓縮的格式不處理
+_COMPRESSIBLE = re.compile(
+    r"^(text/|application/(json|x-ndjson|javascript|xml)|[^;]*\+(json|xml)|image/svg\+xml)"
+)
+
+# 超過此大小的一次性回應改在執行緒池壓縮（zlib / brotli 會釋放 GIL），不卡住事件迴圈
+_OFFLOAD_SIZE = 256 * 1024
+
+
+class GzipEncoder:
+    encoding = b"gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31：gzip 格式
+
+    def compress(self, data: bytes) -> bytes:
+        """壓縮一塊資料並 flush，已送出的部分客戶端可以立即解壓"""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliEncoder:
+    encoding = b"br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    選出回應的編碼（br / gzip），客戶端都不接受時回傳 None
+
+    q 值相同時以伺服器的偏好（br 優先）決定
+    """
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if name:
+            qualities[name.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def make_encoder(encoding: str, profile: str):
+    gzip_level, brotli_quality = COMPRESSION_PROFILES.get(profile, COMPRESSION_PROFILES["balanced"])
+    if encoding == "br":
+        return BrotliEncoder(brotli_quality)
+    return GzipEncoder(gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    回應壓縮中介層（純 ASGI）
+
+    只在送出第一塊本體時決定是否壓縮：一次送完的回應依大小判斷，
+    串流回應（more_body）只要內容類型可壓縮就逐塊壓縮
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        settings = get_settings()
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"")
+        encoding = negotiate(accept_encoding.decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: dict = {}
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or not _COMPRESSIBLE.match(content_type)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message.update(message)  # 等第一塊本體再決定
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                if not more_body and len(body) < settings.compression_minimum_size:
+                    start_message["headers"] = _with_vary(start_message.get("headers", []))
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = make_encoder(encoding, settings.compression_profile)
+                if more_body:
+                    body = encoder.compress(body)
+                elif len(body) >= _OFFLOAD_SIZE:
+                    body = await asyncio.to_thread(encoder.finish, body)
+                else:
+                    body = encoder.finish(body)
+                start_message["headers"] = _compressed_headers(
+                    start_message.get("headers", []), encoder.encoding,
+                    None if more_body else len(body),
+                )
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = encoder.compress(body) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _with_vary(headers) -> list:
+    """回應內容依 Accept-Encoding 而不同，共用快取（CDN / proxy）須分開保存"""
+    headers = list(headers)
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def _compressed_headers(headers, encoding: bytes, length: Optional[int]) -> list:
+    """加上 Content-Encoding，更新 Content-Length（串流時移除），ETag 改為弱 ETag"""
+    result = []
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        result.append((name, value))
+    result.append((b"content-encoding", encoding))
+    if length is not None:
+        result.append((b"content-length", str(length).encode()))
+    return _with_vary(result)
@@ -0,0 +1,53 @@
+"""
+HTTP 條件式請求（ETag / Last-Modified）
+
+ETag 由資料庫的 version 欄位產生，不需要序列化回應本體；
+條件符合時直接回傳 304，完全跳過查詢結果的序列化
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+
+def item_etag(item_id: int, version: int) -> str:
+    """單筆項目的強 ETag"""
+    return f'"item-{item_id}-v{version}"'
+
+
+def collection_etag(name: str, version: int, query: str = "") -> str:
+    """集合（列表端點）的強 ETag；query 區分同一個集合的不同頁（排序、分頁參數）"""
+    if not query:
+        return f'"{name}-v{version}"'
+    digest = hashlib.sha256(query.encode()).hexdigest()[:16]
+    return f'"{name}-v{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否符合（使用弱比較，W/ 前綴不影響結果）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def http_date(value: datetime) -> str:
+    """轉成 HTTP 日期格式（資料庫內為不含時區的 UTC）"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """If-Modified-Since 之後是否沒有修改（HTTP 日期只精確到秒）"""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
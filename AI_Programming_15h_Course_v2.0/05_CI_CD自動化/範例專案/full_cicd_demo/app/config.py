@@ -2,10 +2,23 @@
 應用配置管理
 
 使用 pydantic-settings 管理多環境配置
+
+- Settings 不可變；設定變動時整個換成新的物件（settings_provider），讀取端不需要加鎖
+- config_reload_interval > 0 時定期檢查 .env 的修改時間，有變動就重新載入並通知訂閱者
+  （日誌、回應快取、連線池、限流器），不需要重啟行程
+- server_*、web_concurrency 等啟動器設定只在啟動時讀取，變更後仍需重啟（gunicorn 可用 HUP）
 """
+import asyncio
+import logging
+import os
+import threading
+from functools import cached_property
+from typing import Callable, FrozenSet, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
 from pydantic_settings import BaseSettings
-from functools import lru_cache
-from typing import Optional
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
@@ -22,6 +35,35 @@ class Settings(BaseSettings):
 
     # 資料庫設定
     database_url: str = "sqlite:///./app.db"
+    db_echo: bool = False
+    # 非同步驅動（aiosqlite / asyncpg）；設為 False 退回同步 Session + 執行緒池
+    database_async: bool = True
+    seed_demo_data: bool = True     # 資料表為空時寫入示範資料
+
+    # 連線池設定（每個行程共用一個 Engine）
+    db_pool_size: int = 5           # 常駐連線數
+    db_max_overflow: int = 10       # 尖峰時可額外建立的連線數
+    db_pool_timeout: float = 30.0   # 取得連線的最長等待秒數
+    db_pool_recycle: int = 1800     # 連線存活秒數，超過後重建
+    db_pool_pre_ping: bool = True   # 取用前先檢查連線是否仍然有效
+
+    # SQLite 專用：啟用 WAL 讓讀寫可以並行
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+
+    # 伺服器設定（python -m app.server）
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    web_concurrency: Optional[int] = None   # worker 數量；未設定時依可用 CPU 計算
+    server_preload: bool = True             # master 先載入應用再 fork（copy-on-write 共用）
+    server_max_requests: int = 10000        # 每個 worker 處理多少請求後重啟（0 表示不重啟）
+    server_max_requests_jitter: int = 1000  # 隨機抖動，避免所有 worker 同時重啟
+    server_timeout: int = 30                # worker 無回應多久後重啟（秒）
+    server_graceful_timeout: int = 30       # 重啟時等待進行中請求的秒數
+    server_keepalive: int = 5
+    server_loop: str = "auto"               # auto / uvloop / asyncio
+    server_http: str = "auto"               # auto / httptools / h11
+    server_pidfile: Optional[str] = None    # 平滑重啟腳本需要
 
     # 安全設定
     secret_key: str = "your-secret-key-change-in-production"
@@ -30,19 +72,175 @@ class Settings(BaseSettings):
     # Redis 設定（可選）
     redis_url: Optional[str] = None
 
+    # 回應快取（未設定 redis_url 時使用行程內快取）
+    cache_enabled: bool = True
+    cache_ttl: int = 30             # 秒
+    cache_max_entries: int = 1024   # 行程內快取的項目上限（LRU）
+
+    # 回應壓縮（gzip；有安裝 brotli 時優先使用 br）
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024    # 小於此大小（bytes）不壓縮
+    compression_profile: str = "balanced"   # speed（省 CPU）/ balanced / size（省頻寬）
+
+    # 限流：每個 API key（未帶時以客戶端 IP）一個令牌桶；設定 redis_url 時多個 worker 共用額度
+    rate_limit_enabled: bool = False
+    rate_limit_per_second: float = 20.0     # 每秒補充的令牌數（長期平均速率）
+    rate_limit_burst: int = 40              # 令牌上限（允許的突發請求數）
+    rate_limit_key_header: str = "X-API-Key"
+
+    # 冪等鍵（POST /api/items 的 Idempotency-Key）；設定 redis_url 時多個 worker 共用
+    idempotency_enabled: bool = True
+    idempotency_ttl: int = 86400            # 保存回應的秒數，期間內以同一個鍵重試都拿到同一份回應
+    idempotency_wait_timeout: float = 10.0  # 相同鍵的並行請求等待第一個完成的秒數，逾時回 409
+    idempotency_max_entries: int = 10000    # 行程內儲存的回應上限（LRU）
+
+    # 過載保護：自適應並行上限，排隊超過目標時間回 503（每個 worker 各自計算）
+    load_shedding_enabled: bool = True
+    concurrency_limit_initial: int = 64
+    concurrency_limit_min: int = 8
+    concurrency_limit_max: int = 512
+    concurrency_queue_target_ms: float = 100.0
+
+    # 搜尋（/api/items/search）：auto 依資料庫使用 FTS5 / pg_trgm，memory 強制使用行程內索引
+    search_backend: str = "auto"
+
+    # 列表回應是否經過 Pydantic 驗證；資料只來自本服務的資料庫時可關閉以節省 CPU
+    response_validation: bool = True
+
+    # 就緒檢查（/ready）
+    health_probe_timeout: float = 1.0   # 每個相依服務檢查的逾時（秒）
+    health_cache_ttl: float = 5.0       # 檢查結果快取秒數
+
+    # 監控指標（/metrics）
+    metrics_enabled: bool = True
+    # 多 worker 時各 worker 寫入快照的共用目錄；未設定則只回報目前 worker
+    metrics_multiproc_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0   # 秒
+
     # 功能開關
     enable_swagger: bool = True
     enable_cors: bool = True
 
     # 日誌設定
     log_level: str = "INFO"
+    log_format: str = "json"        # json / text
+    log_queue_size: int = 10000     # 背景輸出佇列上限，滿了就丟棄
+    log_rate_limit: int = 100       # 同一訊息樣板每秒最多幾筆 INFO/DEBUG（0 表示不限）
+
+    # 設定熱更新：每隔幾秒檢查 .env 是否被修改（0 表示不檢查，只在啟動時讀取一次）
+    config_reload_interval: float = 0.0
 
     class Config:
         env_file = ".env"
         case_sensitive = False
+        frozen = True
+
+
+Subscriber = Callable[[Settings, Settings], None]
+
+
+def changed_fields(old: Settings, new: Settings) -> FrozenSet[str]:
+    """兩份設定之間值不同的欄位"""
+    return frozenset(
+        name for name in Settings.model_fields if getattr(old, name) != getattr(new, name)
+    )
+
+
+class SettingsProvider:
+    """
+    目前生效的設定
+
+    current 是一般的實例屬性：第一次讀取時才載入（cached_property），之後每次讀取
+    就是一次屬性查找。重新載入時建立新的 Settings 再一次指派，讀取端只會看到
+    舊的或新的完整設定，不會看到改到一半的狀態
+    """
+
+    def __init__(self, factory: Callable[[], Settings] = Settings, env_file: Optional[str] = None):
+        self._factory = factory
+        self.env_file = env_file or Settings.model_config.get("env_file")
+        self._subscribers: List[Tuple[Subscriber, Optional[FrozenSet[str]]]] = []
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+
+    @cached_property
+    def current(self) -> Settings:
+        return self._factory()
+
+    def subscribe(self, callback: Subscriber, fields: Optional[Iterable[str]] = None) -> Subscriber:
+        """設定變動時呼叫 callback(old, new)；指定 fields 時只在這些欄位變動時呼叫"""
+        entry = (callback, frozenset(fields) if fields is not None else None)
+        if entry not in self._subscribers:
+            self._subscribers.append(entry)
+        return callback
+
+    def reset_on_change(self, getter: Callable, fields: Iterable[str]) -> None:
+        """lru_cache 單例（get_cache 等）：fields 變動時清除，下次取用時依新設定重建"""
+
+        def reset(old: Settings, new: Settings) -> None:
+            getter.cache_clear()
+
+        self.subscribe(reset, fields)
+
+    def reload(self) -> FrozenSet[str]:
+        """重新讀取環境變數與 .env；設定有誤時保留目前的設定。回傳變動的欄位"""
+        try:
+            new = self._factory()
+        except ValidationError as exc:
+            logger.error("Settings reload failed, keeping current settings: %s", exc)
+            return frozenset()
+        return self.swap(new)
+
+    def replace(self, **changes) -> FrozenSet[str]:
+        """以目前設定為基礎覆寫部分欄位（管理工具與測試使用）"""
+        return self.swap(self.current.model_copy(update=changes))
+
+    def swap(self, new: Settings) -> FrozenSet[str]:
+        with self._lock:
+            old = self.current
+            changed = changed_fields(old, new)
+            if not changed:
+                return changed
+            self.current = new
+
+        logger.info("Settings reloaded: %s", ", ".join(sorted(changed)))
+        for callback, fields in list(self._subscribers):
+            if fields is not None and not fields & changed:
+                continue
+            try:
+                callback(old, new)
+            except Exception:
+                # 其中一個訂閱者失敗不影響其他訂閱者；新設定已經生效
+                logger.exception("Settings subscriber %r failed", callback)
+        return changed
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.env_file)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> FrozenSet[str]:
+        """.env 的修改時間或大小改變時重新載入"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return frozenset()
+        self._stamp = stamp
+        return self.reload()
+
+    async def watch(self, interval: float) -> None:
+        """定期檢查 .env（在 lifespan 中以背景工作執行）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.check()
+            except Exception:  # 例如 .env 暫時無法讀取：下一輪再試
+                logger.exception("Settings reload check failed")
+
+
+settings_provider = SettingsProvider()
 
 
-@lru_cache()
 def get_settings() -> Settings:
-    """獲取配置（單例模式）"""
-    return Settings()
+    """獲取目前生效的配置（熱更新時會換成新的物件，不要長期保存）"""
+    return settings_provider.current
@@ -1,33 +1,395 @@
 """
 資料庫連線管理
 
-簡化版本：使用 SQLite
-生產環境應該使用 PostgreSQL
+- 每個行程只建立一個 Engine（get_engine 單例），請求之間共用連線池
+- 連線池大小、溢出上限、pre-ping、回收時間都由 Settings 控制
+- 非同步路由使用 get_async_db（aiosqlite / asyncpg），不阻塞事件迴圈
+- SQLite 用於本地開發（啟用 WAL）；生產環境應該使用 PostgreSQL
 """
-from typing import Generator
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncGenerator, Dict, Generator, Set, Union
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from starlette.concurrency import run_in_threadpool
+
+from .config import Settings, get_settings, settings_provider
+from .metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+
+class Base(DeclarativeBase):
+    """ORM 模型基底類別"""
+
+
+class PoolStats:
+    """連線池統計：取用次數、新建連線數、等待時間"""
 
-class SessionLocal:
-    """資料庫 Session（簡化版本）"""
     def __init__(self):
-        self.db = None
+        self.checkouts = 0
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+
+class InstrumentedQueuePool(QueuePool):
+    """會記錄取用等待時間的 QueuePool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record_wait(time.perf_counter() - start)
+
+    def _create_connection(self):
+        self.stats.connects += 1
+        return super()._create_connection()
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """非同步 Engine 使用的 InstrumentedQueuePool"""
+
+
+def is_sqlite_url(database_url: str) -> bool:
+    """是否為 SQLite 連線字串"""
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite_url(database_url: str) -> bool:
+    """是否為 SQLite 記憶體資料庫（只能共用同一條連線）"""
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _enable_sqlite_pragmas(engine: Engine, settings: Settings) -> None:
+    """每條新連線建立時設定 SQLite PRAGMA"""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        if settings.sqlite_wal:
+            # WAL：讀不擋寫、寫不擋讀；NORMAL 在 WAL 下仍然安全
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _engine_kwargs(settings: Settings, poolclass) -> dict:
+    """同步與非同步 Engine 共用的連線池參數"""
+    kwargs = {"echo": settings.db_echo}
+
+    if is_sqlite_url(settings.database_url):
+        # FastAPI 會在不同執行緒使用同一條連線
+        kwargs["connect_args"] = {"check_same_thread": False}
+
+    if is_memory_sqlite_url(settings.database_url):
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=poolclass,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    return kwargs
+
+
+def build_engine(settings: Settings) -> Engine:
+    """依照配置建立 Engine 與連線池"""
+    engine = create_engine(
+        settings.database_url, **_engine_kwargs(settings, InstrumentedQueuePool)
+    )
+    if is_sqlite_url(settings.database_url):
+        _enable_sqlite_pragmas(engine, settings)
+    instrument_engine(engine)
+    return engine
+
+
+def to_async_url(database_url: str) -> str:
+    """
+    將同步連線字串轉成非同步驅動
+
+    sqlite://     -> sqlite+aiosqlite://
+    postgresql:// -> postgresql+asyncpg://
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def build_async_engine(settings: Settings) -> AsyncEngine:
+    """依照配置建立非同步 Engine（aiosqlite / asyncpg）"""
+    url = to_async_url(settings.database_url)
+    engine = create_async_engine(url, **_engine_kwargs(settings, InstrumentedAsyncQueuePool))
+    if is_sqlite_url(settings.database_url):
+        _enable_sqlite_pragmas(engine.sync_engine, settings)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    """獲取 Engine（每個行程一個）"""
+    return build_engine(get_settings())
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    """獲取非同步 Engine（每個行程一個）"""
+    return build_async_engine(get_settings())
+
+
+def active_engines() -> Dict[str, Union[Engine, AsyncEngine]]:
+    """已經建立的 Engine（不會因為查詢而建立新的 Engine）"""
+    engines: Dict[str, Union[Engine, AsyncEngine]] = {}
+    if get_engine.cache_info().currsize:
+        engines["sync"] = get_engine()
+    if get_async_engine.cache_info().currsize:
+        engines["async"] = get_async_engine()
+    return engines
+
+
+async def dispose_engine() -> None:
+    """關閉連線池中的所有連線（應用關閉或測試清理時使用）"""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    get_engine.cache_clear()
+
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    get_async_engine.cache_clear()
+
+
+# 熱更新時換下來、還在關閉中的非同步 Engine（保留參照，避免工作被回收）
+_retiring: Set[asyncio.Task] = set()
+
+# 影響 Engine 與連線池的設定
+ENGINE_FIELDS = {
+    "database_url", "db_echo", "db_pool_size", "db_max_overflow", "db_pool_timeout",
+    "db_pool_recycle", "db_pool_pre_ping", "sqlite_wal", "sqlite_busy_timeout_ms",
+}
+
+
+def reset_engines(old: Settings, new: Settings) -> None:
+    """
+    設定熱更新：之後取用的連線改由依新設定建立的 Engine 提供
+
+    舊 Engine 立即關閉閒置連線；借出中的連線不受影響，歸還時直接關閉。
+    非同步 Engine 在目前的事件迴圈中關閉，不阻塞呼叫端
+    """
+    engines = active_engines()
+    get_engine.cache_clear()
+    get_async_engine.cache_clear()
+
+    for engine in engines.values():
+        if isinstance(engine, Engine):
+            engine.dispose()
+            continue
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # 不在事件迴圈中（例如管理腳本）：同步等待關閉
+            try:
+                asyncio.run(engine.dispose())
+            except Exception:
+                logger.warning("Failed to dispose retired engine", exc_info=True)
+            continue
+        task = loop.create_task(engine.dispose())
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+
+
+settings_provider.subscribe(reset_engines, ENGINE_FIELDS)
+
+
+# Session 工廠：bind 在取用時才指定，避免 import 時就連線
+SessionLocal = sessionmaker(autoflush=False, expire_on_commit=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+async def _create_all() -> None:
+    if get_settings().database_async:
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    else:
+        await run_in_threadpool(Base.metadata.create_all, get_engine())
+
+
+async def init_db() -> None:
+    """建立資料表（示範專案沒有 migration 工具，直接 create_all）"""
+    try:
+        await _create_all()
+    except (OperationalError, ProgrammingError):
+        # 多個 worker 同時啟動時可能同時建立資料表；重試時 checkfirst 會略過已存在的表
+        await _create_all()
+
+
+def get_pool_stats(engine: Union[Engine, AsyncEngine, None] = None) -> dict:
+    """連線池狀態與取用等待時間統計"""
+    pool = (engine or get_engine()).pool
+    stats = {"pool": pool.__class__.__name__}
 
-    def __enter__(self):
-        return self
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+    if isinstance(pool, InstrumentedQueuePool):
+        s = pool.stats
+        stats.update(
+            checkouts=s.checkouts,
+            connects=s.connects,
+            wait_total_ms=round(s.wait_total * 1000, 3),
+            wait_max_ms=round(s.wait_max * 1000, 3),
+            wait_avg_ms=round(s.wait_total * 1000 / s.checkouts, 3) if s.checkouts else 0.0,
+        )
 
+    return stats
 
-def get_db() -> Generator:
+
+def get_db() -> Generator[Session, None, None]:
     """
     獲取資料庫 Session
 
     使用方式：
     db = Depends(get_db)
+
+    發生例外時回滾交易，結束時關閉 Session（連線歸還連線池）
+    """
+    db = SessionLocal(bind=get_engine())
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class SyncSessionAdapter:
+    """
+    同步 Session 的非同步外觀（遷移期間的後備方案）
+
+    Settings.database_async = False 時使用：提供與 AsyncSession 相同的
+    await 介面，但實際的資料庫操作丟到執行緒池執行，不阻塞事件迴圈
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return _StreamedResultAdapter(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+class _StreamedResultAdapter:
+    """SyncSessionAdapter.stream() 的結果：每次取一批都丟到執行緒池"""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size: int):
+        partitions = self._result.partitions(size)
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    db = SessionLocal()
+    獲取非同步資料庫 Session
+
+    使用方式：
+    db = Depends(get_async_db)
+
+    Settings.database_async = False 時退回同步 Session + 執行緒池
+    """
+    if get_settings().database_async:
+        db = AsyncSessionLocal(bind=get_async_engine())
+    else:
+        db = SyncSessionAdapter(SessionLocal(bind=get_engine()))
     try:
         yield db
+    except Exception:
+        await db.rollback()
+        raise
     finally:
-        pass  # 實際應該關閉連線
+        await db.close()
+
+
+# 路由以外（啟動、背景工作）使用：async with async_session_scope() as db
+async_session_scope = asynccontextmanager(get_async_db)
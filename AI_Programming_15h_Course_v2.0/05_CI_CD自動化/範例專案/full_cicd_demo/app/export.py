@@ -0,0 +1,46 @@
+"""
+Items 匯出（NDJSON 串流）
+
+- 每行一個 JSON 物件，邊讀邊送，不需要先把整張表載入記憶體
+- 可選擇即時 gzip 壓縮
+"""
+import zlib
+from typing import AsyncIterator
+
+from .database import async_session_scope
+from .repository import ItemRepository
+from .responses import dumps
+
+# 每次從資料庫讀取（也是每次送出）的列數
+EXPORT_BATCH_SIZE = 1000
+
+
+def _encode_batch(rows) -> bytes:
+    """一批資料列編碼成 NDJSON（欄位順序與 Item 模型一致）"""
+    return b"".join(
+        dumps({"name": name, "description": description, "price": price, "id": item_id}) + b"\n"
+        for item_id, name, description, price in rows
+    )
+
+
+async def export_items_ndjson(
+    batch_size: int = EXPORT_BATCH_SIZE, compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    產生 NDJSON 串流
+
+    Session 在產生器內自行建立：StreamingResponse 在路由函式返回後才開始迭代，
+    這時路由的 Depends(get_async_db) 已經關閉了
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31：gzip 格式
+
+    async with async_session_scope() as db:
+        async for rows in ItemRepository(db).stream_rows(batch_size):
+            chunk = _encode_batch(rows)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,103 @@
+"""
+相依服務的健康檢查（readiness）
+
+- 資料庫與 Redis（有設定 redis_url 時）並行檢查，每個檢查各自有逾時
+- 結果快取 health_cache_ttl 秒，同時進來的請求共用同一次檢查：
+  負載平衡器與 docker healthcheck 頻繁探測時不會放大成對資料庫的負載
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from .cache import RedisCache, get_cache
+from .config import get_settings, settings_provider
+from .database import async_session_scope
+from .models import ProbeResult, ReadinessCheck
+
+Probe = Callable[[], Awaitable[None]]
+
+
+async def probe_database() -> None:
+    """從連線池取一條連線執行 SELECT 1"""
+    async with async_session_scope() as db:
+        await db.execute(text("SELECT 1"))
+
+
+async def probe_redis() -> None:
+    """使用回應快取既有的 Redis 連線 PING"""
+    backend = get_cache().backend
+    if not isinstance(backend, RedisCache):
+        raise RuntimeError("Redis cache backend is not configured")
+    await backend.client.ping()
+
+
+class HealthChecker:
+    """並行執行所有檢查，結果短暫快取"""
+
+    def __init__(self, probes: Dict[str, Probe], timeout: float = 1.0, ttl: float = 5.0):
+        self.probes = probes
+        self.timeout = timeout
+        self.ttl = ttl
+        self._result: Optional[ReadinessCheck] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    async def _run_probe(self, probe: Probe) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            status, error = "ok", None
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"no response within {self.timeout}s"
+        except Exception as exc:  # 任何例外都代表相依服務不可用
+            status, error = "error", f"{exc.__class__.__name__}: {exc}"
+        latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        return ProbeResult(status=status, latency_ms=latency_ms, error=error)
+
+    async def _run_all(self) -> ReadinessCheck:
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._run_probe(self.probes[n]) for n in names))
+        checks = dict(zip(names, results))
+        ready = all(result.status == "ok" for result in checks.values())
+        return ReadinessCheck(
+            status="ready" if ready else "not_ready",
+            checks=checks,
+            cached=False,
+            checked_at=datetime.now(timezone.utc),
+        )
+
+    async def check(self) -> ReadinessCheck:
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return self._result.model_copy(update={"cached": True})
+
+        # 同一個事件迴圈內已有檢查在進行時直接等待它的結果
+        task = self._inflight
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._inflight = asyncio.ensure_future(self._run_all())
+        result = await asyncio.shield(task)
+
+        if task is self._inflight:
+            self._result, self._expires_at = result, time.monotonic() + self.ttl
+            self._inflight = None
+        return result
+
+
+@lru_cache()
+def get_health_checker() -> HealthChecker:
+    """獲取健康檢查器（單例）"""
+    settings = get_settings()
+    probes: Dict[str, Probe] = {"database": probe_database}
+    if settings.redis_url:
+        probes["redis"] = probe_redis
+    return HealthChecker(
+        probes, timeout=settings.health_probe_timeout, ttl=settings.health_cache_ttl
+    )
+
+
+settings_provider.reset_on_change(
+    get_health_checker, {"redis_url", "health_probe_timeout", "health_cache_ttl"}
+)
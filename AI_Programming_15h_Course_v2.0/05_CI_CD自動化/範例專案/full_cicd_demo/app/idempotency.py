@@ -0,0 +1,356 @@
+"""
+寫入端點的冪等鍵（Idempotency-Key）
+
+- 客戶端在 POST /api/items 帶上 Idempotency-Key，逾時重試時沿用同一個值；
+  第一次的回應（2xx / 4xx）保存 idempotency_ttl 秒，重試直接回傳保存的回應
+  （帶 Idempotent-Replayed: true），不經過路由，也不會再寫入資料庫
+- 同一個鍵的請求同時到達時只有一個會執行，其他請求等它完成後回傳同一份回應；
+  等待超過 idempotency_wait_timeout 回 409
+- 同一個鍵搭配不同的請求內容回 422，避免誤用的鍵拿到別的請求的結果
+- 5xx 與例外不保存，並立即釋放鍵，客戶端可以用同一個鍵重試
+- 鍵依 API key（rate_limit_key_header）區隔，不同客戶端使用相同的值互不影響
+- 預設使用行程內儲存；設定 redis_url 時改用 Redis，跨 worker 的重複請求也只執行一次
+- 儲存後端無法使用時照常處理請求（不保證冪等），不讓寫入端點因此失敗
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .config import get_settings, settings_provider
+
+logger = logging.getLogger(__name__)
+
+# 支援冪等鍵的端點
+IDEMPOTENT_ROUTES = {("POST", "/api/items")}
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# 處理中標記的存活秒數：持有的 worker 當機時，鍵不會永遠被鎖住
+_LOCK_TTL = 60
+
+# 不保存的回應標頭（每次回應都不同）
+_SKIP_HEADERS = {b"set-cookie", b"date", b"server", b"x-request-id"}
+
+# 各種結果的次數（/metrics）
+outcomes = {"executed": 0, "replayed": 0, "conflict": 0, "mismatch": 0, "error": 0}
+
+
+class MemoryIdempotencyStore:
+    """
+    行程內儲存：保存的回應（TTL + LRU）與處理中的鍵
+
+    等待中的請求以 asyncio.Event 喚醒，不需要輪詢
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._locks: Dict[str, Tuple[float, str, asyncio.Event]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def lock(self, key: str, ttl: int) -> Optional[str]:
+        """標記為處理中；已經有其他請求在處理時回傳 None"""
+        held = self._locks.get(key)
+        if held is not None and held[0] > time.monotonic():
+            return None
+        token = secrets.token_hex(8)
+        self._locks[key] = (time.monotonic() + ttl, token, asyncio.Event())
+        return token
+
+    async def save(self, key: str, token: str, value: bytes, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        await self.unlock(key, token)
+
+    async def unlock(self, key: str, token: str) -> None:
+        held = self._locks.get(key)
+        if held is not None and held[1] == token:
+            del self._locks[key]
+            held[2].set()
+
+    async def wait(self, key: str, timeout: float) -> None:
+        """等到處理中的請求完成（或逾時）"""
+        held = self._locks.get(key)
+        if held is None:
+            return
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(held[2].wait(), timeout)
+
+
+# 只刪除自己持有的處理中標記（標記過期後可能已經被其他請求取得）
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisIdempotencyStore:
+    """
+    Redis 儲存（多個 worker 共用）
+
+    處理中標記以 SET NX PX 取得，標記值是隨機 token，釋放時比對 token；
+    等待中的請求輪詢標記是否已經刪除
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, client, prefix: str = "idempotency:"):
+        self.client = client
+        self.prefix = prefix
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisIdempotencyStore":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - 依安裝環境而定
+            raise RuntimeError("使用 Redis 冪等鍵儲存需要安裝 redis 套件") from exc
+        return cls(redis_asyncio.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def lock(self, key: str, ttl: int) -> Optional[str]:
+        token = secrets.token_hex(8)
+        if await self.client.set(f"{self.prefix}lock:{key}", token, nx=True, ex=ttl):
+            return token
+        return None
+
+    async def save(self, key: str, token: str, value: bytes, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+        await self.unlock(key, token)
+
+    async def unlock(self, key: str, token: str) -> None:
+        await self._release(keys=[f"{self.prefix}lock:{key}"], args=[token])
+
+    async def wait(self, key: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not await self.client.exists(f"{self.prefix}lock:{key}"):
+                return
+            await asyncio.sleep(self.poll_interval)
+
+
+@lru_cache()
+def get_idempotency_store():
+    """獲取冪等鍵儲存（單例）：有設定 redis_url 時使用 Redis"""
+    settings = get_settings()
+    if settings.redis_url:
+        return RedisIdempotencyStore.from_url(settings.redis_url)
+    return MemoryIdempotencyStore(max_entries=settings.idempotency_max_entries)
+
+
+settings_provider.reset_on_change(get_idempotency_store, {"redis_url", "idempotency_max_entries"})
+
+
+def idempotency_samples():
+    """/metrics：冪等鍵的處理結果"""
+    for outcome, count in outcomes.items():
+        yield ("idempotency_requests_total", "counter", "Requests carrying an Idempotency-Key",
+               {"outcome": outcome}, count)
+
+
+def store_key(scope, idempotency_key: bytes) -> str:
+    """儲存鍵：API key + 方法 + 路徑 + Idempotency-Key 的雜湊（不把金鑰寫進 Redis）"""
+    key_header = get_settings().rate_limit_key_header.lower().encode("latin-1")
+    api_key = dict(scope["headers"]).get(key_header, b"")
+    parts = [api_key, scope["method"].encode(), scope["path"].encode(), idempotency_key]
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+
+def fingerprint(scope, body: bytes) -> str:
+    """請求內容的指紋：同一個鍵搭配不同內容時拒絕"""
+    digest = hashlib.sha256(scope.get("query_string", b""))
+    digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def encode_record(request_fingerprint: str, status: int, headers, body: bytes) -> bytes:
+    text_headers = [
+        (k.decode("latin-1"), v.decode("latin-1"))
+        for k, v in headers if k.lower() not in _SKIP_HEADERS
+    ]
+    meta = json.dumps([request_fingerprint, status, text_headers])
+    return meta.encode() + b"\n" + body
+
+
+def decode_record(raw: bytes) -> Tuple[str, int, List[Tuple[bytes, bytes]], bytes]:
+    meta, body = raw.split(b"\n", 1)
+    request_fingerprint, status, headers = json.loads(meta)
+    return (
+        request_fingerprint,
+        status,
+        [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        body,
+    )
+
+
+async def _respond(send, status: int, headers: list, body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _reject(send, status: int, detail: bytes) -> None:
+    await _respond(
+        send, status, [(b"content-type", b"application/json")], b'{"detail":"' + detail + b'"}'
+    )
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    冪等鍵中介層（純 ASGI）
+
+    先讀完請求本體計算指紋，再交給路由處理（路由讀到的是同一份本體）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES
+            or not get_settings().idempotency_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH or not idempotency_key.isascii():
+            await _reject(send, 400, b"Invalid Idempotency-Key")
+            return
+
+        body = await _read_body(receive)
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        settings = get_settings()
+        store = get_idempotency_store()
+        key = store_key(scope, idempotency_key)
+        request_fingerprint = fingerprint(scope, body)
+
+        try:
+            record, token = await self._claim(store, key, settings.idempotency_wait_timeout)
+        except Exception as exc:  # 冪等只是保護機制，儲存後端中斷時照常處理
+            outcomes["error"] += 1
+            logger.warning("冪等鍵儲存無法使用，照常處理請求: %s", exc)
+            await self.app(scope, replay_receive, send)
+            return
+
+        if record is not None:
+            stored_fingerprint, status, headers, stored_body = decode_record(record)
+            if stored_fingerprint != request_fingerprint:
+                outcomes["mismatch"] += 1
+                await _reject(send, 422, b"Idempotency-Key was used with a different request")
+                return
+            outcomes["replayed"] += 1
+            await _respond(send, status, headers + [(b"idempotent-replayed", b"true")], stored_body)
+            return
+        if token is None:
+            outcomes["conflict"] += 1
+            await _reject(send, 409, b"A request with this Idempotency-Key is in progress")
+            return
+
+        outcomes["executed"] += 1
+        await self._execute(scope, replay_receive, send, store, key, token, request_fingerprint)
+
+    @staticmethod
+    async def _claim(store, key: str, timeout: float) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        取得執行權或保存的回應：回傳 (保存的回應, None) 或 (None, token)；
+        等待逾時回傳 (None, None)。持有者失敗（5xx）釋放鍵後，由等待中的請求接手執行
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            record = await store.get(key)
+            if record is not None:
+                return record, None
+            token = await store.lock(key, _LOCK_TTL)
+            if token is not None:
+                # 取得標記前，上一個持有者可能剛好保存完回應
+                record = await store.get(key)
+                if record is not None:
+                    await store.unlock(key, token)
+                    return record, None
+                return None, token
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None, None
+            await store.wait(key, remaining)
+
+    async def _execute(self, scope, receive, send, store, key, token, request_fingerprint):
+        start_message: dict = {}
+        chunks: List[bytes] = []
+        saved = False
+
+        async def send_wrapper(message):
+            nonlocal saved
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                status = start_message.get("status", 500)
+                if not message.get("more_body") and status < 500:
+                    record = encode_record(
+                        request_fingerprint, status, start_message.get("headers", []),
+                        b"".join(chunks),
+                    )
+                    # 先保存再送出：客戶端收到回應後立即重試也會拿到保存的回應
+                    try:
+                        await store.save(key, token, record, get_settings().idempotency_ttl)
+                        saved = True
+                    except Exception as exc:
+                        outcomes["error"] += 1
+                        logger.warning("無法保存冪等鍵的回應: %s", exc)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not saved:
+                with suppress(Exception):
+                    await store.unlock(key, token)
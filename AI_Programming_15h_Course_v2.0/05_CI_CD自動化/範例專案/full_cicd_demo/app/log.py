@@ -0,0 +1,234 @@
+"""
+非同步結構化日誌
+
+- 請求處理中只把 LogRecord 放進有上限的佇列，實際格式化與輸出在 QueueListener 的執行緒；
+  stdout 再慢也不會卡住事件迴圈，佇列滿時直接丟棄並計數
+- 訊息延遲格式化：呼叫端傳 logger.info("...%s", value)，字串組合在背景執行緒才做
+- 輸出 JSON（每行一筆），帶有請求 ID
+- 同一訊息樣板每秒超過上限的 INFO / DEBUG 會被丟棄，下一個時間窗回報丟棄數量
+"""
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from .config import Settings, settings_provider
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord 的標準屬性；其他屬性（logger.info(..., extra={...})）會一併輸出
+# color_message 是 uvicorn 附加的終端機上色版本
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "color_message"
+}
+
+# 接受客戶端帶入的請求 ID：限制長度與字元，避免日誌注入
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆日誌輸出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """在呼叫端的執行緒記下請求 ID（背景執行緒讀不到 contextvar）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        if request_id is not None:
+            record.request_id = request_id
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    以訊息樣板（logger 名稱 + 未格式化的 msg）為單位限制每秒筆數
+
+    WARNING 以上一律放行；被丟棄的數量在該樣板下一次輸出時以 suppressed 欄位回報
+    """
+
+    def __init__(self, limit_per_second: int, window: float = 1.0):
+        super().__init__()
+        self.limit = limit_per_second
+        self.window = window
+        self._counters: Dict[Tuple[str, object], list] = {}  # key -> [視窗起點, 筆數, 丟棄數]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) > 10_000:  # 樣板數量異常（例如 f-string）時重設
+                self._counters.clear()
+            counter = self._counters[key] = [now, 0, 0]
+        elif now - counter[0] >= self.window:
+            counter[0], counter[1] = now, 0
+
+        if counter[1] >= self.limit:
+            counter[2] += 1
+            return False
+
+        counter[1] += 1
+        if counter[2]:
+            record.suppressed = counter[2]
+            counter[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    佇列滿時丟棄而不是等待
+
+    不在呼叫端格式化訊息（標準 QueueHandler 會先呼叫 format），只把例外轉成文字，
+    避免 traceback 物件把整個呼叫堆疊留在記憶體裡
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)  # 其他 handler 仍看得到原本的 exc_info
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Pipeline:
+    handler: Optional[NonBlockingQueueHandler] = None
+    listener: Optional[QueueListener] = None
+    stream = None
+
+
+_pipeline = _Pipeline()
+
+
+def setup_logging(settings: Settings, stream=None) -> NonBlockingQueueHandler:
+    """
+    設定 root logger：佇列 handler + 背景輸出執行緒
+
+    重複呼叫時先停止舊的 listener（例如測試中多次啟動應用）
+    """
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        ))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(RateLimitFilter(settings.log_rate_limit))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+
+    # uvicorn 的日誌也走同一條佇列
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    _pipeline.handler, _pipeline.listener, _pipeline.stream = handler, listener, stream
+    return handler
+
+
+def shutdown_logging() -> None:
+    """停止背景執行緒（會先輸出佇列中剩餘的日誌）"""
+    if _pipeline.listener is not None:
+        _pipeline.listener.stop()
+        logging.getLogger().removeHandler(_pipeline.handler)
+        _pipeline.handler = _pipeline.listener = None
+
+
+def reconfigure_logging(old: Settings, new: Settings) -> None:
+    """設定熱更新：只改等級時直接調整 root logger，其他日誌設定變動時重建輸出管線"""
+    if _pipeline.listener is None:  # 應用尚未啟動，日誌還沒設定
+        return
+    if (old.log_format, old.log_queue_size, old.log_rate_limit) != (
+        new.log_format, new.log_queue_size, new.log_rate_limit
+    ):
+        setup_logging(new, _pipeline.stream)
+    else:
+        logging.getLogger().setLevel(new.log_level.upper())
+
+
+settings_provider.subscribe(
+    reconfigure_logging, {"log_level", "log_format", "log_queue_size", "log_rate_limit"}
+)
+
+
+def dropped_records() -> int:
+    """因佇列已滿而丟棄的日誌筆數"""
+    return _pipeline.handler.dropped if _pipeline.handler is not None else 0
+
+
+class RequestIdMiddleware:
+    """
+    請求 ID 中介層（純 ASGI）
+
+    沿用客戶端的 X-Request-ID（格式合法時），否則產生新的；回應帶回同一個 ID
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        # 發生例外時不還原：外層的全域錯誤處理記錄日誌時仍帶有請求 ID
+        request_id_var.reset(token)
@@ -2,172 +2,183 @@
 FastAPI 示範應用 - Full CI/CD Demo
 
 這是一個完整的示範專案，展示如何建立端到端的 CI/CD 管線。
+
+應用由 create_app() 建立，FastAPI、路由、中介層與資料庫相關模組都在建立時才匯入：
+只匯入本模組（例如 gunicorn master 的 on_starting hook）不需要付出這些成本。
+`app.main:app` 在第一次存取時才以預設設定建立（模組層級 __getattr__），
+既有的 `from app.main import app` 與 `uvicorn app.main:app` 不需要修改。
+啟動成本基準見 tests/benchmark/startup.py
 """
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+import asyncio
 import logging
 
-from .config import get_settings, Settings
-from .models import Item, ItemCreate, ItemUpdate, HealthCheck
-from .database import get_db, SessionLocal
+from .config import get_settings, settings_provider, Settings
 
-# 設定日誌
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+if TYPE_CHECKING:
+    from fastapi import FastAPI
 
-# 創建 FastAPI 應用
-app = FastAPI(
-    title="Full CI/CD Demo API",
-    description="完整的 CI/CD 示範專案",
-    version="1.0.0"
-)
-
-# CORS 設定
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 生產環境應該限制來源
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-@app.get("/")
-async def root():
-    """根路由 - 歡迎訊息"""
-    settings = get_settings()
-    return {
-        "message": "Welcome to Full CI/CD Demo API",
-        "version": "1.0.0",
-        "environment": settings.environment,
-        "docs": "/docs"
-    }
+# 日誌在 lifespan 啟動時設定（見 app/log.py）
+logger = logging.getLogger(__name__)
 
+# CORS 允許讀取的回應標頭
+CORS_EXPOSE_HEADERS = [
+    "ETag",
+    "X-Next-Cursor",
+    "X-Request-ID",
+    "Retry-After",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "Idempotent-Replayed",
+]
+
+
+async def prepare_database(dispose: bool = True) -> None:
+    """建立資料表並寫入示範資料（多 worker 時由 gunicorn master 在 fork 前先執行一次）"""
+    from .database import async_session_scope, dispose_engine, init_db
+    from .repository import DEMO_ITEMS, ItemRepository
+
+    try:
+        await init_db()
+        if get_settings().seed_demo_data:
+            async with async_session_scope() as db:
+                await ItemRepository(db).seed(DEMO_ITEMS)
+    finally:
+        if dispose:
+            await dispose_engine()
+
+
+@asynccontextmanager
+async def lifespan(app: "FastAPI"):
+    """啟動：建立資料表並寫入示範資料；關閉：釋放連線池"""
+    from .database import dispose_engine
+    from .log import setup_logging, shutdown_logging
+    from .metrics import flush_periodically, write_snapshot
 
-@app.get("/health", response_model=HealthCheck)
-async def health_check():
+    settings = get_settings()
+    setup_logging(settings)
+    await prepare_database(dispose=False)
+
+    metrics_dir = settings.metrics_multiproc_dir
+    flush_task = None
+    if settings.metrics_enabled and metrics_dir:
+        flush_task = asyncio.create_task(
+            flush_periodically(metrics_dir, settings.metrics_flush_interval)
+        )
+
+    # 設定熱更新：每個 worker 各自檢查 .env
+    watch_task = None
+    if settings.config_reload_interval > 0:
+        watch_task = asyncio.create_task(
+            settings_provider.watch(settings.config_reload_interval)
+        )
+
+    try:
+        yield
+    finally:
+        # 應用內發生例外時也要釋放連線，aiosqlite 的背景執行緒才會結束
+        if watch_task is not None:
+            watch_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await watch_task
+        if flush_task is not None:
+            flush_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await flush_task
+            write_snapshot(metrics_dir)
+        await dispose_engine()
+        shutdown_logging()
+
+
+def create_app(settings: Optional[Settings] = None) -> "FastAPI":
     """
-    健康檢查端點
+    建立 FastAPI 應用
 
-    檢查項目：
-    - 應用程式狀態
-    - 資料庫連線（如果已配置）
-    - 環境配置
+    settings 決定要註冊哪些中介層與文件頁面（監控指標、CORS、Swagger）；
+    未指定時使用 get_settings()。請求處理期間各模組仍以 get_settings() 讀取設定
     """
-    settings = get_settings()
-
-    checks = {
-        "application": "ok",
-        "database": "ok",  # 簡化版本，實際應該測試連線
-        "environment": settings.environment
-    }
-
-    is_healthy = all(v == "ok" for k, v in checks.items() if k != "environment")
-
-    if not is_healthy:
-        raise HTTPException(status_code=503, detail={
-            "status": "unhealthy",
-            "checks": checks
-        })
-
-    return {
-        "status": "healthy",
-        "version": "1.0.0",
-        "environment": settings.environment,
-        "checks": checks
-    }
-
-
-# Items CRUD API
-@app.get("/api/items", response_model=List[Item])
-async def list_items(
-    skip: int = 0,
-    limit: int = 100,
-    db: SessionLocal = Depends(get_db)
-):
-    """列出所有項目"""
-    # 簡化版本：使用記憶體存儲
-    # 實際專案應該從資料庫讀取
-    items = [
-        Item(id=1, name="Item 1", description="First item", price=10.50),
-        Item(id=2, name="Item 2", description="Second item", price=20.00),
-        Item(id=3, name="Item 3", description="Third item", price=15.75),
-    ]
-    return items[skip : skip + limit]
-
-
-@app.get("/api/items/{item_id}", response_model=Item)
-async def get_item(item_id: int):
-    """獲取單個項目"""
-    # 簡化版本
-    if item_id < 1 or item_id > 3:
-        raise HTTPException(status_code=404, detail="Item not found")
-
-    return Item(
-        id=item_id,
-        name=f"Item {item_id}",
-        description=f"Description for item {item_id}",
-        price=10.0 * item_id
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from .cache import ResponseCacheMiddleware
+    from .compression import CompressionMiddleware
+    from .idempotency import IdempotencyMiddleware, idempotency_samples
+    from .log import RequestIdMiddleware
+    from .metrics import MetricsMiddleware, registry
+    from .ratelimit import ConcurrencyLimitMiddleware, RateLimitMiddleware, limiter_samples
+    from .responses import DefaultJSONResponse
+    from .routes import global_exception_handler, router, runtime_samples
+
+    settings = settings or get_settings()
+    docs = settings.enable_swagger
+
+    app = FastAPI(
+        title="Full CI/CD Demo API",
+        description="完整的 CI/CD 示範專案",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=DefaultJSONResponse,
+        docs_url="/docs" if docs else None,
+        redoc_url="/redoc" if docs else None,
+        openapi_url="/openapi.json" if docs else None,
     )
+    app.include_router(router)
+    app.add_exception_handler(Exception, global_exception_handler)
 
+    # 回應快取：放在 CORS 內層，CORS 標頭依每個請求的 Origin 計算，不進快取
+    app.add_middleware(ResponseCacheMiddleware)
 
-@app.post("/api/items", response_model=Item, status_code=201)
-async def create_item(item: ItemCreate):
-    """創建新項目"""
-    logger.info(f"Creating new item: {item.name}")
-
-    # 簡化版本：返回創建的項目
-    return Item(
-        id=999,  # 實際應該由資料庫生成
-        name=item.name,
-        description=item.description,
-        price=item.price
-    )
+    # 冪等鍵：在限流內層（重試也計入額度），重試直接回傳保存的回應，不經過路由
+    app.add_middleware(IdempotencyMiddleware)
 
+    # 過載保護與限流：在快取外層（快取命中也計入額度），CORS 內層（429 / 503 也帶 CORS 標頭）
+    app.add_middleware(ConcurrencyLimitMiddleware)
+    app.add_middleware(RateLimitMiddleware)
 
-@app.put("/api/items/{item_id}", response_model=Item)
-async def update_item(item_id: int, item: ItemUpdate):
-    """更新項目"""
-    logger.info(f"Updating item {item_id}")
+    # CORS 設定
+    if settings.enable_cors:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],  # 生產環境應該限制來源
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=CORS_EXPOSE_HEADERS,
+        )
 
-    if item_id < 1 or item_id > 3:
-        raise HTTPException(status_code=404, detail="Item not found")
+    # 回應壓縮：在 CORS 外層、監控指標內層（回應大小以實際送出的位元組計算）
+    app.add_middleware(CompressionMiddleware)
 
-    return Item(
-        id=item_id,
-        name=item.name or f"Item {item_id}",
-        description=item.description or f"Description for item {item_id}",
-        price=item.price or 10.0
-    )
+    # 監控指標：最外層，延遲包含快取與 CORS 的處理時間
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
 
+    # 請求 ID：最外層，其他中介層與路由的日誌都帶有同一個 ID
+    app.add_middleware(RequestIdMiddleware)
 
-@app.delete("/api/items/{item_id}", status_code=204)
-async def delete_item(item_id: int):
-    """刪除項目"""
-    logger.info(f"Deleting item {item_id}")
+    registry.add_collector(runtime_samples)
+    registry.add_collector(limiter_samples)
+    registry.add_collector(idempotency_samples)
+    return app
 
-    if item_id < 1 or item_id > 3:
-        raise HTTPException(status_code=404, detail="Item not found")
 
-    return None
+@lru_cache()
+def get_app() -> "FastAPI":
+    """以預設設定建立的應用（單例）；`app.main:app` 就是這個物件"""
+    return create_app()
 
 
-# 錯誤處理
-@app.exception_handler(Exception)
-async def global_exception_handler(request, exc):
-    """全域錯誤處理"""
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
-        status_code=500,
-        content={"detail": "Internal server error"}
-    )
+def __getattr__(name: str):
+    # PEP 562：第一次存取 app.main.app 時才建立應用
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 多 worker 啟動器（gunicorn + uvicorn worker），設定見 app/server.py
+    from app.server import main as serve
+
+    serve()
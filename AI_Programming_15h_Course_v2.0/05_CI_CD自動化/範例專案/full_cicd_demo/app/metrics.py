@@ -0,0 +1,362 @@
+"""
+Prometheus 格式的監控指標
+
+- MetricsMiddleware（純 ASGI）記錄每個路由樣板（例如 /api/items/{item_id}）的
+  請求數、進行中請求數、延遲、回應大小與資料庫耗時
+- 記錄時只做 dict 查找與整數加法，不加鎖：事件迴圈是單執行緒，每個 worker 各自累計
+- 多 worker 時各自把快照寫到 metrics_multiproc_dir，/metrics 被抓取時才合併；
+  worker 結束後 master 把它的計數併入 metrics-retired.json 並刪除快照（retire_snapshot）
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Prometheus 預設的延遲分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 回應大小分桶（bytes）
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# 目前請求累計的資料庫耗時；存放可變的 list，執行緒池與 greenlet 內也能累加
+_db_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "db_time", default=None
+)
+
+# collector 回傳 (名稱, 類型, 說明, 標籤, 數值)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+class Histogram:
+    """非累積的分桶計數，輸出時才轉成 Prometheus 的累積格式"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """單一 worker 的指標"""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight = 0
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def record(
+        self, method: str, route: str, status: int, duration: float, size: int, db_time: float
+    ) -> None:
+        key = (method, route)
+        counter_key = (method, route, status)
+        self.requests[counter_key] = self.requests.get(counter_key, 0) + 1
+
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.sizes[key] = Histogram(SIZE_BUCKETS)
+            self.db_time[key] = Histogram(LATENCY_BUCKETS)
+        latency.observe(duration)
+        self.sizes[key].observe(size)
+        self.db_time[key].observe(db_time)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """註冊抓取時才計算的指標（快取命中、連線池狀態等）；重複註冊會被忽略"""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """可序列化的快照，用來跨 worker 合併"""
+
+        def histograms(data: Dict[Tuple[str, str], Histogram]) -> list:
+            return [[m, r, h.counts, h.sum] for (m, r), h in data.items()]
+
+        samples = []
+        for collector in self.collectors:
+            samples.extend(list(sample) for sample in collector())
+
+        return {
+            "requests": [[m, r, s, c] for (m, r, s), c in self.requests.items()],
+            "latency": histograms(self.latency),
+            "sizes": histograms(self.sizes),
+            "db_time": histograms(self.db_time),
+            "in_flight": self.in_flight,
+            "samples": samples,
+        }
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """合併多個 worker 的快照：計數與分桶相加"""
+    merged = {"requests": {}, "latency": {}, "sizes": {}, "db_time": {}, "in_flight": 0,
+              "samples": {}}
+
+    for snap in snapshots:
+        for m, r, s, c in snap["requests"]:
+            merged["requests"][(m, r, s)] = merged["requests"].get((m, r, s), 0) + c
+        for name in ("latency", "sizes", "db_time"):
+            for m, r, counts, total in snap[name]:
+                current = merged[name].get((m, r))
+                if current is None:
+                    merged[name][(m, r)] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+        merged["in_flight"] += snap["in_flight"]
+        for name, kind, help_text, labels, value in snap["samples"]:
+            key = (name, kind, help_text, tuple(sorted(labels.items())))
+            merged["samples"][key] = merged["samples"].get(key, 0) + value
+
+    return merged
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, bounds, data: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), (counts, total) in sorted(data.items()):
+        cumulative = 0
+        for bound, count in zip(list(bounds) + ["+Inf"], counts):
+            cumulative += count
+            le = bound if bound == "+Inf" else repr(float(bound))
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {total}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {cumulative}")
+
+
+def render(snapshot: dict) -> str:
+    """輸出 Prometheus text format（version 0.0.4）"""
+    lines = [
+        "# HELP http_requests_total Total HTTP requests",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(snapshot["requests"].items()):
+        lines.append(
+            f"http_requests_total{_labels(method=method, route=route, status=status)} {count}"
+        )
+
+    lines += [
+        "# HELP http_requests_in_flight HTTP requests currently being served",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {snapshot['in_flight']}",
+    ]
+    _render_histogram(lines, "http_request_duration_seconds", "HTTP request latency",
+                      LATENCY_BUCKETS, snapshot["latency"])
+    _render_histogram(lines, "http_response_size_bytes", "HTTP response body size",
+                      SIZE_BUCKETS, snapshot["sizes"])
+    _render_histogram(lines, "http_request_db_seconds", "Database time per HTTP request",
+                      LATENCY_BUCKETS, snapshot["db_time"])
+
+    declared = set()
+    for (name, kind, help_text, labels), value in sorted(snapshot["samples"].items()):
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name}{_labels(**dict(labels)) if labels else ''} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# 每個 worker 一個 registry
+registry = MetricsRegistry()
+
+
+# 已結束 worker 的累計計數
+RETIRED_SNAPSHOT = "metrics-retired.json"
+
+
+def snapshot_path(directory: str, pid: Optional[int] = None) -> str:
+    return os.path.join(directory, f"metrics-{pid or os.getpid()}.json")
+
+
+def _write_json(path: str, data: dict) -> None:
+    """先寫暫存檔再改名，讀取端不會讀到半個檔案"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(directory: str) -> None:
+    """把本 worker 的快照寫到共用目錄"""
+    os.makedirs(directory, exist_ok=True)
+    _write_json(snapshot_path(directory), registry.snapshot())
+
+
+def _without_gauges(snap: dict) -> dict:
+    """已結束的 worker 只保留計數；進行中請求數、連線池狀態等 gauge 已經沒有意義"""
+    return {**snap, "in_flight": 0,
+            "samples": [sample for sample in snap["samples"] if sample[1] != "gauge"]}
+
+
+def _as_snapshot(merged: dict) -> dict:
+    """merge_snapshots 的結果轉回快照格式（可以寫回檔案再合併）"""
+    snap = {
+        "requests": [[m, r, s, c] for (m, r, s), c in merged["requests"].items()],
+        "in_flight": merged["in_flight"],
+        "samples": [[name, kind, help_text, dict(labels), value]
+                    for (name, kind, help_text, labels), value in merged["samples"].items()],
+    }
+    for name in ("latency", "sizes", "db_time"):
+        snap[name] = [[m, r, counts, total] for (m, r), (counts, total) in merged[name].items()]
+    return snap
+
+
+def _load(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # 不存在、正在寫入或已經移除
+
+
+def retire_snapshot(directory: str, pid: int) -> None:
+    """
+    worker 結束後，把它的計數併入 metrics-retired.json 並刪除它的快照
+
+    由 gunicorn master 的 child_exit hook 呼叫（master 單一執行緒，不會同時改寫彙總檔），
+    避免 max_requests 輪替 worker 時快照檔無限累積
+    """
+    path = snapshot_path(directory, pid)
+    dead = _load(path)
+    if dead is not None:
+        retired = _load(os.path.join(directory, RETIRED_SNAPSHOT))
+        merged = merge_snapshots([_without_gauges(dead)] + ([retired] if retired else []))
+        _write_json(os.path.join(directory, RETIRED_SNAPSHOT), _as_snapshot(merged))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # 行程存在但屬於其他使用者
+        return True
+    return True
+
+
+async def flush_periodically(directory: str, interval: float) -> None:
+    """背景工作：定期寫入快照，讓其他 worker 被抓取時也看得到本 worker 的數據"""
+    while True:
+        write_snapshot(directory)
+        await asyncio.sleep(interval)
+
+
+def collect(directory: Optional[str] = None) -> str:
+    """
+    產生 /metrics 內容
+
+    有設定共用目錄時，先更新本 worker 的快照，再合併所有 worker 的快照；
+    尚未被 retire_snapshot 清掉的已結束 worker 只計入計數，不計入 gauge
+    """
+    if not directory:
+        return render(merge_snapshots([registry.snapshot()]))
+
+    write_snapshot(directory)
+    snapshots = []
+    for name in os.listdir(directory):
+        if not (name.startswith("metrics-") and name.endswith(".json")):
+            continue
+        snap = _load(os.path.join(directory, name))
+        if snap is None:
+            continue
+        pid = name[len("metrics-"):-len(".json")]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            snap = _without_gauges(snap)
+        snapshots.append(snap)
+    return render(merge_snapshots(snapshots))
+
+
+def instrument_engine(engine) -> None:
+    """在 Engine 上掛事件，把 SQL 執行時間累加到目前請求"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        timer = _db_time.get()
+        if timer is not None:
+            timer[0] += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    請求指標中介層（純 ASGI）
+
+    路由標籤使用路由樣板而不是實際路徑，避免 /api/items/1、/api/items/2 …
+    產生無限多個時間序列
+    """
+
+    def __init__(self, app, metrics: MetricsRegistry = registry):
+        self.app = app
+        self.metrics = metrics
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+
+        # 沒有經過路由（例如快取命中）時才逐一比對路由表
+        router = scope.get("app")
+        for candidate in getattr(getattr(router, "router", None), "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match.name == "FULL":
+                return candidate.path
+        return "<unmatched>"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+        db_timer = [0.0]
+        token = _db_time.set(db_timer)
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            _db_time.reset(token)
+            self.metrics.record(
+                scope["method"], self._route_template(scope), status, duration, size, db_timer[0]
+            )
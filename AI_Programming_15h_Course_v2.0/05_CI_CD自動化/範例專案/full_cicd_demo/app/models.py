@@ -1,8 +1,9 @@
 """
 Pydantic 資料模型
 """
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class ItemBase(BaseModel):
@@ -32,9 +33,43 @@ class Item(ItemBase):
         from_attributes = True
 
 
+class ItemBulkUpdate(ItemUpdate):
+    """批次更新的單筆資料（需指定 id）"""
+    id: int
+
+
+class BulkItemResult(BaseModel):
+    """批次操作的單筆結果（index 對應請求陣列中的位置）"""
+    index: int
+    id: Optional[int] = None
+    status: str  # created / updated / deleted / not_found
+
+
+class BulkResponse(BaseModel):
+    """批次操作回應模型"""
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
 class HealthCheck(BaseModel):
     """健康檢查回應模型"""
     status: str
     version: str
     environment: str
     checks: dict
+
+
+class ProbeResult(BaseModel):
+    """單一相依服務的檢查結果"""
+    status: str  # ok / error / timeout
+    latency_ms: float
+    error: Optional[str] = None
+
+
+class ReadinessCheck(BaseModel):
+    """就緒檢查回應模型"""
+    status: str  # ready / not_ready
+    checks: Dict[str, ProbeResult]
+    cached: bool  # 是否為快取的檢查結果
+    checked_at: datetime
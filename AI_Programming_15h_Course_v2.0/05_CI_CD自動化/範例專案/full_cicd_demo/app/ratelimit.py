@@ -0,0 +1,367 @@
+"""
+限流與過載保護
+
+- 令牌桶限流：每個 API key（未帶時以客戶端 IP）一個桶，每秒補充 rate_limit_per_second 個令牌，
+  最多累積 rate_limit_burst 個；令牌用完回 429 + Retry-After。
+  未設定 redis_url 時在行程內計算，設定時以 Redis Lua 腳本原子更新（多個 worker 共用額度）
+- 自適應並行上限：同時處理的請求超過上限時排隊，排隊超過 concurrency_queue_target_ms
+  直接回 503 + Retry-After；佇列不會無限增長，過載時的尾端延遲約為處理時間 + 排隊目標。
+  上限依請求延遲調整：延遲接近無負載時的水準就放寬，延遲升高（資料庫等下游飽和）就收緊
+- /health、/ready、/metrics 不受限制：過載時仍要能回應探測與抓取指標
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import suppress
+from functools import lru_cache
+from typing import Deque, NamedTuple, Optional, Tuple
+
+from .config import get_settings, settings_provider
+
+logger = logging.getLogger(__name__)
+
+EXEMPT_PATHS = frozenset({"/health", "/ready", "/metrics"})
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # 秒；allowed 時為 0
+
+
+class MemoryTokenBucket:
+    """
+    行程內令牌桶
+
+    桶依最近使用排序，超過 max_keys 時丟棄最久沒有請求的（它們多半已經補滿）
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # 令牌數, 更新時間
+
+    async def acquire(self, key: str) -> Decision:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (1 - tokens) / self.rate
+        return Decision(allowed, int(tokens), retry_after)
+
+
+# 以 Redis 伺服器時間計算，多台主機的時鐘誤差不影響補充速度
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisTokenBucket:
+    """
+    Redis 令牌桶（多個 worker / 多台主機共用額度）
+
+    讀取、補充、扣除在同一個 Lua 腳本內完成，並行請求不會超額；
+    桶在補滿所需時間後自動過期
+    """
+
+    def __init__(self, client, rate: float, burst: int, prefix: str = "ratelimit:"):
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.ttl = math.ceil(burst / rate) + 1
+        self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, rate: float, burst: int) -> "RedisTokenBucket":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - 依安裝環境而定
+            raise RuntimeError("使用 Redis 限流需要安裝 redis 套件") from exc
+        return cls(redis_asyncio.from_url(url), rate, burst)
+
+    async def acquire(self, key: str) -> Decision:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key], args=[self.rate, self.burst, self.ttl]
+        )
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (1 - tokens) / self.rate
+        return Decision(bool(allowed), int(tokens), retry_after)
+
+
+class RateLimiter:
+    """限流前端：決定限流鍵並統計結果；後端無法使用時放行（fail open）"""
+
+    def __init__(self, backend, key_header: str = "X-API-Key"):
+        self.backend = backend
+        self.key_header = key_header.lower().encode("latin-1")
+        self.decisions = {"allowed": 0, "limited": 0, "error": 0}
+
+    def client_key(self, scope) -> str:
+        """有 API key 時以 key 計算（雜湊後保存，不把金鑰寫進 Redis），否則用客戶端 IP"""
+        for name, value in scope["headers"]:
+            if name == self.key_header and value:
+                return "key:" + hashlib.sha256(value).hexdigest()[:32]
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def check(self, scope) -> Decision:
+        try:
+            decision = await self.backend.acquire(self.client_key(scope))
+        except Exception as exc:  # 限流只是保護機制，不能因為 Redis 中斷讓整個服務失敗
+            self.decisions["error"] += 1
+            logger.warning("限流後端無法使用，暫時放行: %s", exc)
+            return Decision(True, self.backend.burst, 0.0)
+        self.decisions["allowed" if decision.allowed else "limited"] += 1
+        return decision
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自適應並行上限
+
+    上限調整參考 Netflix concurrency-limits 的 gradient 演算法：
+    以長期延遲（接近無負載時的水準）與短期延遲的比值為梯度，
+    新上限 = 上限 × 梯度 + √上限（保留少量排隊空間），再以指數移動平均平滑；
+    只有請求數接近上限時才放寬，避免低流量時上限無意義地增長
+    """
+
+    def __init__(
+        self,
+        initial: int = 64,
+        min_limit: int = 8,
+        max_limit: int = 512,
+        queue_target: float = 0.1,
+        tolerance: float = 2.0,
+        smoothing: float = 0.2,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_target = queue_target
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+
+    async def acquire(self) -> bool:
+        """取得處理名額；排隊超過 queue_target 時回傳 False"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_target)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:  # 客戶端在排隊時斷線
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()  # 名額已經交給這個請求，轉給下一個
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self, latency: float) -> None:
+        """請求處理完成：更新上限並把名額交給排隊中的請求"""
+        self._update_limit(latency)
+        self._release_slot()
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        # 逾時與轉交可能同時發生：已取消的等待者可能已被 _release_slot 取出
+        with suppress(ValueError):
+            self._waiters.remove(waiter)
+
+    def _release_slot(self) -> None:
+        # 名額直接轉交給下一個排隊的請求，in_flight 不變
+        while self._waiters and self.in_flight <= int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _update_limit(self, latency: float) -> None:
+        if self._short_latency is None:
+            self._short_latency = self._long_latency = latency
+            return
+        self._short_latency += (latency - self._short_latency) * 0.1
+        self._long_latency += (latency - self._long_latency) * 0.005
+        # 長期延遲只隨短期延遲緩慢上升；短期延遲更低時直接跟上
+        self._long_latency = min(self._long_latency, self._short_latency)
+
+        gradient = max(0.5, min(1.0, self.tolerance * self._long_latency / self._short_latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+        if limit > self.limit and self.in_flight < self.limit / 2:
+            return  # 流量遠低於上限時，延遲正常不代表能承受更多
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """獲取限流器（單例）：有設定 redis_url 時使用 Redis"""
+    settings = get_settings()
+    rate, burst = settings.rate_limit_per_second, settings.rate_limit_burst
+    if settings.redis_url:
+        backend = RedisTokenBucket.from_url(settings.redis_url, rate, burst)
+    else:
+        backend = MemoryTokenBucket(rate, burst)
+    return RateLimiter(backend, key_header=settings.rate_limit_key_header)
+
+
+@lru_cache()
+def get_concurrency_limiter() -> AdaptiveConcurrencyLimiter:
+    """獲取並行上限（單例，每個 worker 各自調整）"""
+    settings = get_settings()
+    return AdaptiveConcurrencyLimiter(
+        initial=settings.concurrency_limit_initial,
+        min_limit=settings.concurrency_limit_min,
+        max_limit=settings.concurrency_limit_max,
+        queue_target=settings.concurrency_queue_target_ms / 1000,
+    )
+
+
+# 設定熱更新：換成依新設定建立的限流器（進行中的請求仍在舊的限流器上釋放名額）
+settings_provider.reset_on_change(get_rate_limiter, {
+    "redis_url", "rate_limit_per_second", "rate_limit_burst", "rate_limit_key_header",
+})
+settings_provider.reset_on_change(get_concurrency_limiter, {
+    "concurrency_limit_initial", "concurrency_limit_min", "concurrency_limit_max",
+    "concurrency_queue_target_ms",
+})
+
+
+def limiter_samples():
+    """/metrics：限流決策與並行上限狀態（只回報已建立的限流器）"""
+    if get_rate_limiter.cache_info().currsize:
+        for decision, count in get_rate_limiter().decisions.items():
+            yield ("rate_limit_decisions_total", "counter", "Rate limiter decisions",
+                   {"decision": decision}, count)
+    if get_concurrency_limiter.cache_info().currsize:
+        limiter = get_concurrency_limiter()
+        yield ("concurrency_limit", "gauge", "Current adaptive concurrency limit", {},
+               round(limiter.limit, 2))
+        yield ("concurrency_queued", "gauge", "Requests waiting for a slot", {}, limiter.queued)
+        yield ("concurrency_admitted_total", "counter", "Requests admitted by the limiter", {},
+               limiter.admitted)
+        yield ("concurrency_shed_total", "counter", "Requests rejected after queueing too long",
+               {}, limiter.shed)
+
+
+async def _reject(send, status: int, detail: bytes, headers: list) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")] + headers,
+    })
+    await send({"type": "http.response.body", "body": b'{"detail":"' + detail + b'"}'})
+
+
+class RateLimitMiddleware:
+    """
+    令牌桶限流中介層（純 ASGI）
+
+    回應帶 X-RateLimit-Limit / X-RateLimit-Remaining；被限流時回 429 + Retry-After
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] in EXEMPT_PATHS
+            or not get_settings().rate_limit_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_rate_limiter()
+        decision = await limiter.check(scope)
+        headers = [
+            (b"x-ratelimit-limit", str(limiter.backend.burst).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+        ]
+        if not decision.allowed:
+            retry_after = str(max(1, math.ceil(decision.retry_after))).encode()
+            headers.append((b"retry-after", retry_after))
+            await _reject(send, 429, b"Too Many Requests", headers)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    過載保護中介層（純 ASGI）
+
+    名額保留到回應完全送出為止（串流匯出也算在內）；排隊逾時回 503 + Retry-After
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] in EXEMPT_PATHS
+            or not get_settings().load_shedding_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_concurrency_limiter()
+        if not await limiter.acquire():
+            retry_after = str(max(1, math.ceil(limiter.queue_target))).encode()
+            await _reject(send, 503, b"Service overloaded", [(b"retry-after", retry_after)])
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
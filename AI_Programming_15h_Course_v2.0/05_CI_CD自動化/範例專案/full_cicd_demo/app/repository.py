@@ -0,0 +1,399 @@
+"""
+Items 資料存取層（Repository）
+
+- items 資料表：主鍵索引 + 支援排序分頁的複合索引
+- 所有 CRUD 路由都透過 ItemRepository 存取資料庫
+- 查詢都走索引（主鍵查找 / 索引範圍掃描），資料量大時仍是 O(log n)
+- 列表使用 keyset（cursor）分頁：依排序鍵定位，深頁與第一頁成本相同
+- 批次寫入使用 executemany / 多列 INSERT，整批在同一個交易內完成
+- 每筆資料有 version / updated_at，集合層級另有 collection_versions，
+  提供 ETag / Last-Modified 而不需要序列化回應本體
+"""
+import base64
+import binascii
+import json
+import math
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple
+
+from fastapi import Depends
+from sqlalchemy import (
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    bindparam,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base, get_async_db
+from .models import ItemBulkUpdate, ItemCreate, ItemUpdate
+
+
+def utcnow() -> datetime:
+    """目前 UTC 時間（資料庫內以不含時區的 UTC 儲存）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ItemRecord(Base):
+    """items 資料表"""
+
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    price: Mapped[float] = mapped_column(Float, nullable=False)
+    # 每次更新遞增，作為單筆資料的 ETag
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        # 依名稱或價格排序分頁時使用；id 作為同值時的決勝欄位
+        Index("ix_items_name_id", "name", "id"),
+        Index("ix_items_price_id", "price", "id"),
+    )
+
+
+class CollectionVersion(Base):
+    """
+    集合層級的版本（列表端點的 ETag / Last-Modified）
+
+    任何新增、更新、刪除都在同一個交易內遞增，刪除也會反映在列表的 ETag 上
+    """
+
+    __tablename__ = "collection_versions"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+ITEMS_COLLECTION = "items"
+
+
+def _upsert(dialect: str):
+    """各資料庫的 INSERT ... ON CONFLICT；方言模組在用到時才匯入（postgresql 會連帶載入 asyncpg 方言）"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+# 單頁筆數上限
+MAX_PAGE_SIZE = 1000
+
+# 單次批次操作的筆數上限
+MAX_BULK_SIZE = 50_000
+
+# IN (...) 每次最多帶入的參數數量（SQLite 有參數數量上限）
+IN_CLAUSE_CHUNK = 500
+
+# 可排序的欄位；"-price" 表示遞減
+SORT_COLUMNS = {
+    "id": ItemRecord.id,
+    "name": ItemRecord.name,
+    "price": ItemRecord.price,
+}
+SORT_PATTERN = r"^-?(id|name|price)$"
+
+# cursor 中排序鍵的 JSON 型別（price 可能被序列化成整數）
+CURSOR_VALUE_TYPES = {"id": (int,), "name": (str,), "price": (int, float)}
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+class InvalidCursorError(ValueError):
+    """cursor 格式錯誤或與排序方式不符"""
+
+
+def encode_cursor(sort: str, record: ItemRecord) -> str:
+    """把最後一筆的排序鍵編碼成不透明的 cursor 字串"""
+    key = sort.lstrip("-")
+    payload = {"s": sort, "v": getattr(record, key), "i": record.id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _is_cursor_value(value: object, types: Tuple[type, ...]) -> bool:
+    """型別相符，且是 SQLite / PostgreSQL 能比較的值（int64 範圍內的整數、有限的浮點數）"""
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    if isinstance(value, int):
+        return INT64_MIN <= value <= INT64_MAX
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return True
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, int]:
+    """解碼 cursor，回傳 (排序鍵的值, id)；內容被竄改時拋出 InvalidCursorError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, item_id = payload["v"], payload["i"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+    if payload.get("s") != sort:
+        raise InvalidCursorError("Cursor does not match sort order")
+    if not (_is_cursor_value(value, CURSOR_VALUE_TYPES[sort.lstrip("-")])
+            and _is_cursor_value(item_id, (int,))):
+        raise InvalidCursorError("Invalid cursor")
+    return value, item_id
+
+
+def _chunked(values: Sequence[int], size: int) -> Iterator[Sequence[int]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# 示範資料：資料表為空時寫入
+DEMO_ITEMS = [
+    ItemCreate(name="Item 1", description="First item", price=10.50),
+    ItemCreate(name="Item 2", description="Second item", price=20.00),
+    ItemCreate(name="Item 3", description="Third item", price=15.75),
+]
+
+
+class ItemRepository:
+    """Items 資料存取"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def dialect(self) -> str:
+        return self.db.sync_session.get_bind().dialect.name
+
+    async def collection_state(self) -> Tuple[int, Optional[datetime]]:
+        """items 集合目前的 (版本, 最後修改時間)；以主鍵讀取一列"""
+        stmt = select(CollectionVersion.version, CollectionVersion.updated_at).where(
+            CollectionVersion.name == ITEMS_COLLECTION
+        )
+        row = (await self.db.execute(stmt)).first()
+        return (row.version, row.updated_at) if row else (0, None)
+
+    async def _touch_collection(self, now: Optional[datetime] = None) -> None:
+        """遞增集合版本（在呼叫端的交易內執行，與資料變更一起提交）"""
+        now = now or utcnow()
+        stmt = _upsert(self.dialect)(CollectionVersion).values(
+            name=ITEMS_COLLECTION, version=1, updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CollectionVersion.name],
+            set_={"version": CollectionVersion.version + 1, "updated_at": now},
+        )
+        await self.db.execute(stmt)
+
+    async def list_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        skip: int = 0,
+    ) -> Tuple[Sequence[ItemRecord], Optional[str]]:
+        """
+        列出一頁項目，回傳 (項目, 下一頁 cursor)
+
+        有 cursor 時以 WHERE (排序鍵, id) > (上一頁最後一筆) 定位，
+        走 (排序鍵, id) 索引直接跳到下一頁；沒有 cursor 時才使用 skip（OFFSET）。
+        多取一筆用來判斷是否還有下一頁。
+        """
+        descending = sort.startswith("-")
+        key = sort.lstrip("-")
+        column = SORT_COLUMNS[key]
+
+        stmt = select(ItemRecord)
+        if cursor is not None:
+            value, last_id = decode_cursor(cursor, sort)
+            if key == "id":
+                position, seek = ItemRecord.id, last_id
+            else:
+                position, seek = tuple_(column, ItemRecord.id), tuple_(value, last_id)
+            stmt = stmt.where(position < seek if descending else position > seek)
+        elif skip:
+            stmt = stmt.offset(skip)
+
+        order_by = [column] if key == "id" else [column, ItemRecord.id]
+        if descending:
+            order_by = [col.desc() for col in order_by]
+        stmt = stmt.order_by(*order_by).limit(limit + 1)
+
+        items = (await self.db.scalars(stmt)).all()
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, encode_cursor(sort, items[-1])
+
+    async def stream_rows(self, batch_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        """
+        以伺服器端 cursor 依 id 順序逐批讀出所有項目
+
+        只選欄位、不建立 ORM 物件；每批最多 batch_size 列，記憶體用量與資料量無關
+        """
+        stmt = select(
+            ItemRecord.id, ItemRecord.name, ItemRecord.description, ItemRecord.price
+        ).order_by(ItemRecord.id)
+        result = await self.db.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+
+    async def get(self, item_id: int) -> Optional[ItemRecord]:
+        """以主鍵查找單個項目"""
+        return await self.db.get(ItemRecord, item_id)
+
+    async def count(self) -> int:
+        """項目總數"""
+        return await self.db.scalar(select(func.count()).select_from(ItemRecord))
+
+    async def create(self, data: ItemCreate) -> ItemRecord:
+        """新增項目，id 由資料庫產生"""
+        record = ItemRecord(**data.model_dump())
+        self.db.add(record)
+        await self._touch_collection()
+        await self.db.commit()
+        return record
+
+    async def update(self, item_id: int, data: ItemUpdate) -> Optional[ItemRecord]:
+        """
+        部分更新：只寫入有提供的欄位（值為 null 的欄位視為未提供，保留原值）
+
+        單一 UPDATE ... RETURNING，version 在資料庫內 +1，併發更新也不會遺漏
+        """
+        now = utcnow()
+        stmt = (
+            update(ItemRecord)
+            .where(ItemRecord.id == item_id)
+            .values(
+                **data.model_dump(exclude_none=True),
+                version=ItemRecord.version + 1,
+                updated_at=now,
+            )
+            .returning(ItemRecord)
+        )
+        # populate_existing：Session 內已有這筆物件時，以 RETURNING 的值覆蓋
+        stmt = select(ItemRecord).from_statement(stmt).execution_options(populate_existing=True)
+        record = await self.db.scalar(stmt)
+        if record is None:
+            await self.db.rollback()
+            return None
+        await self._touch_collection(now)
+        await self.db.commit()
+        return record
+
+    async def delete(self, item_id: int) -> bool:
+        """刪除項目，回傳是否有刪除到資料"""
+        result = await self.db.execute(delete(ItemRecord).where(ItemRecord.id == item_id))
+        if result.rowcount > 0:
+            await self._touch_collection()
+        await self.db.commit()
+        return result.rowcount > 0
+
+    async def bulk_create(self, items: Sequence[ItemCreate]) -> List[int]:
+        """
+        批次新增，回傳依輸入順序排列的 id（整批在同一個交易內提交）
+
+        - PostgreSQL：合併成多列 INSERT ... RETURNING，保證 id 與輸入順序對應
+        - SQLite：不支援有序的多列 RETURNING，改用 executemany；交易持有寫入鎖期間
+          rowid 依序遞增，因此這批 id 就是 last_insert_rowid() 往前連續 n 個
+        """
+        rows = [item.model_dump() for item in items]
+
+        if self.dialect == "sqlite":
+            await self.db.execute(insert(ItemRecord), rows)
+            last_id = await self.db.scalar(text("SELECT last_insert_rowid()"))
+            ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        else:
+            stmt = insert(ItemRecord).returning(ItemRecord.id, sort_by_parameter_order=True)
+            ids = list((await self.db.scalars(stmt, rows)).all())
+
+        await self._touch_collection()
+        await self.db.commit()
+        return ids
+
+    async def bulk_update(self, updates: Sequence[ItemBulkUpdate]) -> List[bool]:
+        """
+        批次部分更新，回傳每一筆是否找到對應項目
+
+        依「要更新哪些欄位」分組，每組一個 executemany UPDATE（version 在資料庫內 +1），
+        值為 null 的欄位與單筆更新一樣保留原值；
+        整批在同一個交易內提交
+        """
+        existing = await self._existing_ids([u.id for u in updates])
+
+        groups: Dict[FrozenSet[str], List[dict]] = {}
+        for u in updates:
+            fields = u.model_dump(exclude_none=True, exclude={"id"})
+            if u.id in existing and fields:
+                row = {f"b_{k}": v for k, v in fields.items()}
+                row["b_id"] = u.id
+                groups.setdefault(frozenset(fields), []).append(row)
+
+        now = utcnow()
+        table = ItemRecord.__table__
+        for keys, rows in groups.items():
+            stmt = (
+                table.update()
+                .where(table.c.id == bindparam("b_id"))
+                .values({k: bindparam(f"b_{k}") for k in keys})
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            await self.db.execute(stmt, rows)
+
+        if groups:
+            await self._touch_collection(now)
+        await self.db.commit()
+        return [u.id in existing for u in updates]
+
+    async def bulk_delete(self, item_ids: Sequence[int]) -> List[bool]:
+        """批次刪除，回傳每一筆是否有刪除到資料"""
+        deleted: Set[int] = set()
+        for chunk in _chunked(sorted(set(item_ids)), IN_CLAUSE_CHUNK):
+            stmt = (
+                delete(ItemRecord)
+                .where(ItemRecord.id.in_(chunk))
+                .returning(ItemRecord.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted.update((await self.db.scalars(stmt)).all())
+        if deleted:
+            await self._touch_collection()
+        await self.db.commit()
+        return [item_id in deleted for item_id in item_ids]
+
+    async def _existing_ids(self, item_ids: Sequence[int]) -> Set[int]:
+        """查詢哪些 id 存在（分段 IN 查詢，走主鍵索引）"""
+        found: Set[int] = set()
+        for chunk in _chunked(sorted(set(item_ids)), IN_CLAUSE_CHUNK):
+            stmt = select(ItemRecord.id).where(ItemRecord.id.in_(chunk))
+            found.update((await self.db.scalars(stmt)).all())
+        return found
+
+    async def seed(self, items: List[ItemCreate]) -> None:
+        """資料表為空時寫入初始資料"""
+        if await self.count():
+            return
+        self.db.add_all([ItemRecord(**item.model_dump()) for item in items])
+        await self._touch_collection()
+        await self.db.commit()
+
+
+def get_item_repository(db: AsyncSession = Depends(get_async_db)) -> ItemRepository:
+    """
+    獲取 ItemRepository
+
+    使用方式：
+    repo = Depends(get_item_repository)
+    """
+    return ItemRepository(db)
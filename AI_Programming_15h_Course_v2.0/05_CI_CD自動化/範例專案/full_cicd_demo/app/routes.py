@@ -0,0 +1,401 @@
+"""
+API 路由
+
+由 create_app() 在建立應用時才匯入並註冊（見 app/main.py）
+"""
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from .cache import ResponseCache, get_cache
+from .conditional import (
+    collection_etag,
+    etag_matches,
+    http_date,
+    item_etag,
+    not_modified_since,
+)
+from .config import get_settings
+from .database import active_engines, get_pool_stats
+from .export import export_items_ndjson
+from .health import HealthChecker, get_health_checker
+from .log import dropped_records
+from .metrics import collect
+from .models import (
+    BulkItemResult,
+    BulkResponse,
+    HealthCheck,
+    Item,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemUpdate,
+    ReadinessCheck,
+)
+from .repository import (
+    ITEMS_COLLECTION,
+    MAX_BULK_SIZE,
+    MAX_PAGE_SIZE,
+    SORT_PATTERN,
+    InvalidCursorError,
+    ItemRepository,
+    decode_cursor,
+    get_item_repository,
+)
+from .responses import DefaultJSONResponse, items_response
+from .search import (
+    MAX_SEARCH_PAGE_SIZE,
+    RELEVANCE_CANDIDATES,
+    SEARCH_SORT_PATTERN,
+    ItemSearch,
+    SearchQuery,
+    get_item_search,
+    parse_terms,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/")
+async def root():
+    """根路由 - 歡迎訊息"""
+    settings = get_settings()
+    return {
+        "message": "Welcome to Full CI/CD Demo API",
+        "version": "1.0.0",
+        "environment": settings.environment,
+        "docs": "/docs"
+    }
+
+
+@router.get("/cache/stats", include_in_schema=False)
+async def cache_stats():
+    """回應快取命中統計"""
+    return get_cache().stats()
+
+
+def runtime_samples():
+    """抓取 /metrics 時才計算的指標：快取命中與連線池狀態"""
+    cache_stats = get_cache().stats()
+    yield ("app_cache_hits_total", "counter", "Response cache hits", {}, cache_stats["hits"])
+    yield ("app_cache_misses_total", "counter", "Response cache misses", {},
+           cache_stats["misses"])
+
+    for name, engine in active_engines().items():
+        stats = get_pool_stats(engine)
+        labels = {"engine": name}
+        yield ("db_pool_checked_out", "gauge", "Connections currently checked out", labels,
+               stats.get("checked_out", 0))
+        yield ("db_pool_checkouts_total", "counter", "Connection checkouts", labels,
+               stats.get("checkouts", 0))
+        yield ("db_pool_connects_total", "counter", "New database connections", labels,
+               stats.get("connects", 0))
+        yield ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection",
+               labels, stats.get("wait_total_ms", 0.0) / 1000)
+
+    yield ("log_records_dropped_total", "counter", "Log records dropped because the queue was full",
+           {}, dropped_records())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 監控指標（text format 0.0.4）"""
+    settings = get_settings()
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(
+        collect(settings.metrics_multiproc_dir),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@router.get("/health", response_model=HealthCheck)
+async def health_check():
+    """
+    存活檢查（liveness）
+
+    只確認行程能處理請求，不檢查相依服務：資料庫暫時中斷時不應該讓容器被重啟。
+    相依服務的狀態請看 /ready
+    """
+    settings = get_settings()
+
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "environment": settings.environment,
+        "checks": {
+            "application": "ok",
+            "environment": settings.environment
+        }
+    }
+
+
+@router.get("/ready", response_model=ReadinessCheck, responses={503: {"model": ReadinessCheck}})
+async def readiness_check(checker: HealthChecker = Depends(get_health_checker)):
+    """
+    就緒檢查（readiness）
+
+    並行檢查資料庫與 Redis（有設定時），附上各自的延遲；
+    任一項失敗回傳 503，負載平衡器應暫停導流。結果會短暫快取
+    """
+    result = await checker.check()
+    if result.status != "ready":
+        return DefaultJSONResponse(status_code=503, content=result.model_dump(mode="json"))
+    return result
+
+
+# Items CRUD API
+@router.get("/api/items", response_model=List[Item])
+async def list_items(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern=SORT_PATTERN),
+    repo: ItemRepository = Depends(get_item_repository)
+):
+    """
+    列出項目
+
+    分頁方式：
+    - cursor（建議）：帶入上一頁回應的 X-Next-Cursor 標頭，深頁成本與第一頁相同
+    - skip/limit（相容舊版）：OFFSET 分頁，越後面的頁越慢
+    - sort：id / name / price，加上 "-" 表示遞減
+    - limit 超過上限時以 MAX_PAGE_SIZE 為準
+
+    條件式請求：支援 If-None-Match（ETag）與 If-Modified-Since（Last-Modified），
+    集合沒有變動時回傳 304，不查詢也不序列化列表。
+    ETag 包含排序與分頁參數，不同頁不共用；參數無效時一律回傳 400，不會回傳 304
+    """
+    page_size = min(limit, MAX_PAGE_SIZE)
+    if cursor is not None:
+        try:
+            decode_cursor(cursor, sort)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    page = f"sort={sort}&limit={page_size}&" + (
+        f"cursor={cursor}" if cursor is not None else f"skip={skip}"
+    )
+
+    version, updated_at = await repo.collection_state()
+    headers = {"ETag": collection_etag(ITEMS_COLLECTION, version, page)}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at)
+
+    # If-None-Match 優先於 If-Modified-Since（RFC 9110）
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, headers["ETag"])
+    else:
+        not_modified = updated_at is not None and not_modified_since(
+            request.headers.get("if-modified-since"), updated_at
+        )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    items, next_cursor = await repo.list_page(
+        limit=page_size, cursor=cursor, sort=sort, skip=skip
+    )
+
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return items_response(items, headers)
+
+
+def _bulk_response(ids: List[Optional[int]], found: List[bool], status: str) -> BulkResponse:
+    """組合批次操作的逐筆結果"""
+    results = [
+        BulkItemResult(index=i, id=item_id, status=status if ok else "not_found")
+        for i, (item_id, ok) in enumerate(zip(ids, found))
+    ]
+    succeeded = sum(found)
+    return BulkResponse(succeeded=succeeded, failed=len(found) - succeeded, results=results)
+
+
+# 批次端點必須註冊在 /api/items/{item_id} 之前，否則 "bulk" 會被當成 item_id
+@router.post("/api/items/bulk", response_model=BulkResponse, status_code=201)
+async def bulk_create_items(
+    items: List[ItemCreate] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """批次創建項目（單一交易）"""
+    logger.info("Bulk creating %d items", len(items))
+    ids = await repo.bulk_create(items)
+    await cache.invalidate("items:list")
+    return _bulk_response(ids, [True] * len(ids), "created")
+
+
+@router.patch("/api/items/bulk", response_model=BulkResponse)
+async def bulk_update_items(
+    items: List[ItemBulkUpdate] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """批次更新項目（單一交易），不存在的 id 回報 not_found"""
+    logger.info("Bulk updating %d items", len(items))
+    found = await repo.bulk_update(items)
+    await cache.invalidate("items")
+    return _bulk_response([item.id for item in items], found, "updated")
+
+
+@router.delete("/api/items/bulk", response_model=BulkResponse)
+async def bulk_delete_items(
+    ids: List[int] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """批次刪除項目（單一交易），不存在的 id 回報 not_found"""
+    logger.info("Bulk deleting %d items", len(ids))
+    found = await repo.bulk_delete(ids)
+    await cache.invalidate("items")
+    return _bulk_response(ids, found, "deleted")
+
+
+@router.get("/api/items/export")
+async def export_items(request: Request, gzip: bool = False):
+    """
+    匯出所有項目（NDJSON 串流）
+
+    - 每行一個項目，依 id 排序
+    - gzip=true 且客戶端接受 gzip 時即時壓縮
+    """
+    compress = gzip and "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": 'attachment; filename="items.ndjson"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        export_items_ndjson(compress=compress),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+
+@router.get("/api/items/search", response_model=List[Item])
+async def search_items(
+    q: Optional[str] = Query(None, max_length=200, description="以空白分隔的關鍵字，全部都要出現"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Optional[str] = Query(None, pattern=SEARCH_SORT_PATTERN),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    skip: int = Query(0, ge=0, le=10_000),
+    search: ItemSearch = Depends(get_item_search),
+):
+    """
+    搜尋項目
+
+    - q：在 name / description 中搜尋（不分大小寫的子字串比對），多個關鍵字時全部都要符合
+    - min_price / max_price：價格區間（含邊界）
+    - sort：relevance（有 q 時的預設）/ id / name / price，加上 "-" 表示遞減；
+      relevance 只排序前 RELEVANCE_CANDIDATES 筆，skip + limit 超過時回 422，
+      需要往後翻頁請改用其他排序
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must not exceed max_price")
+
+    terms = parse_terms(q)
+    query = SearchQuery(
+        terms=terms,
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort or ("relevance" if terms else "id"),
+        limit=limit,
+        skip=skip,
+    )
+    if terms and query.sort == "relevance" and skip + limit > RELEVANCE_CANDIDATES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"sort=relevance only pages through the first {RELEVANCE_CANDIDATES} results "
+                   f"(skip + limit); use sort=id, name or price to page further",
+        )
+    return items_response(await search.search(query))
+
+
+@router.get("/api/items/{item_id}", response_model=Item)
+async def get_item(
+    item_id: int,
+    request: Request,
+    response: Response,
+    repo: ItemRepository = Depends(get_item_repository)
+):
+    """
+    獲取單個項目
+
+    If-None-Match 符合目前版本時回傳 304（不序列化回應本體）
+    """
+    item = await repo.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    etag = item_etag(item.id, item.version)
+    headers = {"ETag": etag, "Last-Modified": http_date(item.updated_at)}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return item
+
+
+@router.post("/api/items", response_model=Item, status_code=201)
+async def create_item(
+    item: ItemCreate,
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """
+    創建新項目
+
+    帶 Idempotency-Key 標頭時，以同一個鍵重試會回傳第一次的回應而不會重複建立（見 app/idempotency.py）
+    """
+    logger.info("Creating new item: %s", item.name)
+    created = await repo.create(item)
+    await cache.invalidate("items:list")
+    return created
+
+
+@router.put("/api/items/{item_id}", response_model=Item)
+async def update_item(
+    item_id: int,
+    item: ItemUpdate,
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """更新項目"""
+    logger.info("Updating item %s", item_id)
+
+    updated = await repo.update(item_id, item)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    await cache.invalidate("items:list", f"items:{item_id}")
+    return updated
+
+
+@router.delete("/api/items/{item_id}", status_code=204)
+async def delete_item(
+    item_id: int,
+    repo: ItemRepository = Depends(get_item_repository),
+    cache: ResponseCache = Depends(get_cache)
+):
+    """刪除項目"""
+    logger.info("Deleting item %s", item_id)
+
+    if not await repo.delete(item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
+    await cache.invalidate("items:list", f"items:{item_id}")
+
+    return None
+
+
+# 錯誤處理（由 create_app 以 add_exception_handler 註冊）
+async def global_exception_handler(request, exc):
+    """全域錯誤處理"""
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
+    return JSONResponse(
+        status_code=500,
+        content={"detail": "Internal server error"}
+    )
+
@@ -0,0 +1,338 @@
+"""
+Items 搜尋（文字 + 價格區間 + 排序）
+
+三種後端的比對語意相同：查詢字串以空白分成多個詞，每個詞都必須出現在 name 或
+description 中（不分大小寫的子字串比對，中文也適用）。
+
+- SQLite：FTS5 trigram 索引（external content，由觸發器與 items 同步），
+  以 bm25 排序相關性
+- PostgreSQL：pg_trgm GIN 索引，查詢 ILIKE '%詞%' 時走索引
+- 其他資料庫或 search_backend=memory：行程內的 trigram 倒排索引，
+  依集合版本（collection_versions）判斷是否需要重建
+
+少於 3 個字的詞無法使用 trigram 索引，只在其他條件篩選後的結果上比對。
+
+相關性排序：符合筆數少時以 SQLite FTS5 的 bm25 排序；符合筆數多（寬查詢）或 PostgreSQL 時，
+只在最新的 RELEVANCE_CANDIDATES 筆符合資料中依名稱命中的詞數排序，
+回應時間不隨符合筆數增加（行程內索引依詞出現的次數排序）。
+為了讓各後端的分頁一致，依相關性排序時 skip + limit 不得超過 RELEVANCE_CANDIDATES
+（由路由檢查，超過回 422），再往後請改用 id / name / price 排序。
+"""
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from fastapi import Depends
+from sqlalchemy import case, event, func, literal_column, or_, select, table, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import get_settings
+from .database import Base, get_async_db
+from .repository import SORT_COLUMNS, ItemRecord, ItemRepository
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SORT_PATTERN = r"^(relevance|-?(id|name|price))$"
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_TERMS = 8
+
+# 符合筆數達到此數時視為寬查詢；寬查詢的相關性只在最新的 RELEVANCE_CANDIDATES 筆中計算
+# （見 ItemSearch._statement）
+BROAD_MATCH_THRESHOLD = 1000
+RELEVANCE_CANDIDATES = 200
+
+# 與 PostgreSQL 索引的運算式一致（常數必須是字面值，查詢才能使用運算式索引）
+SEARCH_DOCUMENT = ItemRecord.name.concat(literal_column("' '")).concat(
+    func.coalesce(ItemRecord.description, literal_column("''"))
+)
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+    "name, description, content='items', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name, description ON items BEGIN "
+    "INSERT INTO items_fts(items_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO items_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_items_search_trgm ON items "
+    "USING gin ((name || ' ' || coalesce(description, '')) gin_trgm_ops)",
+]
+
+_items_fts = table("items_fts")
+_FTS_ROWID = literal_column("items_fts.rowid")
+
+
+class SearchQuery(NamedTuple):
+    terms: Tuple[str, ...]
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    sort: str = "relevance"
+    limit: int = 20
+    skip: int = 0
+
+
+def parse_terms(q: Optional[str]) -> Tuple[str, ...]:
+    """查詢字串拆成詞（小寫、去重、保留順序）"""
+    if not q:
+        return ()
+    return tuple(dict.fromkeys(q.lower().split()))[:MAX_SEARCH_TERMS]
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(term: str) -> str:
+    """FTS5 查詢語法：每個詞以雙引號包成片語，避免被解讀成運算子"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_match(terms: Sequence[str]) -> Optional[str]:
+    """可以使用 trigram 索引的詞（至少 3 個字）組成的 FTS5 查詢；沒有時回傳 None"""
+    indexed = [_fts_phrase(term) for term in terms if len(term) >= 3]
+    return " AND ".join(indexed) if indexed else None
+
+
+def _term_condition(term: str, backend: str):
+    """單一詞的子字串比對（PostgreSQL 的運算式與 pg_trgm 索引相同，可以走索引）"""
+    pattern = _like_pattern(term)
+    if backend == "postgresql":
+        return SEARCH_DOCUMENT.ilike(pattern, escape="\\")
+    return or_(
+        ItemRecord.name.like(pattern, escape="\\"),
+        ItemRecord.description.like(pattern, escape="\\"),
+    )
+
+
+def _name_hits(terms: Sequence[str], backend: str):
+    """名稱中出現的詞數（寬查詢的相關性）"""
+    like = ItemRecord.name.ilike if backend == "postgresql" else ItemRecord.name.like
+    hits = [case((like(_like_pattern(term), escape="\\"), 1), else_=0) for term in terms]
+    return sum(hits[1:], hits[0])
+
+
+def install_search_index(target, connection, **kw) -> None:
+    """
+    create_all 之後建立搜尋索引（Base.metadata 的 after_create 事件）
+
+    每次啟動都會執行：資料表已存在時也補上索引；新建的 FTS 表從 items 重建內容
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'")
+        ).first()
+        try:
+            with connection.begin_nested():
+                for ddl in _SQLITE_DDL:
+                    connection.execute(text(ddl))
+                if not exists:
+                    connection.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+        except DBAPIError as exc:  # SQLite 編譯時未包含 FTS5 / trigram
+            logger.warning("無法建立 FTS5 索引，搜尋改用行程內索引: %s", exc)
+    elif dialect == "postgresql":
+        try:
+            with connection.begin_nested():
+                for ddl in _POSTGRES_DDL:
+                    connection.execute(text(ddl))
+        except DBAPIError as exc:  # 沒有建立 extension 的權限時仍可搜尋，只是不走索引
+            logger.warning("無法建立 pg_trgm 索引: %s", exc)
+
+
+event.listen(Base.metadata, "after_create", install_search_index)
+
+
+class InvertedIndex:
+    """
+    行程內 trigram 倒排索引
+
+    每個詞先以 trigram 的倒排串列取交集得到候選，再以子字串比對確認
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, str, Optional[str], float]], version: int = 0):
+        self.version = version
+        self._docs: Dict[int, Tuple[str, str, float]] = {}  # id -> (文字, 名稱, 價格)
+        self._postings: Dict[str, Set[int]] = {}
+        for item_id, name, description, price in rows:
+            document = f"{name} {description or ''}".lower()
+            self._docs[item_id] = (document, name, price)
+            for gram in self._trigrams(document):
+                self._postings.setdefault(gram, set()).add(item_id)
+
+    @staticmethod
+    def _trigrams(value: str) -> Set[str]:
+        return {value[i:i + 3] for i in range(len(value) - 2)}
+
+    def _candidates(self, term: str) -> Optional[Set[int]]:
+        grams = self._trigrams(term)
+        if not grams:
+            return None  # 少於 3 個字，無法縮小範圍
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        return set.intersection(*postings)
+
+    def search(self, query: SearchQuery) -> List[int]:
+        ids: Optional[Set[int]] = None
+        for term in query.terms:
+            candidates = self._candidates(term)
+            if candidates is not None:
+                ids = candidates if ids is None else ids & candidates
+        pool = self._docs.keys() if ids is None else ids
+
+        matches = []
+        for item_id in pool:
+            document, name, price = self._docs[item_id]
+            if query.min_price is not None and price < query.min_price:
+                continue
+            if query.max_price is not None and price > query.max_price:
+                continue
+            if all(term in document for term in query.terms):
+                matches.append(item_id)
+
+        key = query.sort.lstrip("-")
+        if key == "relevance":
+            def sort_key(i):
+                return (-sum(self._docs[i][0].count(t) for t in query.terms), i)
+        elif key == "id":
+            def sort_key(i):
+                return i
+        else:
+            column = 1 if key == "name" else 2
+
+            def sort_key(i):
+                return (self._docs[i][column], i)
+        matches.sort(key=sort_key, reverse=query.sort.startswith("-"))
+        return matches[query.skip:query.skip + query.limit]
+
+
+# 每個 Engine 的搜尋後端（啟動後不會改變，只偵測一次）與行程內索引（集合版本改變時重建）
+_backends: "WeakKeyDictionary[object, str]" = WeakKeyDictionary()
+_memory_indexes: "WeakKeyDictionary[object, InvertedIndex]" = WeakKeyDictionary()
+
+
+class ItemSearch:
+    """依資料庫與設定選擇搜尋後端"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repo = ItemRepository(db)
+
+    @property
+    def engine(self):
+        return self.db.sync_session.get_bind()
+
+    async def backend(self) -> str:
+        if get_settings().search_backend == "memory":
+            return "memory"
+        backend = _backends.get(self.engine)
+        if backend is None:
+            backend = _backends[self.engine] = await self._detect_backend()
+        return backend
+
+    async def _detect_backend(self) -> str:
+        dialect = self.repo.dialect
+        if dialect == "sqlite":
+            stmt = text("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'")
+            has_fts = (await self.db.execute(stmt)).first() is not None
+            return "sqlite" if has_fts else "memory"
+        return "postgresql" if dialect == "postgresql" else "memory"
+
+    async def search(self, query: SearchQuery) -> Sequence[ItemRecord]:
+        backend = await self.backend()
+        if backend == "memory":
+            return await self._search_memory(query)
+        broad = backend != "sqlite" or await self._is_broad(query)
+        return (await self.db.scalars(self._statement(query, backend, broad))).all()
+
+    async def _is_broad(self, query: SearchQuery) -> bool:
+        """FTS 符合的筆數是否達到 BROAD_MATCH_THRESHOLD（只數到門檻，成本固定）"""
+        match = _fts_match(query.terms)
+        if match is None:
+            return True
+        stmt = text(
+            "SELECT count(*) FROM (SELECT 1 FROM items_fts WHERE items_fts MATCH :match LIMIT :cap)"
+        )
+        count = await self.db.scalar(stmt, {"match": match, "cap": BROAD_MATCH_THRESHOLD})
+        return count >= BROAD_MATCH_THRESHOLD
+
+    def _statement(self, query: SearchQuery, backend: str, broad: bool = True):
+        """
+        組出查詢
+
+        - 精確查詢（SQLite 且符合筆數少）：從 FTS 索引取出符合的資料列，再排序；相關性用 bm25
+        - 寬查詢：依排序欄位的索引依序掃描、逐列比對，湊滿一頁就停止；
+          相關性改在最新的 RELEVANCE_CANDIDATES 筆符合資料中，依名稱命中的詞數排序
+          （bm25 需要統計所有符合的資料列，寬查詢時要數百毫秒）
+        """
+        key = query.sort.lstrip("-")
+        match = _fts_match(query.terms) if backend == "sqlite" else None
+        # 寬查詢依相關性排序時仍用 FTS 取候選，其他排序只用 FTS 會失去索引順序
+        use_fts = match is not None and (not broad or key == "relevance")
+
+        conditions = []
+        if query.min_price is not None:
+            conditions.append(ItemRecord.price >= query.min_price)
+        if query.max_price is not None:
+            conditions.append(ItemRecord.price <= query.max_price)
+        for term in query.terms:
+            if not (use_fts and len(term) >= 3):
+                conditions.append(_term_condition(term, backend))
+
+        stmt = select(ItemRecord)
+        if use_fts:
+            stmt = stmt.join(_items_fts, _FTS_ROWID == ItemRecord.id)
+            conditions.append(text("items_fts MATCH :match").bindparams(match=match))
+        stmt = stmt.where(*conditions)
+
+        if key != "relevance":
+            column = SORT_COLUMNS[key]
+            order_by = [column] if key == "id" else [column, ItemRecord.id]
+            if query.sort.startswith("-"):
+                order_by = [col.desc() for col in order_by]
+        elif not query.terms:
+            order_by = [ItemRecord.id]
+        elif use_fts and not broad:
+            order_by = [literal_column("items_fts.rank"), ItemRecord.id]  # bm25，越小越相關
+        else:
+            newest = _FTS_ROWID.desc() if use_fts else ItemRecord.id.desc()
+            candidates = stmt.with_only_columns(ItemRecord.id).order_by(newest)
+            candidates = candidates.limit(RELEVANCE_CANDIDATES).subquery()
+            stmt = select(ItemRecord).join(candidates, candidates.c.id == ItemRecord.id)
+            order_by = [_name_hits(query.terms, backend).desc(), ItemRecord.id.desc()]
+        return stmt.order_by(*order_by).offset(query.skip).limit(query.limit)
+
+    async def _memory_index(self) -> InvertedIndex:
+        version, _ = await self.repo.collection_state()
+        index = _memory_indexes.get(self.engine)
+        if index is None or index.version != version:
+            rows = []
+            async for batch in self.repo.stream_rows():
+                rows.extend(tuple(row) for row in batch)
+            index = _memory_indexes[self.engine] = InvertedIndex(rows, version)
+        return index
+
+    async def _search_memory(self, query: SearchQuery) -> List[ItemRecord]:
+        """索引只回傳 id（一頁最多 MAX_SEARCH_PAGE_SIZE 筆），再以主鍵讀出最新的資料列"""
+        ids = (await self._memory_index()).search(query)
+        if not ids:
+            return []
+        stmt = select(ItemRecord).where(ItemRecord.id.in_(ids))
+        records = {r.id: r for r in (await self.db.scalars(stmt)).all()}
+        return [records[i] for i in ids if i in records]
+
+
+def get_item_search(db: AsyncSession = Depends(get_async_db)) -> ItemSearch:
+    """獲取 ItemSearch"""
+    return ItemSearch(db)
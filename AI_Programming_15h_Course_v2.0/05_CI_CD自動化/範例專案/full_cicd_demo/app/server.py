@@ -0,0 +1,179 @@
+"""
+正式環境啟動器（gunicorn + uvicorn worker）
+
+    python -m app.server
+
+- worker 數量預設依可用 CPU 計算（會考慮容器的 cgroup CPU 配額）
+- preload：master 先載入應用再 fork，程式碼與設定以 copy-on-write 共用；
+  資料庫 Engine 在各 worker 內延遲建立，fork 後也會丟棄從 master 繼承的連線
+- 處理 max_requests（加上隨機抖動）個請求後重啟 worker，避免記憶體緩慢增長
+- 有安裝 uvloop / httptools 時自動使用
+
+零停機重新部署（preload 時 HUP 不會重新載入程式碼，需要換掉整個 master）：
+
+    kill -USR2 <master pid>     # 啟動新的 master 與 worker
+    kill -TERM <舊 master pid>  # 新 worker 就緒後，舊 master 處理完進行中的請求再結束
+
+scripts/graceful-reload.sh 依 pidfile 自動執行以上步驟。
+未安裝 gunicorn（例如 Windows）時退回 uvicorn 的多行程模式（沒有 preload 與平滑重啟）。
+"""
+import asyncio
+import logging
+import os
+import sys
+from typing import Optional
+
+from .config import Settings, get_settings
+from .database import active_engines, get_async_engine, get_engine
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = "app.main:app"
+
+
+def available_cpus() -> int:
+    """可用的 CPU 數：CPU affinity 與 cgroup v2 配額（cpu.max）取較小者"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count(settings: Settings, cpus: Optional[int] = None) -> int:
+    """worker 數量：有設定 WEB_CONCURRENCY 時以設定為準，否則每顆 CPU 一個 async worker"""
+    if settings.web_concurrency:
+        return settings.web_concurrency
+    return max(1, cpus or available_cpus())
+
+
+def on_starting(server) -> None:
+    """
+    gunicorn hook：master 啟動時先建立資料表並寫入示範資料
+
+    避免多個 worker 同時啟動時重複建立資料表或重複寫入；完成後關閉連線，不帶進 fork
+    """
+    from .main import prepare_database
+
+    asyncio.run(prepare_database())
+
+
+def post_fork(server, worker) -> None:
+    """
+    gunicorn hook：worker fork 之後執行
+
+    正常情況 master 不會建立 Engine；若有（例如 preload 階段有查詢），
+    丟棄繼承來的連線但不關閉，避免與 master 共用同一個 socket
+    """
+    for engine in active_engines().values():
+        engine = getattr(engine, "sync_engine", engine)
+        engine.dispose(close=False)
+    get_engine.cache_clear()
+    get_async_engine.cache_clear()
+
+
+def child_exit(server, worker) -> None:
+    """
+    gunicorn hook：worker 結束後在 master 執行
+
+    把該 worker 的指標快照併入已結束 worker 的彙總，並刪除快照檔
+    """
+    settings = get_settings()
+    if settings.metrics_enabled and settings.metrics_multiproc_dir:
+        from .metrics import retire_snapshot
+
+        retire_snapshot(settings.metrics_multiproc_dir, worker.pid)
+
+
+def gunicorn_options(settings: Settings) -> dict:
+    """由 Settings 產生 gunicorn 設定"""
+    return {
+        "bind": f"{settings.server_host}:{settings.server_port}",
+        "workers": worker_count(settings),
+        "worker_class": "app.server.Worker",
+        "preload_app": settings.server_preload,
+        "max_requests": settings.server_max_requests,
+        "max_requests_jitter": settings.server_max_requests_jitter,
+        "timeout": settings.server_timeout,
+        "graceful_timeout": settings.server_graceful_timeout,
+        "keepalive": settings.server_keepalive,
+        "pidfile": settings.server_pidfile,
+        "on_starting": on_starting,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+    }
+
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    BaseApplication = UvicornWorker = None
+else:
+
+    class Worker(UvicornWorker):
+        """uvicorn worker：事件迴圈與 HTTP 解析器依設定選擇（auto 會優先用 uvloop / httptools）"""
+
+        CONFIG_KWARGS = {
+            "loop": get_settings().server_loop,
+            "http": get_settings().server_http,
+            "lifespan": "on",
+        }
+
+    class GunicornApplication(BaseApplication):
+        """以程式設定 gunicorn，不需要另外的 gunicorn.conf.py"""
+
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from .main import app
+
+            return app
+
+
+def run_uvicorn(settings: Settings) -> None:
+    """沒有 gunicorn 時的退路：uvicorn 多行程（spawn，不共用記憶體，也沒有平滑重啟）"""
+    import uvicorn
+
+    uvicorn.run(
+        APP_PATH,
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=worker_count(settings),
+        loop=settings.server_loop,
+        http=settings.server_http,
+        limit_max_requests=settings.server_max_requests or None,
+        timeout_keep_alive=settings.server_keepalive,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        access_log=True,
+    )
+
+
+def main() -> None:
+    settings = get_settings()
+    if BaseApplication is None:
+        logger.warning("gunicorn 未安裝，改用 uvicorn 多行程模式")
+        run_uvicorn(settings)
+        return
+    # USR2 會以 sys.argv 重新執行 master；改成 -m 形式，相對匯入才能成功
+    sys.argv[:1] = ["-m", "app.server"]
+    GunicornApplication(gunicorn_options(settings)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/bin/bash
+#
+# 零停機重新部署腳本
+#
+# 用途：以新程式碼啟動新的 gunicorn master，就緒後平滑關閉舊的 master
+# 使用：./graceful-reload.sh [PIDFILE]
+#      （啟動時需設定 SERVER_PIDFILE，例如 SERVER_PIDFILE=/tmp/app.pid python -m app.server）
+#      READY_URL 為就緒檢查網址，預設 http://127.0.0.1:${SERVER_PORT:-8000}/ready
+
+set -e
+
+# 配置
+PIDFILE="${1:-${SERVER_PIDFILE:-/tmp/app.pid}}"
+TIMEOUT=30
+READY_URL="${READY_URL:-http://127.0.0.1:${SERVER_PORT:-8000}/ready}"
+
+if [ ! -f "$PIDFILE" ]; then
+    echo "❌ PID file not found: $PIDFILE"
+    exit 1
+fi
+
+OLD_PID=$(cat "$PIDFILE")
+OLD_WORKERS=$(pgrep -P "$OLD_PID" | wc -l)
+echo "🔄 Reloading gunicorn master (PID $OLD_PID)"
+echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+# USR2：舊 master 以新程式碼啟動新的 master；
+# 新 master 先寫入 PIDFILE.2，舊 master 結束後才改名為 PIDFILE
+kill -USR2 "$OLD_PID"
+
+for i in $(seq 1 $TIMEOUT); do
+    if [ -f "$PIDFILE.2" ]; then
+        break
+    fi
+    sleep 1
+done
+
+NEW_PID=$(cat "$PIDFILE.2" 2>/dev/null || echo "")
+if [ -z "$NEW_PID" ]; then
+    echo "❌ New master did not start within ${TIMEOUT}s, old master keeps serving"
+    exit 1
+fi
+echo "✅ New master started (PID $NEW_PID)"
+
+# 等待就緒檢查在 TIMEOUT 秒內回 200
+wait_ready() {
+    for i in $(seq 1 $TIMEOUT); do
+        if [ "$(curl -s -o /dev/null -w "%{http_code}" --max-time 2 "$READY_URL")" = "200" ]; then
+            return 0
+        fi
+        sleep 1
+    done
+    return 1
+}
+
+# 失敗時還原：HUP 讓舊 master 重新啟動 worker，再關閉新的 master
+rollback() {
+    echo "❌ $1, rolling back to the old master"
+    kill -HUP "$OLD_PID"
+    kill -TERM "$NEW_PID"
+    exit 1
+}
+
+# 新 master 的 worker 都 fork 出來之後才檢查
+for i in $(seq 1 $TIMEOUT); do
+    if [ "$(pgrep -P "$NEW_PID" | wc -l)" -ge "$OLD_WORKERS" ]; then
+        break
+    fi
+    sleep 1
+done
+wait_ready || rollback "Service not ready within ${TIMEOUT}s"
+
+# WINCH：舊 master 平滑關閉所有 worker，之後的請求只會由新 worker 處理；
+# 此時再確認一次就緒，才讓舊 master 結束
+kill -WINCH "$OLD_PID"
+wait_ready || rollback "New workers not ready within ${TIMEOUT}s"
+echo "✅ New workers are ready ($READY_URL)"
+
+# TERM：舊 master 結束
+kill -TERM "$OLD_PID"
+echo "✅ Old master (PID $OLD_PID) is shutting down gracefully"
@@ -0,0 +1,104 @@
+"""
+回應壓縮基準：各編碼與壓縮等級省下的位元組與花費的 CPU
+
+以列表端點（JSON 陣列）與匯出端點（NDJSON，每 1000 筆一塊逐塊壓縮）的實際格式產生資料，
+不需要資料庫與伺服器：
+
+    python -m tests.benchmark.compression
+    python -m tests.benchmark.compression --items 100000 --repeat 5
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Optional
+
+from app.compression import COMPRESSION_PROFILES, brotli, make_encoder
+from app.export import EXPORT_BATCH_SIZE, _encode_batch
+from app.responses import dumps
+
+_WORDS = (
+    "輕量 防水 耐用 經典 限量 旗艦 入門 專業 無線 快充 高效 環保 "
+    "portable wireless premium classic compact deluxe ultra smart basic pro"
+).split()
+
+
+def sample_rows(count: int, seed: int = 0) -> list:
+    """產生 (id, name, description, price) 資料列；描述由隨機詞組成，壓縮率接近真實資料"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, count + 1):
+        description = " ".join(rng.choices(_WORDS, k=rng.randint(0, 8))) or None
+        price = round(rng.uniform(1, 5000), 2)
+        rows.append((i, f"商品 {i} {rng.choice(_WORDS)}", description, price))
+    return rows
+
+
+def payloads(count: int) -> Dict[str, List[bytes]]:
+    """每種回應格式送出的區塊：列表一次送完，匯出依批次逐塊送出"""
+    rows = sample_rows(count)
+    listing = dumps([
+        {"name": name, "description": description, "price": price, "id": item_id}
+        for item_id, name, description, price in rows
+    ])
+    export = [
+        _encode_batch(rows[i:i + EXPORT_BATCH_SIZE])
+        for i in range(0, len(rows), EXPORT_BATCH_SIZE)
+    ]
+    return {"list": [listing], "export": export}
+
+
+def measure(chunks: List[bytes], encoding: str, profile: str, repeat: int = 3) -> dict:
+    """壓縮一次完整回應（與中介層相同的 flush 方式），取多次中最快的一次"""
+    original = sum(len(chunk) for chunk in chunks)
+    best, compressed = float("inf"), 0
+    for _ in range(repeat):
+        encoder = make_encoder(encoding, profile)
+        start = time.perf_counter()
+        size = sum(len(encoder.compress(chunk)) for chunk in chunks[:-1])
+        size += len(encoder.finish(chunks[-1]))
+        best = min(best, time.perf_counter() - start)
+        compressed = size
+    return {
+        "original": original,
+        "compressed": compressed,
+        "saved_pct": round((1 - compressed / original) * 100, 1),
+        "cpu_ms": round(best * 1000, 2),
+        "mb_per_s": round(original / best / 1e6, 1),
+    }
+
+
+def run_compression_benchmark(count: int = 10_000, repeat: int = 3) -> List[dict]:
+    encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+    results = []
+    for payload, chunks in payloads(count).items():
+        for encoding in encodings:
+            for profile in COMPRESSION_PROFILES:
+                result = measure(chunks, encoding, profile, repeat)
+                results.append({"payload": payload, "encoding": encoding, "profile": profile,
+                                **result})
+    return results
+
+
+def format_report(results: List[dict]) -> str:
+    lines = [f"{'payload':<8}{'encoding':<10}{'profile':<10}{'original':>11}{'compressed':>12}"
+             f"{'saved %':>9}{'cpu ms':>9}{'MB/s':>8}"]
+    for r in results:
+        lines.append(f"{r['payload']:<8}{r['encoding']:<10}{r['profile']:<10}{r['original']:>11}"
+                     f"{r['compressed']:>12}{r['saved_pct']:>9}{r['cpu_ms']:>9}{r['mb_per_s']:>8}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="回應壓縮：省下的位元組與 CPU 成本")
+    parser.add_argument("--items", type=int, default=10_000, help="資料筆數")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(format_report(run_compression_benchmark(args.items, args.repeat)))
+    if brotli is None:
+        print("\n未安裝 brotli，只測試 gzip")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
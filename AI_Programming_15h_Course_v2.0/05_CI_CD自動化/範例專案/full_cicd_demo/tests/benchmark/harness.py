@@ -0,0 +1,364 @@
+"""
+效能基準測試工具
+
+對每個路由以指定並行數發送請求，回報 RPS、延遲百分位數與記憶體用量，
+並可與先前存下的 JSON 基準比較，退步超過門檻時以非零狀態結束。
+
+使用方式（在專案根目錄執行，全程離線、使用暫存 SQLite）：
+
+    # 建立基準
+    python -m tests.benchmark.harness --save-baseline benchmark-baseline.json
+
+    # 之後與基準比較（退步超過 25% 時結束代碼為 1）
+    python -m tests.benchmark.harness --baseline benchmark-baseline.json --threshold 0.25
+
+    # 透過 uvicorn 實際啟動伺服器
+    python -m tests.benchmark.harness --mode uvicorn --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+class Context:
+    """跨情境共用的狀態：資料集 id 與亂數來源（固定種子，結果可重現）"""
+
+    def __init__(self, seed: int = 42):
+        self.ids: List[int] = []
+        self.rng = random.Random(seed)
+
+    def sample_ids(self, n: int) -> List[int]:
+        return [self.rng.choice(self.ids) for _ in range(n)]
+
+
+def _item(i: int) -> dict:
+    return {"name": f"bench-{i}", "description": "benchmark item", "price": float(i % 997 + 1)}
+
+
+async def _bulk_create(client: httpx.AsyncClient, n: int) -> List[int]:
+    response = await client.post("/api/items/bulk", json=[_item(i) for i in range(n)])
+    response.raise_for_status()
+    return [r["id"] for r in response.json()["results"]]
+
+
+class Scenario(NamedTuple):
+    """
+    一個壓測情境
+
+    setup 在計時前執行，為每個請求準備參數；request 是實際計時的請求
+    """
+
+    setup: Callable[[httpx.AsyncClient, Context, int], Awaitable[List[Any]]]
+    request: Callable[[httpx.AsyncClient, Any], Awaitable[httpx.Response]]
+
+
+async def _no_setup(client, ctx, n):
+    return [None] * n
+
+
+async def _sample_ids(client, ctx, n):
+    return ctx.sample_ids(n)
+
+
+async def _sample_id_batches(client, ctx, n):
+    return [ctx.sample_ids(100) for _ in range(n)]
+
+
+async def _fresh_ids(client, ctx, n):
+    return await _bulk_create(client, n)
+
+
+async def _fresh_id_batches(client, ctx, n):
+    ids = await _bulk_create(client, n * 100)
+    return [ids[i:i + 100] for i in range(0, len(ids), 100)]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "root": Scenario(_no_setup, lambda c, _: c.get("/")),
+    "health": Scenario(_no_setup, lambda c, _: c.get("/health")),
+    "metrics": Scenario(_no_setup, lambda c, _: c.get("/metrics")),
+    "list": Scenario(_no_setup, lambda c, _: c.get("/api/items", params={"limit": 100})),
+    "list_sorted": Scenario(
+        _no_setup, lambda c, _: c.get("/api/items", params={"limit": 100, "sort": "-price"})
+    ),
+    "search": Scenario(
+        _sample_ids,
+        lambda c, i: c.get("/api/items/search", params={"q": f"bench-{i}", "max_price": 500}),
+    ),
+    "get_item": Scenario(_sample_ids, lambda c, i: c.get(f"/api/items/{i}")),
+    "export": Scenario(_no_setup, lambda c, _: c.get("/api/items/export")),
+    "create": Scenario(_no_setup, lambda c, _: c.post("/api/items", json=_item(0))),
+    "update": Scenario(_sample_ids, lambda c, i: c.put(f"/api/items/{i}", json={"price": 1.5})),
+    "delete": Scenario(_fresh_ids, lambda c, i: c.delete(f"/api/items/{i}")),
+    "bulk_create": Scenario(
+        _no_setup, lambda c, _: c.post("/api/items/bulk", json=[_item(i) for i in range(100)])
+    ),
+    "bulk_update": Scenario(
+        _sample_id_batches,
+        lambda c, ids: c.patch("/api/items/bulk", json=[{"id": i, "price": 2.5} for i in ids]),
+    ),
+    "bulk_delete": Scenario(
+        _fresh_id_batches, lambda c, ids: c.request("DELETE", "/api/items/bulk", json=ids)
+    ),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近序位法（nearest-rank）百分位數"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def rss_mb(pid: Optional[int] = None) -> float:
+    """行程目前的常駐記憶體（Linux 讀 /proc；其他平台退回本行程的峰值）"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以 bytes 回報，Linux 以 KB 回報
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: Context,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """以固定數量的 worker 協程送出 requests 個請求，回傳統計"""
+    args = await scenario.setup(client, ctx, requests)
+    pending = iter(args)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for arg in pending:  # 所有 worker 共用同一個 iterator
+            start = time.perf_counter()
+            response = await scenario.request(client, arg)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+@asynccontextmanager
+async def inprocess_client(app):
+    """在同一個行程內透過 ASGI 呼叫應用（不經過網路）"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client, None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(env: Dict[str, str], startup_timeout: float = 30.0):
+    """以子行程啟動 uvicorn，等到 /health 回應後開始壓測"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **env},
+    )
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+        ) as client:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("uvicorn 啟動失敗")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("等待 uvicorn 啟動逾時")
+                await asyncio.sleep(0.1)
+            yield client, process.pid
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+async def run_benchmark(
+    client_factory,
+    scenarios: List[str],
+    requests: int = 200,
+    concurrency: int = 10,
+    dataset: int = 1000,
+) -> dict:
+    """執行所有情境並產生報告"""
+    ctx = Context()
+    results = {}
+    async with client_factory as (client, pid):
+        ctx.ids = await _bulk_create(client, dataset)
+        for name in scenarios:
+            result = await run_scenario(client, SCENARIOS[name], ctx, requests, concurrency)
+            result["rss_mb"] = rss_mb(pid)
+            results[name] = result
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "dataset": dataset,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(
+    current: dict, baseline: dict, threshold: float = 0.25, latency_floor_ms: float = 1.0
+) -> List[str]:
+    """
+    與基準比較，回傳退步項目
+
+    - RPS 下降超過 threshold
+    - p90 延遲增加超過 threshold，且增加量大於 latency_floor_ms（忽略次毫秒的抖動）
+    - 原本沒有錯誤的情境出現錯誤
+    """
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        result = current["scenarios"].get(name)
+        if result is None:
+            continue
+        if result["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name}: rps {base['rps']} -> {result['rps']}")
+        latency_delta = result["p90_ms"] - base["p90_ms"]
+        if latency_delta > latency_floor_ms and result["p90_ms"] > base["p90_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p90 {base['p90_ms']}ms -> {result['p90_ms']}ms")
+        if result["errors"] and not base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors")
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'scenario':<14}{'rps':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+             f"{'errors':>8}{'rss MB':>9}"]
+    for name, r in report["scenarios"].items():
+        lines.append(f"{name:<14}{r['rps']:>10}{r['p50_ms']:>10}{r['p90_ms']:>10}"
+                     f"{r['p99_ms']:>10}{r['errors']:>8}{r['rss_mb']:>9}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="full_cicd_demo 效能基準測試")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="每個情境的請求數")
+    parser.add_argument("--dataset", type=int, default=1000, help="壓測前寫入的項目數")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="以逗號分隔的情境名稱")
+    parser.add_argument("--no-cache", action="store_true", help="停用回應快取")
+    parser.add_argument("--output", help="報告輸出路徑（JSON）")
+    parser.add_argument("--save-baseline", help="將報告存為基準")
+    parser.add_argument("--baseline", help="與此基準比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="容許的退步比例")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知的情境：{', '.join(sorted(unknown))}")
+
+    # 每次使用全新的暫存資料庫，結果不受開發資料影響
+    workdir = tempfile.mkdtemp(prefix="full_cicd_bench_")
+    env = {
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "CACHE_ENABLED": "false" if args.no_cache else "true",
+        "REDIS_URL": "",
+        "LOG_LEVEL": "WARNING",
+    }
+
+    if args.mode == "uvicorn":
+        factory = uvicorn_client(env)
+    else:
+        os.environ.update(env)
+        sys.path.insert(0, str(PROJECT_ROOT))
+        import logging
+
+        from app.main import app
+
+        logging.disable(logging.INFO)
+        factory = inprocess_client(app)
+
+    try:
+        report = asyncio.run(run_benchmark(
+            factory, scenarios, args.requests, args.concurrency, args.dataset
+        ))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report["meta"]["mode"] = args.mode
+    print(format_report(report))
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()),
+                              args.threshold)
+        if regressions:
+            print("\n效能退步：")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n與基準相比沒有超過 {args.threshold:.0%} 的退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
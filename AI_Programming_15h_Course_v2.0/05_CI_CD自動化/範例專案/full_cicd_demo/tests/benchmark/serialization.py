@@ -0,0 +1,83 @@
+"""
+列表回應序列化基準：FastAPI 原本的流程對 render_items 的兩種快速路徑
+
+不需要資料庫與伺服器：
+
+    python -m tests.benchmark.serialization
+    python -m tests.benchmark.serialization --items 100000 --repeat 5
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import Item
+from app.repository import ItemRecord
+from app.responses import render_items
+
+
+def sample_records(count: int) -> List[ItemRecord]:
+    return [
+        ItemRecord(id=i, name=f"商品 {i}", description=None if i % 3 else "說明", price=i + 0.5)
+        for i in range(1, count + 1)
+    ]
+
+
+def fastapi_default(records) -> bytes:
+    """FastAPI 原本的流程：response_model 驗證 + jsonable_encoder + 標準庫 json"""
+    field = create_response_field(name="Response_list_items", type_=List[Item])
+    content = asyncio.run(serialize_response(field=field, response_content=records))
+    return JSONResponse(content).body
+
+
+# 名稱 -> 序列化函式
+SERIALIZERS: List[tuple] = [
+    ("fastapi", fastapi_default),
+    ("validated", lambda records: render_items(records, validate=True)),
+    ("trusted", lambda records: render_items(records, validate=False)),
+]
+
+
+def best_of(fn: Callable[[list], bytes], records: list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_serialization_benchmark(count: int = 10_000, repeat: int = 3) -> List[dict]:
+    records = sample_records(count)
+    results = [{"serializer": name, "ms": best_of(fn, records, repeat) * 1000}
+               for name, fn in SERIALIZERS]
+    baseline = results[0]["ms"]
+    for result in results:
+        result["speedup"] = round(baseline / result["ms"], 2)
+        result["ms"] = round(result["ms"], 2)
+    return results
+
+
+def format_report(results: List[dict]) -> str:
+    lines = [f"{'serializer':<12}{'ms':>10}{'speedup':>10}"]
+    for r in results:
+        lines.append(f"{r['serializer']:<12}{r['ms']:>10}{r['speedup']:>9}x")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="列表回應序列化：FastAPI 預設流程對快速路徑")
+    parser.add_argument("--items", type=int, default=10_000, help="資料筆數")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(format_report(run_serialization_benchmark(args.items, args.repeat)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
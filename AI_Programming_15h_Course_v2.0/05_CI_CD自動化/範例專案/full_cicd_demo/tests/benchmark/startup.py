@@ -0,0 +1,134 @@
+"""
+啟動成本基準：匯入 app.main 與建立應用各花多少時間、載入了哪些模組
+
+每次量測都在新的直譯器中以 -X importtime 執行（已載入的模組不會重算），
+不需要資料庫與伺服器：
+
+    python -m tests.benchmark.startup
+    python -m tests.benchmark.startup --repeat 5 --top 30
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 預算（毫秒，取多次中最快的一次）；約為開發機量測值的 2.5 倍，留給較慢的 CI 機器
+STARTUP_BUDGET_MS = {
+    "import_ms": 750,        # import app.main（只有設定，不含 FastAPI 與資料庫）
+    "total_ms": 3500,        # 匯入並建立應用：from app.main import app
+    "first_party_ms": 300,   # app.* 模組自身的匯入時間（不含第三方套件）
+}
+
+# 只匯入 app.main 時不應載入的模組：FastAPI、路由與資料庫都延到 create_app()
+DEFERRED_UNTIL_CREATE = ("fastapi", "starlette", "sqlalchemy", "app.routes")
+
+# 建立應用時不應載入的模組：資料庫驅動與方言在建立 Engine 時才載入，
+# Redis 只在有設定 redis_url 時才載入，伺服器只有啟動器需要
+DEFERRED_UNTIL_USE = (
+    "redis",
+    "aiosqlite",
+    "asyncpg",
+    "sqlalchemy.dialects.sqlite",
+    "sqlalchemy.dialects.postgresql",
+    "gunicorn",
+    "uvicorn",
+)
+
+_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+{build}
+built = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "total_ms": (built - start) * 1000}}))
+"""
+
+
+class ImportRecord(NamedTuple):
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> Dict[str, ImportRecord]:
+    """解析 -X importtime 的輸出（stderr），依載入完成的順序回傳每個模組"""
+    records = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():  # 標題列
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records[name.strip()] = ImportRecord(int(self_us), int(cumulative_us), depth)
+    return records
+
+
+def run_startup(build: bool = True) -> dict:
+    """在新的直譯器中匯入 app.main（build=True 時再建立應用），回傳耗時與載入的模組"""
+    code = _SCRIPT.format(build="app.main.app" if build else "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    first_party = sum(
+        r.self_us for name, r in modules.items() if name == "app" or name.startswith("app.")
+    )
+    return {**timings, "first_party_ms": first_party / 1000, "modules": modules}
+
+
+def measure_startup(repeat: int = 3) -> dict:
+    """多次量測，每項耗時取最快的一次（排除磁碟快取與其他行程的干擾）"""
+    runs = [run_startup() for _ in range(repeat)]
+    best = {key: round(min(run[key] for run in runs), 1) for key in STARTUP_BUDGET_MS}
+    return {**best, "modules": runs[0]["modules"]}
+
+
+def over_budget(result: dict) -> List[str]:
+    return [
+        f"{key}: {result[key]} ms > {budget} ms"
+        for key, budget in STARTUP_BUDGET_MS.items()
+        if result[key] > budget
+    ]
+
+
+def format_report(result: dict, top: int = 20) -> str:
+    lines = [f"{'':<16}{'best ms':>10}{'budget ms':>11}"]
+    for key, budget in STARTUP_BUDGET_MS.items():
+        lines.append(f"{key:<16}{result[key]:>10}{budget:>11}")
+
+    modules = result["modules"]
+    packages: Dict[str, int] = {}
+    for name, record in modules.items():
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + record.self_us
+
+    lines.append(f"\n{len(modules)} 個模組；自身匯入時間最多的套件：")
+    for name, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        lines.append(f"  {name:<30}{self_us / 1000:>10.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="啟動成本：匯入與建立應用的時間")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20, help="列出前幾個套件")
+    args = parser.parse_args(argv)
+
+    result = measure_startup(args.repeat)
+    print(format_report(result, args.top))
+    problems = over_budget(result)
+    for problem in problems:
+        print(f"超出預算 {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
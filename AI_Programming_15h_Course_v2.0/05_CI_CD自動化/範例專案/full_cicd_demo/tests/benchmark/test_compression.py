@@ -0,0 +1,19 @@
+"""
+壓縮基準的快速檢查：少量資料跑過每種編碼與等級
+"""
+from app.compression import COMPRESSION_PROFILES
+from tests.benchmark.compression import format_report, run_compression_benchmark
+
+
+def test_every_profile_saves_bytes():
+    """測試每種組合都有省下位元組，且 size 等級不比 speed 大"""
+    results = run_compression_benchmark(count=2000, repeat=1)
+
+    assert len(results) % (2 * len(COMPRESSION_PROFILES)) == 0
+    by_key = {(r["payload"], r["encoding"], r["profile"]): r for r in results}
+    for (payload, encoding, profile), result in by_key.items():
+        assert 0 < result["compressed"] < result["original"] / 2
+        assert result["cpu_ms"] > 0
+        speed = by_key[(payload, encoding, "speed")]
+        assert by_key[(payload, encoding, "size")]["compressed"] <= speed["compressed"]
+    assert "saved %" in format_report(results)
@@ -0,0 +1,66 @@
+"""
+基準測試工具的快速檢查：少量請求跑過每個情境，確認報告格式與退步判斷
+"""
+import asyncio
+
+import pytest
+
+from app.cache import get_cache
+from app.config import settings_provider
+from app.main import app
+from tests.benchmark.harness import SCENARIOS, compare, inprocess_client, percentile, run_benchmark
+
+
+def _report(rps, p90, errors=0):
+    return {"scenarios": {"root": {"rps": rps, "p90_ms": p90, "errors": errors}}}
+
+
+@pytest.fixture
+def isolated_database(tmp_path, monkeypatch):
+    """壓測寫入大量資料，改用獨立的資料庫與快取，避免影響其他測試"""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'bench.db'}")
+    settings_provider.reload()
+    get_cache.cache_clear()
+    yield
+    monkeypatch.undo()
+    settings_provider.reload()
+    get_cache.cache_clear()
+
+
+def test_every_scenario_runs_without_errors(isolated_database):
+    """測試所有情境都能在行程內跑完且沒有錯誤回應"""
+    report = asyncio.run(run_benchmark(
+        inprocess_client(app), list(SCENARIOS), requests=4, concurrency=2, dataset=20
+    ))
+
+    assert set(report["scenarios"]) == set(SCENARIOS)
+    for name, result in report["scenarios"].items():
+        assert result["requests"] == 4, name
+        assert result["errors"] == 0, name
+        assert result["rps"] > 0
+        assert result["p50_ms"] <= result["p90_ms"] <= result["p99_ms"] <= result["max_ms"]
+        assert result["rss_mb"] > 0
+
+
+def test_percentile_nearest_rank():
+    """測試百分位數計算"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) == 0.0
+
+
+def test_compare_detects_regressions():
+    """測試 RPS 下降、延遲增加與新出現的錯誤都會被回報"""
+    baseline = _report(rps=1000, p90=10)
+
+    assert compare(_report(rps=900, p90=11), baseline, threshold=0.25) == []
+    assert len(compare(_report(rps=500, p90=10), baseline, threshold=0.25)) == 1
+    assert len(compare(_report(rps=1000, p90=20), baseline, threshold=0.25)) == 1
+    assert len(compare(_report(rps=1000, p90=10, errors=3), baseline, threshold=0.25)) == 1
+
+
+def test_compare_ignores_sub_millisecond_jitter():
+    """測試次毫秒的延遲變化不算退步"""
+    assert compare(_report(rps=1000, p90=0.4), _report(rps=1000, p90=0.2)) == []
@@ -0,0 +1,28 @@
+"""
+序列化基準的快速檢查：少量資料跑過每種序列化方式（不比較耗時，避免在共用 CI 上不穩定）
+"""
+import json
+
+from tests.benchmark.serialization import (
+    SERIALIZERS,
+    format_report,
+    run_serialization_benchmark,
+    sample_records,
+)
+
+
+def test_serializers_agree():
+    """測試每種序列化方式輸出相同的資料"""
+    records = sample_records(200)
+    outputs = [json.loads(fn(records)) for _, fn in SERIALIZERS]
+    assert all(output == outputs[0] for output in outputs)
+
+
+def test_report_lists_every_serializer():
+    """測試報告包含每種序列化方式的耗時與相對倍數"""
+    results = run_serialization_benchmark(count=500, repeat=1)
+
+    assert [r["serializer"] for r in results] == [name for name, _ in SERIALIZERS]
+    assert results[0]["speedup"] == 1.0
+    assert all(r["ms"] >= 0 for r in results)
+    assert "speedup" in format_report(results)
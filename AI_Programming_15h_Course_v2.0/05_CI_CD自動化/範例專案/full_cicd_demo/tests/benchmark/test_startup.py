@@ -0,0 +1,48 @@
+"""
+啟動成本檢查：延後載入的模組與匯入時間預算
+"""
+from tests.benchmark.startup import (
+    DEFERRED_UNTIL_CREATE,
+    DEFERRED_UNTIL_USE,
+    format_report,
+    measure_startup,
+    over_budget,
+    parse_importtime,
+    run_startup,
+)
+
+
+def _loaded(modules, prefixes):
+    return sorted(
+        name for name in modules for prefix in prefixes
+        if name == prefix or name.startswith(prefix + ".")
+    )
+
+
+def test_parse_importtime():
+    """測試解析 -X importtime 的輸出與巢狀深度"""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _json\n"
+        "import time:       900 |       1020 |   json\n"
+        "import time:        50 |       1070 | app.main\n"
+    )
+    records = parse_importtime(output)
+    assert list(records) == ["_json", "json", "app.main"]
+    assert records["json"] == (900, 1020, 1)
+    assert records["app.main"].depth == 0
+
+
+def test_import_main_does_not_build_app():
+    """測試只匯入 app.main 不會載入 FastAPI、路由與資料庫"""
+    modules = run_startup(build=False)["modules"]
+    assert "app.main" in modules
+    assert _loaded(modules, DEFERRED_UNTIL_CREATE) == []
+
+
+def test_startup_within_budget():
+    """測試建立應用時不載入選用相依套件，且匯入時間不超過預算"""
+    result = measure_startup(repeat=3)
+    assert "app.routes" in result["modules"]
+    assert _loaded(result["modules"], DEFERRED_UNTIL_USE) == []
+    assert over_budget(result) == [], format_report(result)
@@ -0,0 +1,37 @@
+"""
+測試共用設定
+
+測試使用暫存的 SQLite 檔案，不會動到開發用的 app.db
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="full_cicd_demo_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TEST_DB_DIR}/test.db"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    """執行一次應用啟動流程：建立資料表並寫入示範資料"""
+    from app.main import app
+
+    with TestClient(app):
+        pass
+    yield
+    shutil.rmtree(_TEST_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def override_settings(monkeypatch):
+    """暫時覆寫設定：Settings 不可變，改為換上一份修改過的複本，測試結束後換回"""
+    from app.config import get_settings, settings_provider
+
+    def override(**changes):
+        updated = get_settings().model_copy(update=changes)
+        monkeypatch.setattr(settings_provider, "current", updated)
+
+    return override
@@ -0,0 +1,95 @@
+"""
+單元測試 - 回應快取
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import MemoryCache, RedisCache, ResponseCache
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_memory_cache_lru_eviction():
+    """測試超過上限時淘汰最久未使用的項目"""
+
+    async def scenario():
+        cache = MemoryCache(max_entries=2)
+        await cache.set("a", b"1", ttl=60)
+        await cache.set("b", b"2", ttl=60)
+        await cache.get("a")
+        await cache.set("c", b"3", ttl=60)
+        return [await cache.get(k) for k in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [b"1", None, b"3"]
+
+
+def test_memory_cache_ttl_and_tags():
+    """測試過期與依標籤失效"""
+
+    async def scenario():
+        cache = MemoryCache()
+        await cache.set("expired", b"x", ttl=-1)
+        await cache.set("k1", b"1", ttl=60, tags=["items"])
+        await cache.set("k2", b"2", ttl=60, tags=["root"])
+        await cache.invalidate(["items"])
+        return [await cache.get(k) for k in ("expired", "k1", "k2")]
+
+    assert asyncio.run(scenario()) == [None, None, b"2"]
+
+
+def test_memory_cache_tags_follow_eviction():
+    """測試淘汰與過期的項目也從標籤集合移除，標籤集合不會無限成長"""
+
+    async def scenario():
+        cache = MemoryCache(max_entries=8)
+        for i in range(100):
+            await cache.set(f"list:{i}", b"x", ttl=60, tags=["items"])
+        await cache.set("stale", b"x", ttl=-1, tags=["items", "root"])
+        assert await cache.get("stale") is None
+        return cache._tags
+
+    assert asyncio.run(scenario()) == {"items": {f"list:{i}" for i in range(93, 100)}}
+
+
+def test_cache_key_ignores_query_order():
+    """測試查詢參數順序不影響快取鍵"""
+    a = ResponseCache.make_key("GET", "/api/items", b"limit=10&sort=price")
+    b = ResponseCache.make_key("GET", "/api/items", b"sort=price&limit=10")
+    assert a == b
+    assert a != ResponseCache.make_key("GET", "/api/items", b"limit=20&sort=price")
+
+
+def test_redis_cache_roundtrip():
+    """測試 Redis 後端（使用 fakeredis）"""
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario():
+        cache = ResponseCache(RedisCache(fakeredis.FakeAsyncRedis()), ttl=60)
+        await cache.set("key", 200, [(b"content-type", b"application/json")], b"{}", ["items"])
+        hit = await cache.get("key")
+        await cache.invalidate("items")
+        return hit, await cache.get("key")
+
+    hit, after = asyncio.run(scenario())
+    assert hit == (200, [(b"content-type", b"application/json")], b"{}")
+    assert after is None
+
+
+def test_item_reads_are_cached_and_invalidated_on_write():
+    """測試讀取端點命中快取，寫入後失效"""
+    item_id = client.post("/api/items", json={"name": "Cached", "price": 1.0}).json()["id"]
+
+    assert client.get(f"/api/items/{item_id}").headers["x-cache"] == "MISS"
+    assert client.get(f"/api/items/{item_id}").headers["x-cache"] == "HIT"
+
+    client.put(f"/api/items/{item_id}", json={"price": 2.0})
+    response = client.get(f"/api/items/{item_id}")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()["price"] == 2.0
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 2
@@ -0,0 +1,124 @@
+"""
+單元測試 - 回應壓縮
+"""
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+from app.main import app
+
+client = TestClient(app)
+
+
+def _run_middleware(chunks, content_type=b"application/x-ndjson", accept=b"gzip", extra=()):
+    """以假的 ASGI 應用逐塊送出本體，回傳中介層實際送出的訊息"""
+
+    async def inner(scope, receive, send):
+        headers = [(b"content-type", content_type), *extra]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for index, chunk in enumerate(chunks):
+            more = index < len(chunks) - 1
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", accept)]}
+    asyncio.run(CompressionMiddleware(inner)(scope, None, send))
+    return sent
+
+
+def test_negotiate_respects_quality_values(monkeypatch):
+    """測試 Accept-Encoding 的 q 值與伺服器偏好"""
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate("br;q=0, *") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("") is None
+
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate("br, gzip;q=0.1") == "gzip"
+
+
+def test_small_response_is_not_compressed():
+    """測試小於門檻的回應原樣送出，但帶 Vary"""
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_list_is_compressed_with_weak_etag(override_settings):
+    """測試超過門檻的列表以 gzip 壓縮，ETag 改為弱 ETag 且仍可用於 304"""
+    override_settings(compression_minimum_size=64)
+    response = client.get("/api/items", params={"limit": 100}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) == response.num_bytes_downloaded
+    assert isinstance(response.json(), list)
+
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert client.get(
+        "/api/items", params={"limit": 100}, headers={"If-None-Match": etag}
+    ).status_code == 304
+
+
+def test_streaming_response_is_compressed_incrementally():
+    """測試串流回應逐塊壓縮：每一塊送出後客戶端都能立即解壓"""
+    chunks = [b'{"id": %d}\n' % i * 200 for i in range(3)]
+    sent = _run_middleware(chunks)
+
+    start = sent[0]
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decompressor = zlib.decompressobj(31)
+    for chunk, message in zip(chunks, sent[1:]):
+        assert decompressor.decompress(message["body"]) == chunk
+    assert sent[-1]["more_body"] is False
+
+
+def test_already_encoded_and_binary_responses_pass_through():
+    """測試已經壓縮或不可壓縮的內容類型不會重複壓縮"""
+    body = [b"x" * 4096]
+    encoded = _run_middleware(body, extra=[(b"content-encoding", b"gzip")])
+    binary = _run_middleware(body, content_type=b"image/png")
+    for sent in (encoded, binary):
+        assert sent[1]["body"] == body[0]
+        assert dict(sent[0]["headers"]).get(b"content-encoding") in (None, b"gzip")
+
+
+def test_export_with_gzip_flag_is_not_double_compressed():
+    """測試匯出端點自行 gzip 時中介層不再壓縮"""
+    response = client.get(
+        "/api/items/export", params={"gzip": "true"}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    lines = response.content.decode().splitlines()  # httpx 只解壓一次
+    assert all(json.loads(line)["id"] for line in lines)
+
+
+def test_brotli_when_available():
+    """測試有安裝 brotli 時優先使用 br"""
+    brotli = pytest.importorskip("brotli")
+    sent = _run_middleware([b"payload " * 1000], accept=b"gzip, br")
+    assert dict(sent[0]["headers"])[b"content-encoding"] == b"br"
+    assert brotli.decompress(sent[1]["body"]) == b"payload " * 1000
+
+
+def test_gzip_output_is_standard():
+    """測試一次送完的回應是完整的 gzip 檔案"""
+    sent = _run_middleware([b"payload " * 1000])
+    headers = dict(sent[0]["headers"])
+    assert int(headers[b"content-length"]) == len(sent[1]["body"])
+    assert gzip.decompress(sent[1]["body"]) == b"payload " * 1000
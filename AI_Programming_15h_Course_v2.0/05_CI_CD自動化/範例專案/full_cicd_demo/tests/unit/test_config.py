@@ -0,0 +1,126 @@
+"""
+單元測試 - 設定熱更新
+"""
+import logging
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.cache import get_cache
+from app.config import Settings, SettingsProvider, changed_fields, get_settings, settings_provider
+from app.database import get_async_engine, get_engine, reset_engines
+from app.log import reconfigure_logging
+from app.main import app
+from app.ratelimit import get_rate_limiter
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def env_file(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text("LOG_LEVEL=INFO\nCACHE_TTL=30\n")
+    return path
+
+
+def _provider(env_file) -> SettingsProvider:
+    return SettingsProvider(lambda: Settings(_env_file=str(env_file)), env_file=str(env_file))
+
+
+def _touch(path, content: str) -> None:
+    """寫入新內容，並讓修改時間確實往前（檔案系統的時間精度可能很粗）"""
+    stat = os.stat(path)
+    path.write_text(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_settings_are_immutable():
+    """測試設定物件不可修改，只能整份替換"""
+    with pytest.raises(ValidationError):
+        get_settings().cache_ttl = 1
+    assert changed_fields(Settings(cache_ttl=1), Settings(cache_ttl=2)) == {"cache_ttl"}
+
+
+def test_check_reloads_when_env_file_changes(env_file):
+    """測試 .env 修改後換上新的設定並通知訂閱者；沒有修改時不重新載入"""
+    provider = _provider(env_file)
+    before = provider.current
+    calls, cache_calls = [], []
+    provider.subscribe(lambda old, new: calls.append((old.log_level, new.log_level)))
+    provider.subscribe(lambda old, new: cache_calls.append(new.cache_ttl), {"cache_ttl"})
+
+    assert provider.check() == set()
+    assert provider.current is before
+
+    _touch(env_file, "LOG_LEVEL=DEBUG\nCACHE_TTL=30\n")
+    assert provider.check() == {"log_level"}
+    assert provider.current.log_level == "DEBUG"
+    assert before.log_level == "INFO"  # 舊物件不受影響，持有它的請求看到一致的設定
+    assert calls == [("INFO", "DEBUG")]
+    assert cache_calls == []
+
+
+def test_invalid_reload_keeps_current_settings(env_file, caplog):
+    """測試 .env 內容有誤時保留目前的設定"""
+    provider = _provider(env_file)
+    current = provider.current
+
+    _touch(env_file, "CACHE_TTL=soon\n")
+    with caplog.at_level(logging.ERROR, logger="app.config"):
+        assert provider.check() == set()
+    assert provider.current is current
+    assert "Settings reload failed" in caplog.text
+
+
+def test_failing_subscriber_does_not_block_others(env_file):
+    """測試某個訂閱者失敗時，新設定仍然生效且其他訂閱者照常收到通知"""
+    provider = _provider(env_file)
+    seen = []
+
+    def broken(old, new):
+        raise RuntimeError("boom")
+
+    provider.subscribe(broken)
+    provider.subscribe(lambda old, new: seen.append(new.cache_ttl))
+    assert provider.replace(cache_ttl=5) == {"cache_ttl"}
+    assert provider.current.cache_ttl == 5
+    assert seen == [5]
+
+
+def test_reconfigure_logging_changes_level():
+    """測試只改日誌等級時直接調整 root logger"""
+    root = logging.getLogger()
+    previous = root.level
+    with TestClient(app):  # 啟動時設定日誌
+        settings = get_settings()
+        reconfigure_logging(settings, settings.model_copy(update={"log_level": "ERROR"}))
+        assert root.level == logging.ERROR
+    root.setLevel(previous)
+
+
+def test_reset_engines_swaps_pool():
+    """測試連線池設定變動後改用新的 Engine，請求照常處理"""
+    engine, async_engine = get_engine(), get_async_engine()
+    settings = get_settings()
+    reset_engines(settings, settings.model_copy(update={"db_pool_size": 3}))
+
+    assert client.get("/api/items", params={"limit": 1}).status_code == 200
+    assert get_engine() is not engine
+    assert get_async_engine() is not async_engine
+
+
+def test_reload_notifies_registered_singletons(monkeypatch):
+    """測試全域 provider 重新載入時清除受影響的單例"""
+    cache, limiter = get_cache(), get_rate_limiter()
+    monkeypatch.setenv("CACHE_TTL", "7")
+    try:
+        assert "cache_ttl" in settings_provider.reload()
+        assert get_cache() is not cache
+        assert get_cache().ttl == 7
+        assert get_rate_limiter() is limiter
+    finally:
+        monkeypatch.undo()
+        settings_provider.reload()
+    assert get_settings().cache_ttl == 30
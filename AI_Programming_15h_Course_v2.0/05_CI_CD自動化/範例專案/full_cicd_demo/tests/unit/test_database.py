@@ -0,0 +1,97 @@
+"""
+單元測試 - 資料庫連線池
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.config import Settings
+from app.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    SyncSessionAdapter,
+    build_async_engine,
+    build_engine,
+    get_pool_stats,
+    to_async_url,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """使用暫存 SQLite 檔案建立 Engine"""
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'pool.db'}", db_pool_size=2)
+    engine = build_engine(settings)
+    yield engine
+    engine.dispose()
+
+
+def test_sessions_reuse_pooled_connection(engine):
+    """測試多個 Session 重複使用同一條連線"""
+    for _ in range(20):
+        with SessionLocal(bind=engine) as db:
+            db.execute(text("SELECT 1"))
+
+    stats = get_pool_stats(engine)
+    assert stats["checkouts"] == 20
+    assert stats["connects"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["wait_max_ms"] >= 0
+
+
+def test_sqlite_wal_enabled(engine):
+    """測試 SQLite 連線啟用 WAL"""
+    with engine.connect() as conn:
+        mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+    assert mode == "wal"
+
+
+def test_memory_database_uses_static_pool():
+    """測試記憶體資料庫使用單一連線"""
+    engine = build_engine(Settings(database_url="sqlite://"))
+    assert get_pool_stats(engine)["pool"] == "StaticPool"
+    engine.dispose()
+
+
+def test_to_async_url():
+    """測試同步連線字串轉換為非同步驅動"""
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert to_async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_async_sessions_run_concurrently(tmp_path):
+    """測試多個非同步 Session 並行查詢並共用連線池"""
+    settings = Settings(
+        database_url=f"sqlite:///{tmp_path / 'async.db'}", db_pool_size=4, db_max_overflow=0
+    )
+
+    async def run():
+        engine = build_async_engine(settings)
+
+        async def query(n):
+            async with AsyncSessionLocal(bind=engine) as db:
+                return (await db.execute(text("SELECT :n"), {"n": n})).scalar()
+
+        results = await asyncio.gather(*(query(n) for n in range(20)))
+        stats = get_pool_stats(engine)
+        await engine.dispose()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert results == list(range(20))
+    assert stats["checkouts"] == 20
+    assert stats["connects"] <= 4
+
+
+def test_sync_session_adapter(engine):
+    """測試同步後備方案提供相同的 await 介面"""
+
+    async def run():
+        db = SyncSessionAdapter(SessionLocal(bind=engine))
+        try:
+            return await db.scalar(text("SELECT 42"))
+        finally:
+            await db.close()
+
+    assert asyncio.run(run()) == 42
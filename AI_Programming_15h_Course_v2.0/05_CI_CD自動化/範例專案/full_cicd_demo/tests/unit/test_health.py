@@ -0,0 +1,105 @@
+"""
+單元測試 - 存活與就緒檢查
+"""
+import asyncio
+import time
+
+import fakeredis.aioredis
+from fastapi.testclient import TestClient
+
+from app.cache import RedisCache, ResponseCache
+from app.health import HealthChecker, get_health_checker, probe_redis
+from app.main import app
+
+client = TestClient(app)
+
+
+def _counting_probe(calls, delay=0.0, fail=False):
+    async def probe():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise ConnectionError("refused")
+
+    return probe
+
+
+def test_liveness_does_not_touch_dependencies():
+    """測試 /health 不檢查資料庫"""
+    data = client.get("/health").json()
+    assert data["status"] == "healthy"
+    assert "database" not in data["checks"]
+
+
+def test_readiness_reports_database_latency():
+    """測試 /ready 檢查資料庫並回報延遲"""
+    get_health_checker.cache_clear()
+    response = client.get("/ready")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["checks"]["database"]["status"] == "ok"
+    assert data["checks"]["database"]["latency_ms"] >= 0
+
+
+def test_readiness_returns_503_when_probe_fails():
+    """測試任一檢查失敗時回傳 503"""
+    app.dependency_overrides[get_health_checker] = lambda: HealthChecker(
+        {"database": _counting_probe([], fail=True)}, ttl=0
+    )
+    try:
+        response = client.get("/ready")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    check = response.json()["checks"]["database"]
+    assert check["status"] == "error"
+    assert "refused" in check["error"]
+
+
+def test_probes_run_concurrently_with_timeout():
+    """測試檢查並行執行，且逾時的檢查不會拖住整體"""
+    checker = HealthChecker(
+        {
+            "a": _counting_probe([], delay=0.2),
+            "b": _counting_probe([], delay=0.2),
+            "slow": _counting_probe([], delay=5),
+        },
+        timeout=0.3,
+    )
+
+    start = time.perf_counter()
+    result = asyncio.run(checker.check())
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1
+    assert result.checks["a"].status == "ok"
+    assert result.checks["slow"].status == "timeout"
+    assert result.status == "not_ready"
+
+
+def test_results_are_cached_and_shared():
+    """測試 TTL 內重用結果，同時進來的請求共用同一次檢查"""
+    calls = []
+    checker = HealthChecker({"database": _counting_probe(calls, delay=0.05)}, ttl=60)
+
+    async def run():
+        first = await asyncio.gather(*(checker.check() for _ in range(10)))
+        second = await checker.check()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result.status == "ready" for result in first)
+    assert second.cached is True
+
+
+def test_redis_probe(monkeypatch):
+    """測試 Redis 檢查使用回應快取的連線"""
+    cache = ResponseCache(RedisCache(fakeredis.aioredis.FakeRedis()))
+    monkeypatch.setattr("app.health.get_cache", lambda: cache)
+
+    result = asyncio.run(HealthChecker({"redis": probe_redis}).check())
+    assert result.checks["redis"].status == "ok"
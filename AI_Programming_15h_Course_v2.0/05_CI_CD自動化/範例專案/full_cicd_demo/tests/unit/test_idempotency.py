@@ -0,0 +1,167 @@
+"""
+單元測試 - 冪等鍵
+"""
+import asyncio
+import uuid
+
+import fakeredis
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import idempotency
+from app.idempotency import MemoryIdempotencyStore, RedisIdempotencyStore
+from app.main import app
+from app.repository import ItemRepository
+
+client = TestClient(app)
+
+ITEM = {"name": "Idempotent Lamp", "price": 12.5}
+
+
+@pytest.fixture
+def create_calls(monkeypatch):
+    """記錄實際執行寫入的次數；delay 讓並行的重複請求確實重疊"""
+    calls = []
+    original = ItemRepository.create
+
+    async def create(self, item):
+        calls.append(item.name)
+        await asyncio.sleep(0.05)
+        return await original(self, item)
+
+    monkeypatch.setattr(ItemRepository, "create", create)
+    return calls
+
+
+def _key() -> dict:
+    return {"Idempotency-Key": str(uuid.uuid4())}
+
+
+async def _post(headers: dict, count: int, concurrent: bool = False) -> list:
+    """在同一個事件迴圈中送出請求（並行，或依序逐一送出）"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        requests = [http.post("/api/items", json=ITEM, headers=headers) for _ in range(count)]
+        if concurrent:
+            return await asyncio.gather(*requests)
+        return [await request for request in requests]
+
+
+def test_retry_returns_stored_response(create_calls):
+    """測試以同一個鍵重試時回傳保存的回應，不再寫入資料庫"""
+    headers = _key()
+    first = client.post("/api/items", json=ITEM, headers=headers)
+    retry = client.post("/api/items", json=ITEM, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert create_calls == [ITEM["name"]]
+
+    # 沒有帶鍵的請求照常每次寫入
+    client.post("/api/items", json=ITEM)
+    client.post("/api/items", json=ITEM)
+    assert len(create_calls) == 3
+
+
+def test_concurrent_duplicates_run_once(create_calls):
+    """測試同一個鍵的並行請求只執行一次，其他請求拿到同一份回應"""
+    headers = _key()
+
+    responses = asyncio.run(_post(headers, 5, concurrent=True))
+    assert {r.status_code for r in responses} == {201}
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+    assert create_calls == [ITEM["name"]]
+
+
+def test_key_reused_with_different_body():
+    """測試同一個鍵搭配不同內容回 422，不同 API key 的相同鍵互不影響"""
+    headers = _key()
+    assert client.post("/api/items", json=ITEM, headers=headers).status_code == 201
+    response = client.post("/api/items", json={**ITEM, "price": 99.0}, headers=headers)
+    assert response.status_code == 422
+
+    other = client.post(
+        "/api/items", json={**ITEM, "price": 99.0}, headers={**headers, "X-API-Key": "other"}
+    )
+    assert other.status_code == 201
+    assert "idempotent-replayed" not in other.headers
+
+
+def test_server_error_is_not_stored(monkeypatch):
+    """測試 5xx 不保存：同一個鍵重試會重新執行"""
+    original = ItemRepository.create
+    failures = [RuntimeError("database unavailable")]
+
+    async def create(self, item):
+        if failures:
+            raise failures.pop()
+        return await original(self, item)
+
+    monkeypatch.setattr(ItemRepository, "create", create)
+    unsafe_client = TestClient(app, raise_server_exceptions=False)
+    headers = _key()
+    assert unsafe_client.post("/api/items", json=ITEM, headers=headers).status_code == 500
+
+    response = unsafe_client.post("/api/items", json=ITEM, headers=headers)
+    assert response.status_code == 201
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_invalid_key_and_wait_timeout(monkeypatch, override_settings):
+    """測試無效的鍵回 400；處理中的鍵等待逾時回 409"""
+    response = client.post("/api/items", json=ITEM, headers={"Idempotency-Key": "k" * 256})
+    assert response.status_code == 400
+
+    store = MemoryIdempotencyStore()
+    monkeypatch.setattr(idempotency, "get_idempotency_store", lambda: store)
+    override_settings(idempotency_wait_timeout=0.05)
+    headers = _key()
+    scope = {"headers": [], "method": "POST", "path": "/api/items"}
+    key = idempotency.store_key(scope, headers["Idempotency-Key"].encode())
+    assert asyncio.run(store.lock(key, 60)) is not None  # 另一個請求正在處理
+
+    response = client.post("/api/items", json=ITEM, headers=headers)
+    assert response.status_code == 409
+
+
+def test_redis_store():
+    """測試 Redis 儲存：處理中標記、token 比對與保存的回應"""
+
+    async def scenario():
+        store = RedisIdempotencyStore(fakeredis.FakeAsyncRedis())
+        token = await store.lock("k", 60)
+        assert token is not None
+        assert await store.lock("k", 60) is None
+
+        await store.unlock("k", "someone-else")
+        assert await store.lock("k", 60) is None
+
+        await store.save("k", token, b"record", 60)
+        assert await store.get("k") == b"record"
+        await store.wait("k", 1.0)  # 標記已釋放，立即返回
+        assert await store.lock("k", 60) is not None
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_end_to_end(monkeypatch, create_calls):
+    """測試以 Redis 儲存時，依序重試與並行的重複請求都只寫入一次"""
+    store = RedisIdempotencyStore(fakeredis.FakeAsyncRedis())
+    monkeypatch.setattr(store, "poll_interval", 0.01)
+    monkeypatch.setattr(idempotency, "get_idempotency_store", lambda: store)
+    headers = _key()
+
+    async def scenario():
+        first, retry = await _post(headers, 2)
+        duplicates = await _post(_key(), 3, concurrent=True)
+        return first, retry, duplicates
+
+    first, retry, duplicates = asyncio.run(scenario())
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len({r.json()["id"] for r in duplicates}) == 1
+    assert len(create_calls) == 2
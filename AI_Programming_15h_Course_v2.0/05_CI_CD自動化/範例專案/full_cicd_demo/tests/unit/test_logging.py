@@ -0,0 +1,128 @@
+"""
+單元測試 - 結構化日誌
+"""
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.log import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    request_id_var,
+    setup_logging,
+    shutdown_logging,
+)
+from app.main import app
+
+client = TestClient(app)
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_includes_extra_fields():
+    """測試 JSON 格式包含訊息、請求 ID 與額外欄位"""
+    record = _record()
+    record.request_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "abc"
+
+
+def test_rate_limit_filter_reports_suppressed():
+    """測試超過每秒上限的訊息被丟棄，下一個時間窗回報丟棄數"""
+    limiter = RateLimitFilter(limit_per_second=3, window=0.05)
+    passed = [limiter.filter(_record()) for _ in range(10)]
+    assert passed.count(True) == 3
+
+    # WARNING 以上不受限制
+    assert limiter.filter(_record(level=logging.ERROR))
+
+    time.sleep(0.06)
+    record = _record()
+    assert limiter.filter(record)
+    assert record.suppressed == 7
+
+
+def test_queue_handler_never_blocks_when_full():
+    """測試佇列滿時丟棄而不是阻塞"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    start = time.perf_counter()
+    for _ in range(1000):
+        handler.handle(_record())
+    assert time.perf_counter() - start < 1
+    assert handler.dropped == 999
+
+
+@contextmanager
+def root_without_capture():
+    """暫時移除 pytest 掛在 root logger 上的 handler（它們會在呼叫端格式化訊息）"""
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    for handler in saved:
+        root.removeHandler(handler)
+    try:
+        yield
+    finally:
+        for handler in saved:
+            root.addHandler(handler)
+
+
+def test_message_is_formatted_in_listener_thread():
+    """測試訊息在背景執行緒才格式化（呼叫端只放進佇列）"""
+    threads = []
+
+    class Probe:
+        def __str__(self):
+            threads.append(threading.current_thread())
+            return "probe"
+
+    stream = io.StringIO()
+    with root_without_capture():
+        setup_logging(Settings(log_format="json", log_rate_limit=0), stream=stream)
+        try:
+            logging.getLogger("probe").warning("value: %s", Probe())
+            assert threads == []
+        finally:
+            shutdown_logging()
+
+    assert threads and threads[0] is not threading.current_thread()
+    assert json.loads(stream.getvalue().splitlines()[-1])["message"] == "value: probe"
+
+
+def test_request_id_in_logs_and_response_header():
+    """測試請求 ID：沿用合法的 X-Request-ID，並出現在該請求的日誌中"""
+    stream = io.StringIO()
+    setup_logging(Settings(log_format="json", log_rate_limit=0), stream=stream)
+    try:
+        response = client.post(
+            "/api/items",
+            json={"name": "Logged", "price": 1.0},
+            headers={"X-Request-ID": "req-123"},
+        )
+    finally:
+        shutdown_logging()
+
+    assert response.headers["X-Request-ID"] == "req-123"
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    created = [e for e in entries if e["message"] == "Creating new item: Logged"]
+    assert created and created[0]["request_id"] == "req-123"
+    assert request_id_var.get() is None
+
+
+def test_invalid_request_id_is_replaced():
+    """測試格式不合法的請求 ID 會重新產生"""
+    response = client.get("/", headers={"X-Request-ID": "bad id\nwith newline"})
+    assert response.headers["X-Request-ID"] != "bad id\nwith newline"
+    assert len(response.headers["X-Request-ID"]) == 32
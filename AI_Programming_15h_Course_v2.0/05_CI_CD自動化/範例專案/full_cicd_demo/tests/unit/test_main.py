@@ -1,9 +1,15 @@
 """
 單元測試 - API 端點測試
 """
+import base64
+import json
+
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app
+from app.config import Settings
+from app.main import app, create_app
+from app.metrics import MetricsMiddleware, registry
+from app.routes import runtime_samples
 
 client = TestClient(app)
 
@@ -36,6 +42,39 @@ def test_list_items():
     assert len(data) > 0
 
 
+def test_list_items_cursor_pagination():
+    """測試 cursor 分頁逐頁讀取與一次讀取結果相同"""
+    expected = [item["id"] for item in client.get("/api/items").json()]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/items", params=params)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == expected
+
+
+def test_list_items_invalid_cursor():
+    """測試無效的 cursor"""
+    response = client.get("/api/items", params={"cursor": "bogus"})
+    assert response.status_code == 400
+
+    # 竄改過的 cursor：排序鍵型別不符、id 超出 int64
+    for payload in ({"s": "price", "v": {"a": 1}, "i": 1}, {"s": "id", "v": 1, "i": 2**70},
+                    {"s": "name", "v": 1.5, "i": 1}, {"s": "price", "v": 1.0, "i": "1"}):
+        raw = json.dumps(payload).encode()
+        forged = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        response = client.get("/api/items", params={"cursor": forged, "sort": payload["s"]})
+        assert response.status_code == 400
+
+
 def test_get_item():
     """測試獲取單個項目"""
     response = client.get("/api/items/1")
@@ -87,8 +126,148 @@ def test_update_item():
     data = response.json()
     assert data["name"] == update_data["name"]
 
+    # null 表示不修改該欄位
+    response = client.put("/api/items/1", json={"name": None, "price": None})
+    assert response.status_code == 200
+    assert response.json()["name"] == update_data["name"]
+    assert response.json()["price"] == update_data["price"]
+
 
 def test_delete_item():
     """測試刪除項目"""
     response = client.delete("/api/items/1")
     assert response.status_code == 204
+
+
+def test_bulk_create_update_delete():
+    """測試批次創建、更新、刪除"""
+    new_items = [{"name": f"Bulk {i}", "price": 1.0 + i} for i in range(5)]
+    response = client.post("/api/items/bulk", json=new_items)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["succeeded"] == 5
+    ids = [r["id"] for r in data["results"]]
+    assert [r["index"] for r in data["results"]] == list(range(5))
+
+    updates = [
+        {"id": ids[0], "price": 99.0},
+        {"id": ids[1], "name": "Renamed", "price": None},
+        {"id": 10**9},
+    ]
+    response = client.patch("/api/items/bulk", json=updates)
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["updated", "updated", "not_found"]
+    assert client.get(f"/api/items/{ids[0]}").json()["price"] == 99.0
+    assert client.get(f"/api/items/{ids[1]}").json()["price"] == 2.0
+    assert client.get(f"/api/items/{ids[1]}").json()["name"] == "Renamed"
+
+    response = client.request("DELETE", "/api/items/bulk", json=ids + [10**9])
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 5
+    assert data["failed"] == 1
+    assert client.get(f"/api/items/{ids[0]}").status_code == 404
+
+
+def test_bulk_create_invalid_batch():
+    """測試批次中任何一筆無效時整批拒絕"""
+    response = client.post("/api/items/bulk", json=[{"name": "ok", "price": 1}, {"name": ""}])
+    assert response.status_code == 422
+    assert client.post("/api/items/bulk", json=[]).status_code == 422
+
+
+def test_export_items_ndjson():
+    """測試 NDJSON 串流匯出"""
+    expected = client.get("/api/items", params={"limit": 1000}).json()
+
+    response = client.get("/api/items/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == expected
+
+
+def test_export_items_gzip():
+    """測試匯出即時 gzip 壓縮"""
+    plain = client.get("/api/items/export").text
+
+    response = client.get("/api/items/export", params={"gzip": True})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == plain  # httpx 會自動解壓縮
+
+
+def test_get_item_etag_not_modified():
+    """測試單筆項目的 ETag 與 304"""
+    item_id = client.post("/api/items", json={"name": "Tagged", "price": 3.0}).json()["id"]
+
+    response = client.get(f"/api/items/{item_id}")
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+
+    response = client.get(f"/api/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.put(f"/api/items/{item_id}", json={"price": 4.0})
+    response = client.get(f"/api/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_list_items_conditional_get():
+    """測試列表的 ETag / Last-Modified 與 304，刪除後失效"""
+    response = client.get("/api/items")
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    assert client.get("/api/items", headers={"If-None-Match": etag}).status_code == 304
+    response = client.get("/api/items", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    item_id = client.post("/api/items", json={"name": "Temp", "price": 1.0}).json()["id"]
+    etag = client.get("/api/items").headers["etag"]
+    client.delete(f"/api/items/{item_id}")
+    assert client.get("/api/items", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_list_items_etag_per_page():
+    """測試不同頁的 ETag 不同；參數無效時即使 ETag 符合也回傳 400"""
+    for index in range(3):
+        client.post("/api/items", json={"name": f"Page {index}", "price": 1.0})
+    first = client.get("/api/items", params={"limit": 1})
+    cursor = first.headers["X-Next-Cursor"]
+    etags = {
+        first.headers["etag"],
+        client.get("/api/items", params={"limit": 1, "cursor": cursor}).headers["etag"],
+        client.get("/api/items", params={"limit": 2}).headers["etag"],
+        client.get("/api/items", params={"limit": 1, "sort": "-id"}).headers["etag"],
+        client.get("/api/items", params={"limit": 1, "skip": 1}).headers["etag"],
+    }
+    assert len(etags) == 5
+
+    response = client.get(
+        "/api/items", params={"limit": 1, "cursor": cursor},
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+    assert response.status_code == 200
+
+    for conditional in ({"If-None-Match": first.headers["etag"]}, {"If-None-Match": "*"},
+                        {"If-Modified-Since": first.headers["last-modified"]}):
+        response = client.get("/api/items", params={"cursor": "bogus"}, headers=conditional)
+        assert response.status_code == 400
+
+
+def test_create_app_with_settings():
+    """測試 create_app 依設定註冊文件頁面與中介層，與預設應用互不影響"""
+    custom = create_app(Settings(enable_swagger=False, enable_cors=False, metrics_enabled=False))
+    custom_client = TestClient(custom)
+    origin = {"Origin": "https://example.com"}
+
+    assert custom_client.get("/docs").status_code == 404
+    assert "access-control-allow-origin" not in custom_client.get("/health", headers=origin).headers
+    assert MetricsMiddleware not in [m.cls for m in custom.user_middleware]
+
+    assert client.get("/docs").status_code == 200
+    assert "access-control-allow-origin" in client.get("/health", headers=origin).headers
+    assert registry.collectors.count(runtime_samples) == 1
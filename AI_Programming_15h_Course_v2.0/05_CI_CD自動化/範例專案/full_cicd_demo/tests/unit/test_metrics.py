@@ -0,0 +1,136 @@
+"""
+單元測試 - 監控指標
+"""
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import (
+    LATENCY_BUCKETS,
+    RETIRED_SNAPSHOT,
+    MetricsRegistry,
+    collect,
+    merge_snapshots,
+    render,
+    retire_snapshot,
+)
+
+client = TestClient(app)
+
+
+def _sample(text, prefix):
+    """取出以 prefix 開頭那一行的數值"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    """測試分桶輸出為累積計數並包含 +Inf"""
+    metrics = MetricsRegistry()
+    metrics.record("GET", "/x", 200, 0.003, 10, 0.0)
+    metrics.record("GET", "/x", 200, 0.2, 10, 0.0)
+    metrics.record("GET", "/x", 200, 30.0, 10, 0.0)
+    text = render(merge_snapshots([metrics.snapshot()]))
+
+    prefix = 'http_request_duration_seconds_bucket{method="GET",route="/x",'
+    assert _sample(text, prefix + 'le="0.005"}') == 1
+    assert _sample(text, prefix + 'le="0.25"}') == 2
+    assert _sample(text, prefix + 'le="+Inf"}') == 3
+    assert _sample(text, 'http_request_duration_seconds_count{method="GET",route="/x"}') == 3
+
+
+def test_merge_worker_snapshots():
+    """測試多個 worker 的快照合併後計數相加"""
+    workers = [MetricsRegistry(), MetricsRegistry()]
+    for metrics in workers:
+        metrics.record("GET", "/x", 200, 0.01, 10, 0.001)
+    workers[1].in_flight = 2
+
+    merged = merge_snapshots(m.snapshot() for m in workers)
+    assert merged["requests"][("GET", "/x", 200)] == 2
+    assert sum(merged["latency"][("GET", "/x")][0]) == 2
+    assert merged["in_flight"] == 2
+
+
+def test_route_template_label():
+    """測試路由標籤使用路由樣板，不同 id 共用同一個時間序列"""
+    client.get("/api/items/1")
+    client.get("/api/items/2")
+    text = client.get("/metrics").text
+
+    assert 'route="/api/items/{item_id}"' in text
+    assert 'route="/api/items/1"' not in text
+
+
+def test_metrics_endpoint_reports_db_time_and_runtime_stats():
+    """測試 /metrics 回報資料庫耗時、快取與連線池狀態"""
+    client.get("/api/items", params={"limit": 2, "sort": "-price"})
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    db_seconds = _sample(text, 'http_request_db_seconds_sum{method="GET",route="/api/items"}')
+    assert db_seconds > 0
+    assert "app_cache_misses_total" in text
+    assert "db_pool_checkouts_total{engine=" in text
+
+
+def test_multiprocess_snapshots_are_merged(tmp_path):
+    """測試共用目錄中其他 worker 的快照會一起回報"""
+    other = MetricsRegistry()
+    other.record("GET", "/other-worker", 200, 0.01, 10, 0.0)
+    (tmp_path / "metrics-999999.json").write_text(json.dumps(other.snapshot()))
+
+    text = collect(str(tmp_path))
+    assert 'route="/other-worker"' in text
+    assert any(p.name.startswith("metrics-") and p.name != "metrics-999999.json"
+               for p in tmp_path.iterdir())
+
+
+def _dead_worker_snapshot(route: str) -> dict:
+    """已結束 worker 留下的快照：一筆請求、一個進行中請求與一個連線池 gauge"""
+    worker = MetricsRegistry()
+    worker.record("GET", route, 200, 0.01, 10, 0.0)
+    worker.in_flight = 1
+    worker.add_collector(lambda: [("db_pool_checked_out", "gauge", "Checked out", {}, 3)])
+    return worker.snapshot()
+
+
+def _gauges(text: str) -> list:
+    return [line for line in text.splitlines()
+            if line.startswith(("http_requests_in_flight", "db_pool_checked_out"))]
+
+
+def test_retired_workers_keep_counters_only(tmp_path):
+    """測試 worker 結束後計數併入彙總檔、快照檔刪除，gauge 不再計入"""
+    for pid, route in ((999997, "/first"), (999998, "/second")):
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(_dead_worker_snapshot(route)))
+        retire_snapshot(str(tmp_path), pid)
+    retire_snapshot(str(tmp_path), 999996)  # 沒有快照的 worker
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [RETIRED_SNAPSHOT]
+    text = collect(str(tmp_path))
+    assert 'route="/first"' in text and 'route="/second"' in text
+    assert _gauges(text) == _gauges(collect())  # 只有本 worker 的 gauge
+
+    # 尚未清除的已結束 worker：計數照算，gauge 略過
+    (tmp_path / "metrics-999995.json").write_text(json.dumps(_dead_worker_snapshot("/third")))
+    text = collect(str(tmp_path))
+    assert 'route="/third"' in text
+    assert _gauges(text) == _gauges(collect())
+
+
+def test_record_overhead():
+    """測試每次記錄的成本維持在微秒等級"""
+    metrics = MetricsRegistry()
+    n = 20_000
+    start = time.perf_counter()
+    for i in range(n):
+        metrics.record("GET", "/x", 200, LATENCY_BUCKETS[i % 11], 100, 0.001)
+    per_call = (time.perf_counter() - start) / n
+    assert per_call < 50e-6
@@ -0,0 +1,152 @@
+"""
+單元測試 - 限流與過載保護
+"""
+import asyncio
+import time
+
+import fakeredis.aioredis
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.ratelimit import (
+    AdaptiveConcurrencyLimiter,
+    MemoryTokenBucket,
+    RateLimiter,
+    RedisTokenBucket,
+)
+
+client = TestClient(app)
+
+
+def _scope(api_key=None, ip="10.0.0.1"):
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    return {"type": "http", "headers": headers, "client": (ip, 12345)}
+
+
+def test_memory_bucket_allows_burst_then_refills():
+    """測試令牌用完後拒絕，經過時間後補充"""
+
+    async def scenario():
+        bucket = MemoryTokenBucket(rate=50, burst=3)
+        first = [await bucket.acquire("a") for _ in range(4)]
+        other = await bucket.acquire("b")
+        await asyncio.sleep(0.05)
+        return first, other, await bucket.acquire("a")
+
+    first, other, refilled = asyncio.run(scenario())
+    assert [d.allowed for d in first] == [True, True, True, False]
+    assert [d.remaining for d in first[:3]] == [2, 1, 0]
+    assert 0 < first[3].retry_after <= 0.02
+    assert other.allowed  # 每個鍵各自計算
+    assert refilled.allowed
+
+
+def test_redis_bucket_is_shared_between_workers():
+    """測試兩個 worker 的 Redis 限流共用同一個桶"""
+    server = fakeredis.FakeServer()
+    workers = [
+        RedisTokenBucket(fakeredis.aioredis.FakeRedis(server=server), rate=1, burst=3)
+        for _ in range(2)
+    ]
+
+    async def scenario():
+        return [await workers[i % 2].acquire("client") for i in range(4)]
+
+    decisions = asyncio.run(scenario())
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[3].retry_after > 0.9
+
+
+def test_client_key_prefers_hashed_api_key():
+    """測試有 API key 時以雜湊後的 key 計算，否則用客戶端 IP"""
+    limiter = RateLimiter(MemoryTokenBucket(rate=1, burst=1))
+    key = limiter.client_key(_scope(api_key="secret-token"))
+    assert key.startswith("key:") and "secret-token" not in key
+    assert limiter.client_key(_scope(api_key="secret-token", ip="10.0.0.2")) == key
+    assert limiter.client_key(_scope()) == "ip:10.0.0.1"
+
+
+def test_rate_limiter_fails_open_when_backend_errors():
+    """測試 Redis 無法連線時放行並計數"""
+
+    class BrokenBackend:
+        burst = 5
+
+        async def acquire(self, key):
+            raise ConnectionError("refused")
+
+    limiter = RateLimiter(BrokenBackend())
+    decision = asyncio.run(limiter.check(_scope()))
+    assert decision.allowed
+    assert limiter.decisions["error"] == 1
+
+
+def test_rate_limit_middleware_returns_429(monkeypatch, override_settings):
+    """測試超過額度回 429 + Retry-After，健康檢查不受限制"""
+    limiter = RateLimiter(MemoryTokenBucket(rate=0.5, burst=2))
+    override_settings(rate_limit_enabled=True)
+    monkeypatch.setattr("app.ratelimit.get_rate_limiter", lambda: limiter)
+
+    responses = [client.get("/", headers={"X-API-Key": "k1"}) for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Remaining"] == "1"
+    assert responses[2].headers["Retry-After"] == "2"
+    assert responses[2].json() == {"detail": "Too Many Requests"}
+
+    assert client.get("/", headers={"X-API-Key": "k2"}).status_code == 200
+    assert client.get("/health", headers={"X-API-Key": "k1"}).status_code == 200
+    assert limiter.decisions == {"allowed": 3, "limited": 1, "error": 0}
+
+
+def test_concurrency_limiter_sheds_after_queue_target():
+    """測試名額用完時排隊，排隊超過目標時間就拒絕"""
+
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, min_limit=1, queue_target=0.05)
+        assert await limiter.acquire()
+        handed_over = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)  # 名額轉交給排隊中的請求
+        assert await handed_over
+        shed = await limiter.acquire()  # 名額一直沒有釋放
+        return limiter, shed
+
+    limiter, shed = asyncio.run(scenario())
+    assert shed is False
+    assert (limiter.in_flight, limiter.admitted, limiter.shed, limiter.queued) == (1, 2, 1, 0)
+
+
+def test_concurrency_limit_adapts_to_latency():
+    """測試延遲穩定時放寬上限，延遲升高時收緊"""
+    limiter = AdaptiveConcurrencyLimiter(initial=20, min_limit=4, max_limit=100)
+    limiter.in_flight = 20
+    for _ in range(50):
+        limiter._update_limit(0.01)
+    grown = limiter.limit
+    assert grown > 20
+
+    for _ in range(40):
+        limiter._update_limit(0.2)
+    assert limiter.limit < grown / 2
+
+
+def test_tail_latency_bounded_under_overload():
+    """測試過載時每個請求的等待時間有上限：不是很快完成就是很快被拒絕"""
+    limiter = AdaptiveConcurrencyLimiter(initial=2, min_limit=2, max_limit=2, queue_target=0.05)
+
+    async def request():
+        start = time.perf_counter()
+        if not await limiter.acquire():
+            return "shed", time.perf_counter() - start
+        await asyncio.sleep(0.02)
+        limiter.release(0.02)
+        return "ok", time.perf_counter() - start
+
+    async def scenario():
+        return await asyncio.gather(*(request() for _ in range(40)))
+
+    results = asyncio.run(scenario())
+    outcomes = [outcome for outcome, _ in results]
+    assert 0 < outcomes.count("ok") < 40
+    assert max(elapsed for _, elapsed in results) < 0.05 + 0.02 + 0.05
+    assert limiter.in_flight == 0 and limiter.queued == 0
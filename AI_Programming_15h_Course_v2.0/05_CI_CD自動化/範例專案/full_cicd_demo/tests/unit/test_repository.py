@@ -0,0 +1,151 @@
+"""
+單元測試 - Items Repository
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import select, text
+
+from app.config import Settings
+from app.database import AsyncSessionLocal, Base, build_async_engine
+from app.models import ItemBulkUpdate, ItemCreate, ItemUpdate
+from app.repository import InvalidCursorError, ItemRecord, ItemRepository
+
+
+@pytest.fixture
+def run(tmp_path):
+    """在獨立的暫存資料庫上執行非同步測試函式"""
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'repo.db'}")
+
+    def runner(fn):
+        async def main():
+            engine = build_async_engine(settings)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                async with AsyncSessionLocal(bind=engine) as db:
+                    return await fn(ItemRepository(db))
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return runner
+
+
+def test_crud_roundtrip(run):
+    """測試新增、查詢、更新、刪除"""
+
+    async def scenario(repo):
+        created = await repo.create(ItemCreate(name="Widget", price=9.5))
+        assert created.id is not None
+
+        updated = await repo.update(created.id, ItemUpdate(price=12.0))
+        assert updated.name == "Widget"
+        assert updated.price == 12.0
+
+        assert (await repo.get(created.id)).price == 12.0
+        assert await repo.delete(created.id) is True
+        assert await repo.get(created.id) is None
+        assert await repo.delete(created.id) is False
+
+    run(scenario)
+
+
+def test_list_is_ordered_by_id(run):
+    """測試列表依 id 排序並支援 OFFSET 分頁"""
+
+    async def scenario(repo):
+        for i in range(5):
+            await repo.create(ItemCreate(name=f"Item {i}", price=1 + i))
+        page, _ = await repo.list_page(skip=1, limit=2)
+        return [item.name for item in page]
+
+    assert run(scenario) == ["Item 1", "Item 2"]
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "price", "-price", "name"])
+def test_cursor_pages_cover_all_rows(run, sort):
+    """測試依 cursor 逐頁讀取，結果與一次讀取完全相同（含重複的排序鍵）"""
+
+    async def scenario(repo):
+        for i in range(11):
+            await repo.create(ItemCreate(name=f"Item {i % 4}", price=1 + i % 3))
+
+        expected, _ = await repo.list_page(limit=100, sort=sort)
+        seen, cursor = [], None
+        while True:
+            page, cursor = await repo.list_page(limit=3, cursor=cursor, sort=sort)
+            seen.extend(page)
+            if cursor is None:
+                return [i.id for i in expected], [i.id for i in seen]
+
+    expected, seen = run(scenario)
+    assert seen == expected
+    assert len(seen) == 11
+
+
+def test_cursor_must_match_sort(run):
+    """測試 cursor 與排序方式不符時拒絕"""
+
+    async def scenario(repo):
+        for i in range(3):
+            await repo.create(ItemCreate(name=f"Item {i}", price=1 + i))
+        _, cursor = await repo.list_page(limit=1, sort="price")
+        with pytest.raises(InvalidCursorError):
+            await repo.list_page(limit=1, cursor=cursor, sort="name")
+        with pytest.raises(InvalidCursorError):
+            await repo.list_page(limit=1, cursor="not-a-cursor")
+
+    run(scenario)
+
+
+def test_seed_only_when_empty(run):
+    """測試示範資料只在資料表為空時寫入"""
+
+    async def scenario(repo):
+        items = [ItemCreate(name="A", price=1), ItemCreate(name="B", price=2)]
+        await repo.seed(items)
+        await repo.seed(items)
+        return await repo.count()
+
+    assert run(scenario) == 2
+
+
+def test_sorted_query_uses_index(run):
+    """測試依價格排序的查詢走複合索引，而不是全表排序"""
+
+    async def scenario(repo):
+        stmt = select(ItemRecord).order_by(ItemRecord.price, ItemRecord.id).limit(10)
+        sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+        rows = await repo.db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return " ".join(row[-1] for row in rows)
+
+    plan = run(scenario)
+    assert "ix_items_price_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_bulk_create_ids_follow_input_order(run):
+    """測試批次新增回傳的 id 與輸入順序一一對應"""
+
+    async def scenario(repo):
+        await repo.create(ItemCreate(name="existing", price=1))
+        ids = await repo.bulk_create([ItemCreate(name=f"B{i}", price=1 + i) for i in range(50)])
+        return [(await repo.get(item_id)).name for item_id in ids]
+
+    assert run(scenario) == [f"B{i}" for i in range(50)]
+
+
+def test_bulk_update_and_delete_report_missing(run):
+    """測試批次更新與刪除逐筆回報是否存在"""
+
+    async def scenario(repo):
+        ids = await repo.bulk_create([ItemCreate(name=f"B{i}", price=1) for i in range(3)])
+        found = await repo.bulk_update(
+            [ItemBulkUpdate(id=ids[0], price=5), ItemBulkUpdate(id=999)]
+        )
+        deleted = await repo.bulk_delete([ids[1], 999])
+        return found, deleted, (await repo.get(ids[0])).price, await repo.count()
+
+    assert run(scenario) == ([True, False], [True, False], 5.0, 2)
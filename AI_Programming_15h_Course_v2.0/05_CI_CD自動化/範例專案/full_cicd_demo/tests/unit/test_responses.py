@@ -0,0 +1,41 @@
+"""
+單元測試 - JSON 回應序列化
+"""
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.responses import render_items
+from tests.benchmark.serialization import fastapi_default, sample_records
+
+client = TestClient(app)
+
+
+def test_render_items_falls_back_for_unloaded_attributes():
+    """測試欄位未載入時改用一般屬性存取"""
+    record = sample_records(1)[0]
+    del record.__dict__["description"]
+    assert json.loads(render_items([record], validate=False))[0]["description"] is None
+
+
+def test_render_items_matches_fastapi_output():
+    """測試兩種快速路徑輸出的資料與 FastAPI 原本的流程相同"""
+    records = sample_records(50)
+    expected = json.loads(fastapi_default(records))
+
+    validated = render_items(records, validate=True)
+    trusted = render_items(records, validate=False)
+    assert json.loads(validated) == expected
+    assert trusted == validated
+
+
+def test_list_endpoint_returns_json_with_headers():
+    """測試列表端點回傳 JSON 並保留 ETag 與 cursor 標頭"""
+    response = client.get("/api/items", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "ETag" in response.headers
+    assert "X-Next-Cursor" in response.headers
+    assert len(response.json()) == 1
+
@@ -0,0 +1,149 @@
+"""
+單元測試 - 項目搜尋
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.main import app
+from app.search import (
+    RELEVANCE_CANDIDATES,
+    InvertedIndex,
+    ItemSearch,
+    SearchQuery,
+    parse_terms,
+)
+
+client = TestClient(app)
+
+ROWS = [
+    (1, "Wireless Mouse", "無線滑鼠，2.4GHz 接收器", 25.0),
+    (2, "Wired Mouse", None, 12.5),
+    (3, "Mechanical Keyboard", "青軸機械鍵盤", 89.0),
+    (4, "無線鍵盤", "Wireless keyboard with mouse pad", 45.0),
+]
+
+
+def _search(**kwargs):
+    kwargs.setdefault("sort", "relevance" if kwargs.get("terms") else "id")
+    return InvertedIndex(ROWS).search(SearchQuery(**kwargs))
+
+
+@pytest.fixture(params=["auto", "memory"])
+def backend(request, override_settings):
+    """每個端點測試分別以資料庫索引（SQLite FTS5）與行程內索引執行"""
+    override_settings(search_backend=request.param)
+    return request.param
+
+
+@pytest.fixture
+def catalog():
+    """以隨機前綴建立一組項目，不受其他測試的資料影響"""
+    tag = "zq" + uuid.uuid4().hex[:8]
+    items = [
+        {"name": f"{tag} Alpha Lamp", "description": "desk lamp", "price": 30.0},
+        {"name": f"{tag} Beta Lamp", "description": "floor lamp, warm light", "price": 120.0},
+        {"name": f"{tag} Gamma Chair", "description": "office chair", "price": 75.0},
+    ]
+    response = client.post("/api/items/bulk", json=items)
+    ids = [r["id"] for r in response.json()["results"]]
+    yield tag, ids
+    client.request("DELETE", "/api/items/bulk", json=ids)
+
+
+def test_parse_terms():
+    """測試查詢字串拆詞：小寫、去重"""
+    assert parse_terms("  Lamp lamp  DESK ") == ("lamp", "desk")
+    assert parse_terms(None) == ()
+
+
+def test_inverted_index_matches_all_terms():
+    """測試每個詞都必須出現（name 或 description，不分大小寫）"""
+    assert _search(terms=("wireless",)) == [1, 4]  # 相關性相同時依 id
+    assert _search(terms=("mouse",)) == [1, 2, 4]
+    assert _search(terms=("wireless", "keyboard"), sort="id") == [4]
+    assert _search(terms=("無線",), sort="id") == [1, 4]  # 少於 3 個字：逐筆比對
+    assert _search(terms=("機械鍵盤",)) == [3]
+    assert _search(terms=("nothing",)) == []
+
+
+def test_inverted_index_filters_and_sorts():
+    """測試價格區間、排序與分頁"""
+    assert _search(terms=(), min_price=20, max_price=50) == [1, 4]
+    assert _search(terms=("mouse",), sort="-price") == [4, 1, 2]
+    assert _search(terms=(), sort="name", limit=2) == [3, 2]
+    assert _search(terms=(), sort="id", skip=3) == [4]
+
+
+def test_search_endpoint(backend, catalog):
+    """測試文字搜尋、價格區間與排序"""
+    tag, ids = catalog
+
+    response = client.get("/api/items/search", params={"q": f"{tag} lamp", "sort": "-price"})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [ids[1], ids[0]]
+
+    response = client.get("/api/items/search", params={"q": tag, "min_price": 50, "sort": "price"})
+    assert [item["id"] for item in response.json()] == [ids[2], ids[1]]
+
+    response = client.get("/api/items/search", params={"q": f"{tag} WARM"})
+    assert [item["name"] for item in response.json()] == [f"{tag} Beta Lamp"]
+
+
+def test_search_reflects_writes(backend, catalog):
+    """測試更新與刪除後索引立即反映"""
+    tag, ids = catalog
+    client.put(f"/api/items/{ids[2]}", json={"name": f"{tag} Gamma Stool", "description": "stool"})
+    client.delete(f"/api/items/{ids[0]}")
+
+    response = client.get("/api/items/search", params={"q": tag, "sort": "id"})
+    assert [item["name"] for item in response.json()] == [f"{tag} Beta Lamp", f"{tag} Gamma Stool"]
+    assert client.get("/api/items/search", params={"q": f"{tag} chair"}).json() == []
+
+
+def test_backends_return_same_results(override_settings, catalog):
+    """測試 FTS5 與行程內索引的比對語意相同"""
+    tag, _ = catalog
+    override_settings(cache_enabled=False)
+    queries = [f"{tag}", f"{tag} lamp", f"{tag} la", f"{tag} ffice", "nothing-matches"]
+    results = {}
+    for backend in ("auto", "memory"):
+        override_settings(search_backend=backend)
+        results[backend] = [
+            client.get("/api/items/search", params={"q": q, "sort": "id"}).json() for q in queries
+        ]
+    assert results["auto"] == results["memory"]
+
+
+def test_search_validation():
+    """測試價格區間與排序參數驗證"""
+    response = client.get("/api/items/search", params={"min_price": 10, "max_price": 5})
+    assert response.status_code == 400
+    assert client.get("/api/items/search", params={"sort": "rank"}).status_code == 422
+    assert client.get("/api/items/search", params={"limit": 1000}).status_code == 422
+
+
+def test_relevance_paging_is_limited_to_candidates():
+    """測試依相關性排序只能翻到前 RELEVANCE_CANDIDATES 筆，超過時回 422 而不是空頁"""
+    params = {"q": "item", "limit": 50}
+    assert client.get("/api/items/search",
+                      params={**params, "skip": RELEVANCE_CANDIDATES - 50}).status_code == 200
+    response = client.get("/api/items/search", params={**params, "skip": RELEVANCE_CANDIDATES})
+    assert response.status_code == 422
+    assert "sort=id" in response.json()["detail"]
+
+    # 其他排序與沒有 q 時照常翻頁
+    assert client.get("/api/items/search",
+                      params={**params, "skip": 250, "sort": "id"}).status_code == 200
+    assert client.get("/api/items/search", params={"skip": 250}).status_code == 200
+
+
+def test_postgres_query_uses_trigram_index_expression():
+    """測試 PostgreSQL 查詢的運算式與 pg_trgm 索引一致，才能走索引"""
+    query = SearchQuery(terms=("lamp",), min_price=10, sort="relevance")
+    stmt = ItemSearch(None)._statement(query, "postgresql")
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(items.name || ' ' || coalesce(items.description, '')) ILIKE" in sql
+    assert "items_fts" not in sql
@@ -0,0 +1,54 @@
+"""
+單元測試 - 多 worker 啟動器
+"""
+import pytest
+
+from app.config import Settings
+from app.database import active_engines, get_engine
+from app.server import (
+    available_cpus,
+    child_exit,
+    gunicorn_options,
+    post_fork,
+    worker_count,
+)
+
+
+def test_worker_count_defaults_to_available_cpus():
+    """測試未設定 WEB_CONCURRENCY 時每顆 CPU 一個 worker"""
+    assert worker_count(Settings(), cpus=4) == 4
+    assert worker_count(Settings(web_concurrency=3), cpus=4) == 3
+    assert available_cpus() >= 1
+
+
+def test_gunicorn_options_from_settings():
+    """測試 gunicorn 設定來自 Settings"""
+    options = gunicorn_options(Settings(
+        server_port=9000, web_concurrency=2, server_max_requests=500, server_preload=True
+    ))
+
+    assert options["bind"] == "0.0.0.0:9000"
+    assert options["workers"] == 2
+    assert options["max_requests"] == 500
+    assert options["preload_app"] is True
+    assert options["worker_class"] == "app.server.Worker"
+    assert options["child_exit"] is child_exit
+
+
+def test_post_fork_drops_inherited_engines():
+    """測試 fork 後丟棄從 master 繼承的 Engine，worker 內重新建立"""
+    inherited = get_engine()
+    post_fork(server=None, worker=None)
+
+    assert active_engines() == {}
+    assert get_engine() is not inherited
+
+
+def test_worker_uses_configured_loop_and_http():
+    """測試 uvicorn worker 使用設定的事件迴圈與 HTTP 解析器"""
+    pytest.importorskip("gunicorn")
+    from app.server import Worker
+
+    assert Worker.CONFIG_KWARGS["loop"] == "auto"
+    assert Worker.CONFIG_KWARGS["http"] == "auto"
+    assert Worker.CONFIG_KWARGS["lifespan"] == "on"
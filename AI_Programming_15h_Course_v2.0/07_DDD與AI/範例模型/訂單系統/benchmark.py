@@ -0,0 +1,668 @@
+"""
+訂單系統領域模型 - 微基準測試
+
+比較優化前後的實作（優化前的版本保留在本檔作為基準）。
+每項量測前先確認兩者的結果完全一致，再比較每次操作的耗時：
+
+    python3 benchmark.py
+    python3 benchmark.py money --number 200000
+    python3 benchmark.py total
+    python3 benchmark.py batch     # 安裝 NumPy 時一併量測 int64 向量化版本
+    python3 benchmark.py store
+    python3 benchmark.py bus
+"""
+import argparse
+import asyncio
+import importlib.util
+import logging
+import random
+import sys
+import timeit
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+
+def _load_domain_model():
+    """domain-model.py 的檔名不是合法的模組名稱，改用檔案路徑載入"""
+    path = Path(__file__).with_name("domain-model.py")
+    spec = importlib.util.spec_from_file_location("domain_model", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclasses 需要從 sys.modules 找到模組
+    spec.loader.exec_module(module)
+    return module
+
+
+dm = _load_domain_model()
+Currency = dm.Currency
+
+
+def best_ns(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """執行 repeat 輪、每輪 number 次，取最快一輪的每次耗時（奈秒）"""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e9
+
+
+def format_rows(rows: List[Tuple[str, float, float]]) -> str:
+    lines = [f"{'':<14}{'before ns':>12}{'after ns':>12}{'speedup':>10}"]
+    for name, before, after in rows:
+        lines.append(f"{name:<14}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+    return "\n".join(lines)
+
+
+# ============================================================================
+# Money
+# ============================================================================
+
+@dataclass(frozen=True)
+class LegacyMoney:
+    """優化前的 Money：frozen dataclass，每次運算都重新驗證與量化"""
+    amount: Decimal
+    currency: Currency = Currency.TWD
+
+    def __post_init__(self):
+        if self.amount < 0:
+            raise ValueError("金額不能為負數")
+        quantized = self.amount.quantize(Decimal('0.01'))
+        object.__setattr__(self, 'amount', quantized)
+
+    def add(self, other: 'LegacyMoney') -> 'LegacyMoney':
+        if self.currency != other.currency:
+            raise ValueError(f"不同幣種無法相加: {self.currency} vs {other.currency}")
+        return LegacyMoney(self.amount + other.amount, self.currency)
+
+    def subtract(self, other: 'LegacyMoney') -> 'LegacyMoney':
+        if self.currency != other.currency:
+            raise ValueError(f"不同幣種無法相減: {self.currency} vs {other.currency}")
+        result = self.amount - other.amount
+        if result < 0:
+            raise ValueError("結果金額不能為負數")
+        return LegacyMoney(result, self.currency)
+
+    def multiply(self, multiplier: Decimal) -> 'LegacyMoney':
+        return LegacyMoney(self.amount * multiplier, self.currency)
+
+    def __str__(self) -> str:
+        return f"{self.currency.value} {self.amount:.2f}"
+
+
+def _same_money(legacy: LegacyMoney, money) -> bool:
+    # str(amount) 也要相同：小數位數（exponent）一致，而不只是數值相等
+    return (legacy.currency == money.currency
+            and str(legacy.amount) == str(money.amount)
+            and str(legacy) == str(money))
+
+
+def check_money(samples: int = 20000) -> None:
+    """隨機金額與乘數（含剛好落在 .5 的進位邊界）比對新舊實作"""
+    rng = random.Random(42)
+    multipliers = [Decimal('0'), Decimal('0.5'), Decimal('0.05'), Decimal('0.15'),
+                   Decimal('1.125'), Decimal('3'), 7]
+    for _ in range(samples):
+        raw = Decimal(rng.randrange(0, 10**9)).scaleb(-rng.randrange(0, 5))
+        other = Decimal(rng.randrange(0, 10**6)).scaleb(-3)
+        multiplier = rng.choice(multipliers + [Decimal(rng.randrange(0, 10**4)).scaleb(-4)])
+
+        legacy, money = LegacyMoney(raw), dm.Money(raw)
+        assert _same_money(legacy, money), (raw, legacy, money)
+        assert _same_money(legacy.multiply(multiplier), money.multiply(multiplier)), \
+            (raw, multiplier)
+        assert _same_money(legacy.add(LegacyMoney(other)), money.add(dm.Money(other)))
+        if legacy.amount >= LegacyMoney(other).amount:
+            assert _same_money(legacy.subtract(LegacyMoney(other)),
+                               money.subtract(dm.Money(other)))
+
+    # 幣種代碼字串轉成 Currency，未知的幣種拒絕
+    for make in (lambda c: dm.Money(Decimal('1'), c), lambda c: dm.Money.from_minor_units(100, c)):
+        assert make("USD").currency is Currency.USD
+        for bad in ("XYZ", None):
+            try:
+                make(bad)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"接受了不支援的幣種: {bad!r}")
+
+
+def bench_money(number: int) -> str:
+    rows = []
+    for name, cls in (("before", LegacyMoney), ("after", dm.Money)):
+        price, fee = cls(Decimal('359.99')), cls(Decimal('12.50'))
+        cases = {
+            "construct": lambda: cls(Decimal('359.99')),
+            "add": lambda: price.add(fee),
+            "subtract": lambda: price.subtract(fee),
+            "multiply": lambda: price.multiply(Decimal('0.15')),
+            "multiply int": lambda: price.multiply(3),
+            "str": lambda: str(price),
+        }
+        rows.append({case: best_ns(fn, number) for case, fn in cases.items()})
+
+    before, after = rows
+    return format_rows([(case, before[case], after[case]) for case in before])
+
+
+# ============================================================================
+# Order.total_amount
+# ============================================================================
+
+ADDRESS = dm.Address(
+    country="台灣", province="台北市", city="信義區", district="", street="信義路五段7號",
+    postal_code="110", recipient_name="張三", recipient_phone="0912-345-678",
+)
+
+
+def make_item(rng: random.Random) -> "dm.OrderItem":
+    return dm.OrderItem(
+        item_id=uuid4(),
+        product_id=f"PROD-{rng.randrange(10**6):06d}",
+        product_name="B2B 零件",
+        quantity=rng.randrange(1, 500),
+        unit_price=dm.Money.from_minor_units(rng.randrange(1, 10**6)),
+    )
+
+
+def legacy_total(order: "dm.Order") -> "dm.Money":
+    """優化前的 Order.total_amount：每次讀取都從頭加總，每個小計與每次相加都建立 Money"""
+    total = order.items[0].unit_price.multiply(Decimal('0'))
+    for item in order.items:
+        total = total.add(item.subtotal)
+    return total
+
+
+def check_total(steps: int = 3000) -> None:
+    """隨機加入、移除與修改數量，每一步都與從頭加總的結果比對；直接修改必須被拒絕"""
+    rng = random.Random(7)
+    order = dm.Order.create("CUST-1", [make_item(rng) for _ in range(50)], ADDRESS)
+    removed = []
+    for _ in range(steps):
+        action = rng.randrange(4)
+        if action == 0:
+            order.add_item(make_item(rng))
+        elif action == 1 and len(order.items) > 1:
+            removed.append(order.remove_item(rng.choice(order.items).item_id))
+        elif action == 2:
+            rng.choice(order.items).update_quantity(rng.randrange(1, 500))
+        elif action == 3 and removed:
+            rng.choice(removed).update_quantity(rng.randrange(1, 500))  # 已移除，不影響總金額
+        assert order.total_amount == legacy_total(order)
+
+    # 直接修改訂單項或列表不會記錄事件，必須被拒絕，且不能改變訂單
+    events = len(order.get_domain_events())
+    item = order.items[0]
+    for edit in (lambda: setattr(item, 'quantity', 7),
+                 lambda: setattr(item, 'unit_price', dm.Money(Decimal('1'))),
+                 lambda: order.items.append(make_item(rng)),
+                 lambda: order.items.__delitem__(0),
+                 lambda: order.items.sort(key=lambda line: line.quantity),
+                 lambda: setattr(order, 'items', [make_item(rng)])):
+        expected = list(order.items), item.quantity, order.total_amount
+        try:
+            edit()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("直接修改訂單沒有被拒絕")
+        assert (list(order.items), item.quantity, order.total_amount) == expected
+    assert len(order.get_domain_events()) == events
+
+    # 只有待支付訂單可以修改數量
+    paid = dm.Order.create("CUST-1", [make_item(rng)], ADDRESS)
+    paid.pay("PAY-1")
+    line = paid.items[0]
+    quantity, events = line.quantity, len(paid.get_domain_events())
+    try:
+        line.update_quantity(quantity + 1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("已支付訂單的數量被修改")
+    assert line.quantity == quantity and len(paid.get_domain_events()) == events
+
+    # 訂單項只能屬於一個訂單；建立失敗時訂單項不會被占用
+    shared = order.items[0]
+    for items in ([shared], [make_item(rng), shared]):
+        try:
+            dm.Order.create("CUST-2", items, ADDRESS)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("同一個訂單項被加入兩個訂單")
+    usd = make_item(rng)
+    usd.unit_price = dm.Money(Decimal('1'), Currency.USD)
+    fresh = make_item(rng)
+    try:
+        dm.Order.create("CUST-2", [fresh, usd], ADDRESS)  # 幣種不同，建立失敗
+    except ValueError:
+        pass
+    assert dm.Order.create("CUST-2", [fresh], ADDRESS).total_amount == fresh.subtotal
+    assert order.total_amount == legacy_total(order)
+
+
+def bench_total(number: int, lines: int = 5000) -> str:
+    rng = random.Random(1)
+    order = dm.Order.create("CUST-1", [make_item(rng) for _ in range(lines)], ADDRESS)
+    item = order.items[lines // 2]
+
+    def update_legacy():
+        item.update_quantity(rng.randrange(1, 500))
+        return legacy_total(order)
+
+    def update():
+        item.update_quantity(rng.randrange(1, 500))
+        return order.total_amount
+
+    # 從頭加總很慢，依訂單行數減少執行次數
+    slow = max(1, number * 10 // lines // 100)
+    return format_rows([
+        (f"read ({lines})", best_ns(lambda: legacy_total(order), slow),
+         best_ns(lambda: order.total_amount, number)),
+        ("update + read", best_ns(update_legacy, slow), best_ns(update, number)),
+    ])
+
+
+# ============================================================================
+# 批次定價
+# ============================================================================
+
+PROMOTION_RATES = [Decimal('0'), Decimal('0.05'), Decimal('0.1'), Decimal('0.15'),
+                   Decimal('0.125'), Decimal('0.333'), Decimal('1')]
+
+
+def make_columns(rng: random.Random, lines: int, max_price: int = 10**6):
+    """隨機的欄位資料：每筆訂單 0~20 行（平均約 10 行）"""
+    quantities = [rng.randrange(1, 50) for _ in range(lines)]
+    unit_prices = [rng.randrange(1, max_price) for _ in range(lines)]
+    order_offsets = [0]
+    while order_offsets[-1] < lines:
+        order_offsets.append(min(lines, order_offsets[-1] + rng.randrange(0, 21)))
+    rates = [rng.choice(PROMOTION_RATES) for _ in range(len(order_offsets) - 1)]
+    return quantities, unit_prices, order_offsets, rates
+
+
+def to_orders(quantities, unit_prices, order_offsets) -> List[List["dm.OrderItem"]]:
+    """把欄位資料轉回每筆訂單的訂單項，給逐筆計算的 calculate_total 使用"""
+    items = [
+        dm.OrderItem(UUID(int=j), "PROD", "零件", quantity, dm.Money.from_minor_units(price))
+        for j, (quantity, price) in enumerate(zip(quantities, unit_prices))
+    ]
+    return [items[start:end] for start, end in zip(order_offsets, order_offsets[1:])]
+
+
+def check_batch(lines: int = 20000) -> None:
+    """逐筆的 calculate_total 與批次的兩種實作（NumPy、純 Python）結果必須完全相同"""
+    rng = random.Random(3)
+    pricing = dm.OrderPricingService
+    for max_price in (10**6, 10**17):  # 第二組超出 int64 的安全範圍，NumPy 版會改用 Python 整數
+        quantities, unit_prices, order_offsets, rates = make_columns(rng, lines, max_price)
+        orders = to_orders(quantities, unit_prices, order_offsets)
+        expected = [pricing.calculate_total(items, rate) for items, rate in zip(orders, rates)]
+
+        assert pricing.calculate_totals(orders, rates) == expected
+        ratios = dm._discount_ratios(rates, len(orders))
+        columns = (quantities, unit_prices, order_offsets, *ratios)
+        assert dm._batch_totals_python(*columns) == [m.minor_units for m in expected]
+        if dm.np is not None:
+            totals = dm._batch_totals_numpy(*columns)
+            if max_price > 10**6:
+                assert totals is None
+            else:
+                assert totals.tolist() == [m.minor_units for m in expected]
+
+    # 負的數量或單價：兩種實作都拒絕（逐筆版的 Money 無法表示負數）
+    backends = [dm._batch_totals_python]
+    if dm.np is not None:
+        backends.append(dm._batch_totals_numpy)  # 超出 int64 時回傳 None，改由純 Python 檢查
+    for quantities, unit_prices in (([1], [-100]), ([-1], [100]), ([1, 2], [3, -(2**70)])):
+        offsets = [0, len(quantities)]
+        calls = [(backend, (quantities, unit_prices, offsets, [0], [1])) for backend in backends]
+        calls.append((pricing.calculate_totals_minor, (quantities, unit_prices, offsets)))
+        for backend, args in calls:
+            try:
+                result = backend(*args)
+            except ValueError:
+                continue
+            if result is not None:
+                raise AssertionError(f"接受了負的金額: {backend.__name__}{args[:2]}")
+
+
+def bench_batch(number: int, lines: int = 1_000_000, scalar_lines: int = 100_000) -> str:
+    """每個訂單行的耗時：逐筆 calculate_total（只量前 scalar_lines 行）對批次定價"""
+    rng = random.Random(5)
+    quantities, unit_prices, order_offsets, rates = make_columns(rng, lines)
+
+    cut = next(i for i, offset in enumerate(order_offsets) if offset >= scalar_lines)
+    orders = to_orders(quantities, unit_prices, order_offsets[:cut + 1])
+    scalar = best_ns(
+        lambda: [dm.OrderPricingService.calculate_total(items, rate)
+                 for items, rate in zip(orders, rates)],
+        number=1, repeat=3,
+    ) / order_offsets[cut]
+
+    ratios = dm._discount_ratios(rates, len(rates))
+    rows = [(f"python ({lines // 1000}k)",
+             scalar, best_ns(lambda: dm._batch_totals_python(
+                 quantities, unit_prices, order_offsets, *ratios), 1, 3) / lines)]
+    if dm.np is not None:
+        columns = [dm.np.array(values, dtype=dm.np.int64)
+                   for values in (quantities, unit_prices, order_offsets)]
+        rows.append((f"numpy ({lines // 1000}k)",
+                     scalar, best_ns(lambda: dm.OrderPricingService.calculate_totals_minor(
+                         *columns, rates), 1, 3) / lines))
+    return "每個訂單行（ns）\n" + format_rows(rows)
+
+
+# ============================================================================
+# 事件儲存
+# ============================================================================
+
+def _random_command(rng: random.Random, order: "dm.Order") -> None:
+    """對訂單執行一個符合目前狀態的隨機命令"""
+    Status = dm.OrderStatus
+    if order.status == Status.PENDING:
+        roll = rng.random()
+        if roll < 0.3:
+            order.add_item(make_item(rng))
+        elif roll < 0.5 and len(order.items) > 1:
+            order.remove_item(rng.choice(order.items).item_id)
+        elif roll < 0.9:
+            rng.choice(order.items).update_quantity(rng.randrange(1, 500))
+        elif roll < 0.97:
+            order.pay(f"PAY-{rng.randrange(10**6)}")
+        else:
+            order.cancel("客戶取消", "CUST")
+    elif order.status == Status.PAID:
+        order.ship(f"SF{rng.randrange(10**10)}", "順豐速運")
+    elif order.status == Status.SHIPPED:
+        order.mark_as_delivered()
+    elif order.status == Status.DELIVERED:
+        order.complete()
+
+
+def check_store(steps: int = 3000) -> None:
+    """隨機命令並不定期保存，重建的訂單必須與記憶體中的訂單完全相同（有無快照皆然）"""
+    rng = random.Random(11)
+    for interval in (7, 10**9):  # 頻繁寫快照／從不寫快照（完整重播）
+        repository = dm.EventSourcedOrderRepository(dm.SQLiteEventStore(), interval)
+        orders = []
+        for _ in range(steps):
+            if len(orders) < 5:
+                orders.append(dm.Order.create("CUST-1", [make_item(rng)], ADDRESS))
+            order = rng.choice(orders)
+            _random_command(rng, order)
+            if rng.random() < 0.3 or order.is_final_state():
+                repository.save(order)
+                restored = repository.get(str(order.order_id))
+                assert dm._snapshot_state(restored) == dm._snapshot_state(order)
+                assert restored._version == order._version
+                if order.is_final_state():
+                    orders.remove(order)
+
+    # 兩個寫入者從同一個版本開始修改，後保存的一方必須失敗
+    first = repository.get(str(order.order_id))
+    second = repository.get(str(order.order_id))
+    for copy in (first, second):
+        copy._add_domain_event(dm.OrderCompleted(order_id=str(order.order_id)))
+    repository.save(first)
+    try:
+        repository.save(second)
+    except dm.ConcurrencyConflictError:
+        pass
+    else:
+        raise AssertionError("並行保存沒有被擋下")
+
+
+def bench_store(number: int, events: int = 5000) -> str:
+    """長期存在的訂單（大量數量變更事件）：完整重播對從最新快照載入"""
+    rng = random.Random(13)
+    repositories = [dm.EventSourcedOrderRepository(dm.SQLiteEventStore(), interval)
+                    for interval in (10**9, 100)]
+    order = dm.Order.create("CUST-1", [make_item(rng) for _ in range(20)], ADDRESS)
+    for _ in range(events - 1):
+        rng.choice(order.items).update_quantity(rng.randrange(1, 500))
+    history = order.get_domain_events()
+
+    for repository in repositories:
+        order._domain_events[:] = history
+        order._version = 0
+        repository.save(order)
+    full, snapshot = repositories
+    order_id = str(order.order_id)
+
+    append_store = dm.SQLiteEventStore()
+    append_ns = best_ns(lambda: append_store.append(order_id, 0, history), 1, 1) / events
+    return format_rows([
+        (f"load ({events})", best_ns(lambda: full.get(order_id), max(1, number // 10**4)),
+         best_ns(lambda: snapshot.get(order_id), max(1, number // 100))),
+    ]) + f"\nappend: {append_ns:.0f} ns/event（{events} 個事件一個交易）"
+
+
+# ============================================================================
+# 事件匯流排
+# ============================================================================
+
+def make_history(rng: random.Random, orders: int, steps: int,
+                 save: Optional[Callable[["dm.Order"], list]] = None) -> List["dm.DomainEvent"]:
+    """多張訂單交錯執行隨機命令，回傳依提交順序排列的事件（save 預設只取出事件）"""
+    def take(order):
+        events = order.get_domain_events()
+        order.clear_domain_events()
+        return events
+
+    save = save or take
+    active = [dm.Order.create("CUST-1", [make_item(rng)], ADDRESS) for _ in range(orders)]
+    history = []
+    for _ in range(steps):
+        order = rng.choice(active)
+        if not order.is_final_state():
+            _random_command(rng, order)
+        history.extend(save(order))
+    for order in active:
+        history.extend(save(order))
+    return history
+
+
+def _by_order(events) -> Dict[str, List[UUID]]:
+    sequences: Dict[str, List[UUID]] = {}
+    for event in events:
+        sequences.setdefault(event.order_id, []).append(event.event_id)
+    return sequences
+
+
+def _quietly(coroutine):
+    """執行 coroutine，不輸出預期中的處理器失敗日誌"""
+    logging.disable(logging.ERROR)
+    try:
+        return asyncio.run(coroutine)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def check_bus(steps: int = 3000) -> None:
+    """每個處理器都收到每個事件一次、同一張訂單依序（佇列很小時也一樣）；outbox 失敗會重送"""
+    history = make_history(random.Random(17), 20, steps)
+
+    async def fan_out():
+        seen: Dict[str, list] = {"async": [], "sync": [], "batch": []}
+
+        async def on_async(event):
+            await asyncio.sleep(0)
+            seen["async"].append(event)
+
+        def reject_payment(event):
+            raise RuntimeError("payment webhook down")
+
+        async with dm.DomainEventBus(workers=4, queue_size=8, batch_size=16) as bus:
+            bus.subscribe(dm.DomainEvent, on_async)
+            bus.subscribe(dm.DomainEvent, seen["sync"].append)
+            bus.subscribe(dm.DomainEvent, seen["batch"].extend, batch=True)
+            bus.subscribe(dm.OrderPaid, reject_payment)
+            errors = await bus.deliver(history)
+        await bus.stop()  # 已停止時再呼叫不做任何事
+        return seen, errors, bus.metrics()
+
+    seen, errors, metrics = _quietly(fan_out())
+    for events in seen.values():
+        assert _by_order(events) == _by_order(history)
+    paid = [isinstance(event, dm.OrderPaid) for event in history]
+    assert [error is not None for error in errors] == paid
+    assert metrics["processed"] == metrics["published"] == len(history)
+    assert metrics["handler_errors"] == sum(paid)
+    assert metrics["queue_depth"] == 0
+
+    asyncio.run(dm.DomainEventBus().stop())  # 尚未啟動
+
+    # 處理器發布到自己的分區：佇列已滿也不能死結（死結時 stop 逾時）
+    async def publish_from_handler():
+        completed = []
+        bus = dm.DomainEventBus(workers=1, queue_size=1)
+
+        async def follow_up(event):
+            await bus.publish([dm.OrderCompleted(order_id=event.order_id)] * 5)
+
+        bus.subscribe(dm.OrderCreated, follow_up)
+        bus.subscribe(dm.OrderCompleted, completed.append)
+        await bus.start()
+        await bus.publish(event for event in history if isinstance(event, dm.OrderCreated))
+        await bus.stop()
+        return completed
+
+    completed = asyncio.run(asyncio.wait_for(publish_from_handler(), timeout=10))
+    assert len(completed) == 5 * sum(isinstance(event, dm.OrderCreated) for event in history)
+
+    # outbox：第一次失敗的事件下一輪重送；一直失敗的事件重試 max_attempts 次後留在 outbox
+    store = dm.SQLiteEventStore(outbox=True)
+    committed = make_history(random.Random(19), 20, steps,
+                             dm.EventSourcedOrderRepository(store).save)
+
+    async def relay():
+        received, failed_once = [], set()
+
+        def flaky(event):
+            received.append(event)
+            if isinstance(event, dm.OrderPaid) and event.event_id not in failed_once:
+                failed_once.add(event.event_id)
+                raise RuntimeError("temporary failure")
+
+        def poison(event):
+            if isinstance(event, dm.OrderCancelled):
+                raise RuntimeError("poison message")
+
+        async with dm.DomainEventBus(workers=4, batch_size=64) as bus:
+            bus.subscribe(dm.DomainEvent, flaky)
+            bus.subscribe(dm.DomainEvent, poison)
+            outbox = dm.OutboxRelay(store, bus, batch_size=500, max_attempts=3)
+            while await outbox.relay_once():
+                pass
+        return received
+
+    # 每張訂單依寫入順序收到事件：失敗的事件重送成功之前，不會收到同一張訂單後面的事件
+    # （OrderPaid 失敗一次後成功，OrderCancelled 投遞 max_attempts 次後留在 outbox）
+    attempts = {dm.OrderPaid: 2, dm.OrderCancelled: 3}
+    expected = [attempt for event in committed
+                for attempt in [event] * attempts.get(type(event), 1)]
+    assert _by_order(_quietly(relay())) == _by_order(expected)
+    assert not store.pending_outbox(10**6, max_attempts=3)
+    stuck = [event for _, event in store.pending_outbox(10**6, max_attempts=10**6)]
+    assert stuck == [event for event in committed if isinstance(event, dm.OrderCancelled)]
+
+    # 失敗 max_attempts 次而留在 outbox 的事件之後，同一張訂單的事件不再投遞
+    store = dm.SQLiteEventStore(outbox=True)
+    repository = dm.EventSourcedOrderRepository(store)
+    parked, other = (dm.Order.create("CUST-1", [make_item(rng)], ADDRESS)
+                     for rng in (random.Random(29), random.Random(31)))
+    parked.pay("PAY-1")
+    parked.ship("SF1", "順豐速運")
+    committed = repository.save(parked) + repository.save(other)
+
+    async def relay_parked():
+        received = []
+
+        def reject_payment(event):
+            received.append(type(event).__name__)
+            if isinstance(event, dm.OrderPaid):
+                raise RuntimeError("payment webhook down")
+
+        async with dm.DomainEventBus() as bus:
+            bus.subscribe(dm.DomainEvent, reject_payment)
+            outbox = dm.OutboxRelay(store, bus, max_attempts=2)
+            for _ in range(4):
+                await outbox.relay_once()
+        return received
+
+    received = _quietly(relay_parked())
+    assert received.count("OrderCreated") == 2
+    assert [name for name in received if name != "OrderCreated"] == ["OrderPaid", "OrderPaid"]
+    assert not store.pending_outbox(max_attempts=2)
+    assert [event for _, event in store.pending_outbox(max_attempts=10**6)] == committed[1:3]
+
+
+def bench_bus(number: int, events: int = 20000) -> str:
+    """發布到處理完畢的每個事件耗時：逐一投遞（batch_size=1）對批次投遞"""
+    history = make_history(random.Random(23), events // 10, events)[:events]
+
+    async def on_async(event):
+        pass
+
+    def on_sync(event):
+        pass
+
+    def on_batch(events):
+        pass
+
+    async def run(handler, batch: bool, batch_size: int):
+        async with dm.DomainEventBus(workers=4, batch_size=batch_size) as bus:
+            bus.subscribe(dm.DomainEvent, handler, batch=batch)
+            await bus.publish(history)
+        return bus.metrics()
+
+    def per_event(handler, batch: bool, batch_size: int) -> float:
+        return best_ns(lambda: asyncio.run(run(handler, batch, batch_size)), 1, 3) / len(history)
+
+    rows = [(name, per_event(handler, batch, 1), per_event(handler, batch, 100))
+            for name, handler, batch in (("async handler", on_async, False),
+                                         ("sync handler", on_sync, False),
+                                         ("batch handler", on_batch, True))]
+    metrics = asyncio.run(run(on_sync, False, 100))
+    latency = metrics["handlers"]["bench_bus.<locals>.on_sync"]
+    return (f"每個事件（ns，{len(history)} 個事件、4 個 worker）\n" + format_rows(rows)
+            + f"\nsync handler: {metrics['throughput_per_sec']:.0f} events/s，"
+            f"平均批次 {metrics['avg_batch_size']:.1f}，"
+            f"延遲 p50 {latency['p50_ms'] * 1000:.1f} µs／p99 {latency['p99_ms'] * 1000:.1f} µs")
+
+
+# ============================================================================
+# 執行
+# ============================================================================
+
+# 名稱 -> (一致性檢查, 量測)
+BENCHMARKS: Dict[str, Tuple[Callable[[], None], Callable[[int], str]]] = {
+    "money": (check_money, bench_money),
+    "total": (check_total, bench_total),
+    "batch": (check_batch, bench_batch),
+    "store": (check_store, bench_store),
+    "bus": (check_bus, bench_bus),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="訂單系統領域模型微基準")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"要執行的項目（預設全部）：{', '.join(BENCHMARKS)}")
+    parser.add_argument("--number", type=int, default=100000, help="每輪執行次數")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"未知的項目: {', '.join(sorted(unknown))}")
+
+    for name in args.names or BENCHMARKS:
+        check, bench = BENCHMARKS[name]
+        check()
+        print(f"== {name}（結果一致）\n{bench(args.number)}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,36 +9,82 @@
 - Aggregate Root (聚合根): Order
 - Domain Events (領域事件): OrderCreated, OrderPaid, etc.
 - Business Rules (業務規則): 狀態機、不變式
+- Repository (倉儲): 事件溯源，SQLite 事件儲存與快照
+- Event Bus (事件匯流排): 提交後非同步投遞，outbox 保證至少投遞一次
 
-技術棧: Python 3.11+, dataclasses, typing
+技術棧: Python 3.11+, dataclasses, typing（批次定價可選用 NumPy）
 """
 
-from dataclasses import dataclass, field
+import asyncio
+import inspect
+import json
+import logging
+import operator
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import FrozenInstanceError, dataclass, field, fields, is_dataclass
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from typing import List, Optional
+from functools import lru_cache, wraps
+from itertools import accumulate
+from time import perf_counter
+from typing import (Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union, get_args,
+                    get_origin, get_type_hints)
 from uuid import uuid4, UUID
 
+try:
+    import numpy as np
+except ImportError:  # 選用相依：沒有 NumPy 時批次定價改用純 Python 整數運算
+    np = None
+
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # Domain Events (領域事件)
 # ============================================================================
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, kw_only=True)
 class DomainEvent:
-    """Base class for all domain events"""
+    """Base class for all domain events（共用欄位只能以關鍵字傳入，子類別才能定義必填欄位）"""
     event_id: UUID = field(default_factory=uuid4)
     occurred_at: datetime = field(default_factory=datetime.now)
 
 
 @dataclass(frozen=True)
 class OrderCreated(DomainEvent):
-    """訂單已創建事件"""
+    """訂單已創建事件（含重建訂單所需的訂單項與地址）"""
     order_id: str
     customer_id: str
     total_amount: Decimal
     items_count: int
+    shipping_address: Optional['Address'] = None
+    lines: Tuple['OrderLine', ...] = ()
+
+
+@dataclass(frozen=True)
+class OrderItemAdded(DomainEvent):
+    """訂單項已加入事件"""
+    order_id: str
+    line: 'OrderLine'
+
+
+@dataclass(frozen=True)
+class OrderItemRemoved(DomainEvent):
+    """訂單項已移除事件"""
+    order_id: str
+    item_id: UUID
+
+
+@dataclass(frozen=True)
+class OrderItemQuantityChanged(DomainEvent):
+    """訂單項數量已變更事件"""
+    order_id: str
+    item_id: UUID
+    quantity: int
 
 
 @dataclass(frozen=True)
@@ -65,6 +111,12 @@ class OrderShipped(DomainEvent):
     carrier: str
 
 
+@dataclass(frozen=True)
+class OrderDelivered(DomainEvent):
+    """訂單已送達事件"""
+    order_id: str
+
+
 @dataclass(frozen=True)
 class OrderCompleted(DomainEvent):
     """訂單已完成事件"""
@@ -93,54 +145,154 @@ class Currency(str, Enum):
     CNY = "CNY"
     EUR = "EUR"
 
+    # 與 str 的相等性一致，且比 Enum 預設的 Python 層 __hash__ 快（金額運算會頻繁查表）
+    __hash__ = str.__hash__
+
 
 # ============================================================================
 # Value Objects (值對象)
 # ============================================================================
 
-@dataclass(frozen=True)
+# 各幣種最小單位的小數位數（ISO 4217）
+MINOR_UNIT_DIGITS: Dict[Currency, int] = {
+    Currency.USD: 2,
+    Currency.TWD: 2,
+    Currency.CNY: 2,
+    Currency.EUR: 2,
+}
+_SCALE = {currency: 10 ** digits for currency, digits in MINOR_UNIT_DIGITS.items()}
+_DISPLAY_FORMAT = {
+    currency: f"{currency.value} %d.%0{digits}d" for currency, digits in MINOR_UNIT_DIGITS.items()
+}
+
+
+def _check_currency(currency: Currency) -> Currency:
+    """只接受有最小單位定義的幣種；幣種代碼字串（例如 "USD"）轉成 Currency"""
+    if currency not in MINOR_UNIT_DIGITS:
+        raise ValueError(f"不支援的幣種: {currency}")
+    return currency if currency.__class__ is Currency else Currency(currency)
+
+
+def _round_half_even(numerator: int, denominator: int) -> int:
+    """整數除法並以 ROUND_HALF_EVEN 捨入（與預設 decimal context 的 quantize 相同）"""
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+
 class Money:
     """
     金額值對象
 
     不變性原則：
-    - 值對象是不可變的（使用 frozen=True）
+    - 值對象是不可變的（__slots__ + 禁止賦值）
     - 所有操作返回新對象，而非修改當前對象
     - 兩個屬性完全相同的 Money 是可互換的
+
+    內部以最小單位（例如「分」）的整數保存：加減乘都是整數運算，
+    運算結果經由 _of() 建立，不再重複驗證與量化；amount 在讀取時才轉回 Decimal。
+    捨入與原本的 Decimal.quantize(Decimal('0.01')) 相同，都是 ROUND_HALF_EVEN。
     """
-    amount: Decimal
-    currency: Currency = Currency.TWD
+    __slots__ = ('minor_units', 'currency')
 
-    def __post_init__(self):
+    minor_units: int
+    currency: Currency
+
+    def __init__(self, amount: Decimal, currency: Currency = Currency.TWD):
         """驗證業務規則"""
-        if self.amount < 0:
+        if not isinstance(amount, Decimal):
+            raise TypeError("金額必須是 Decimal")
+        if amount < 0:
+            raise ValueError("金額不能為負數")
+        currency = _check_currency(currency)
+
+        # Exact ratio, rounded to the currency's minor unit
+        numerator, denominator = amount.as_integer_ratio()
+        _set_minor_units(self, _round_half_even(numerator * _SCALE[currency], denominator))
+        _set_currency(self, currency)
+
+    @classmethod
+    def from_minor_units(cls, minor_units: int, currency: Currency = Currency.TWD) -> 'Money':
+        """以最小單位建立，例如 Money.from_minor_units(1999, Currency.USD) 是 USD 19.99"""
+        if not isinstance(minor_units, int):
+            raise TypeError("最小單位必須是整數")
+        if minor_units < 0:
             raise ValueError("金額不能為負數")
+        return cls._of(minor_units, _check_currency(currency))
 
-        # Ensure amount has at most 2 decimal places
-        quantized = self.amount.quantize(Decimal('0.01'))
-        object.__setattr__(self, 'amount', quantized)
+    @classmethod
+    def _of(cls, minor_units: int, currency: Currency) -> 'Money':
+        """受信任的建構：呼叫端保證是非負整數與已知幣種，不再驗證"""
+        money = _new_money(cls)
+        _set_minor_units(money, minor_units)
+        _set_currency(money, currency)
+        return money
+
+    @property
+    def amount(self) -> Decimal:
+        """金額（小數位數固定為該幣種的最小單位）"""
+        return Decimal(self.minor_units).scaleb(-MINOR_UNIT_DIGITS[self.currency])
 
     def add(self, other: 'Money') -> 'Money':
         """加法運算 - 返回新對象"""
         if self.currency != other.currency:
             raise ValueError(f"不同幣種無法相加: {self.currency} vs {other.currency}")
-        return Money(self.amount + other.amount, self.currency)
+        return Money._of(self.minor_units + other.minor_units, self.currency)
 
     def subtract(self, other: 'Money') -> 'Money':
         """減法運算 - 返回新對象"""
         if self.currency != other.currency:
             raise ValueError(f"不同幣種無法相減: {self.currency} vs {other.currency}")
-        result = self.amount - other.amount
+        result = self.minor_units - other.minor_units
         if result < 0:
             raise ValueError("結果金額不能為負數")
-        return Money(result, self.currency)
+        return Money._of(result, self.currency)
 
     def multiply(self, multiplier: Decimal) -> 'Money':
         """乘法運算 - 返回新對象"""
-        return Money(self.amount * multiplier, self.currency)
+        if type(multiplier) is int:
+            result = self.minor_units * multiplier
+        elif not isinstance(multiplier, Decimal):
+            raise TypeError("乘數必須是 Decimal 或整數")
+        else:
+            numerator, denominator = multiplier.as_integer_ratio()
+            result = self.minor_units * numerator
+            if result >= 0:
+                result = _round_half_even(result, denominator)
+        if result < 0:
+            raise ValueError("金額不能為負數")
+        return Money._of(result, self.currency)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.minor_units == other.minor_units and self.currency == other.currency
+
+    def __hash__(self) -> int:
+        return hash((self.minor_units, self.currency))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def __reduce__(self):
+        return (Money.from_minor_units, (self.minor_units, self.currency))
+
+    def __repr__(self) -> str:
+        return f"Money(amount={self.amount!r}, currency={self.currency!r})"
 
     def __str__(self) -> str:
-        return f"{self.currency.value} {self.amount:.2f}"
+        return _DISPLAY_FORMAT[self.currency] % divmod(self.minor_units, _SCALE[self.currency])
+
+
+# Slot setters bypass the frozen __setattr__ (used only while constructing)
+_new_money = object.__new__
+_set_minor_units = Money.minor_units.__set__
+_set_currency = Money.currency.__set__
 
 
 @dataclass(frozen=True)
@@ -220,23 +372,62 @@ class OrderItem:
     quantity: int
     unit_price: Money
 
+    # 所屬訂單（由 Order 設定）：數量變更交給訂單檢查狀態、更新總金額並記錄事件。
+    # 不宣告成 dataclass 欄位，asdict / repr 才不會沿著反向參照繞回訂單
+    _order = None
+
     def __post_init__(self):
         """驗證業務規則"""
         if self.quantity <= 0:
             raise ValueError("數量必須大於 0")
-        if self.unit_price.amount <= 0:
+        if self.unit_price.minor_units <= 0:
             raise ValueError("單價必須大於 0")
 
+    def __setattr__(self, name: str, value: object) -> None:
+        """已屬於訂單的訂單項不能直接修改數量或單價：不會產生事件，重建後的訂單會不同"""
+        if name in ('quantity', 'unit_price') and self.__dict__.get('_order') is not None:
+            raise ValueError("訂單項已屬於訂單，數量請透過 update_quantity 修改")
+        object.__setattr__(self, name, value)
+
     @property
     def subtotal(self) -> Money:
         """計算小計：數量 × 單價"""
-        return self.unit_price.multiply(Decimal(self.quantity))
+        return self.unit_price.multiply(self.quantity)
 
     def update_quantity(self, new_quantity: int) -> None:
-        """更新數量（實體可變）"""
+        """
+        更新數量（實體可變）
+
+        已屬於訂單時由訂單處理：只有待支付訂單可以修改，總金額隨之更新，
+        並記錄 OrderItemQuantityChanged
+        """
         if new_quantity <= 0:
             raise ValueError("數量必須大於 0")
-        self.quantity = new_quantity
+        if self._order is None:
+            self.quantity = new_quantity
+        else:
+            self._order._change_item_quantity(self, new_quantity)
+
+    def to_line(self) -> 'OrderLine':
+        """目前狀態的快照（供事件與快照保存）"""
+        return OrderLine(
+            item_id=self.item_id,
+            product_id=self.product_id,
+            product_name=self.product_name,
+            quantity=self.quantity,
+            unit_price=self.unit_price.minor_units,
+            currency=self.unit_price.currency,
+        )
+
+    @classmethod
+    def from_line(cls, line: 'OrderLine') -> 'OrderItem':
+        return cls(
+            item_id=line.item_id,
+            product_id=line.product_id,
+            product_name=line.product_name,
+            quantity=line.quantity,
+            unit_price=Money.from_minor_units(line.unit_price, line.currency),
+        )
 
     def __eq__(self, other: object) -> bool:
         """實體相等性：基於 ID"""
@@ -249,6 +440,55 @@ class OrderItem:
         return hash(self.item_id)
 
 
+@dataclass(frozen=True)
+class OrderLine:
+    """
+    訂單項快照（值對象）
+
+    事件必須不可變，所以事件內容記錄的是訂單項當時的值，而不是可變的 OrderItem 實體
+    """
+    item_id: UUID
+    product_id: str
+    product_name: str
+    quantity: int
+    unit_price: int  # 最小單位
+    currency: Currency
+
+
+def _owned_by_order(method):
+    """包裝 list 的修改方法：屬於訂單的列表不能直接修改"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._order is not None:
+            raise ValueError("訂單項請透過 Order.add_item / remove_item 修改")
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class OrderItemList(list):
+    """
+    訂單的訂單項列表
+
+    只能透過 Order.add_item / remove_item 修改（總金額增量更新，並記錄領域事件）；
+    直接修改列表（append、del、sort 等）會拋出 ValueError，
+    否則修改不會產生事件，由事件重建的訂單就會與原本的不同。
+    """
+    __slots__ = ('_order',)
+
+    def __init__(self, items=(), order: Optional['Order'] = None):
+        super().__init__(items)
+        self._order = order
+
+    def __reduce__(self):
+        return (OrderItemList, (list(self), self._order))
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__',
+              'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(OrderItemList, _name, _owned_by_order(getattr(list, _name)))
+del _name
+
+
 # ============================================================================
 # Aggregate Root (聚合根)
 # ============================================================================
@@ -280,6 +520,12 @@ class Order:
     # 領域事件列表
     _domain_events: List[DomainEvent] = field(default_factory=list, init=False, repr=False)
 
+    # 總金額快取（最小單位）；None 表示下次讀取時重算
+    _total_minor: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    # 已保存到事件儲存的事件數（樂觀鎖的預期版本）
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+
     # 可選字段
     payment_id: Optional[str] = None
     tracking_number: Optional[str] = None
@@ -289,15 +535,37 @@ class Order:
     completed_at: Optional[datetime] = None
 
     def __post_init__(self):
-        """驗證聚合不變式"""
-        self._validate_invariants()
+        """驗證聚合不變式；不成立時釋放訂單項，讓它們可以用來建立其他訂單"""
+        try:
+            self._validate_invariants()
+        except ValueError:
+            self._detach_items()
+            raise
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """
+        建構時把 items 換成 OrderItemList，並計算總金額；之後不能整個替換
+
+        訂單項只能屬於一個訂單（它只有一個反向參照，總金額快取依賴它），
+        已屬於其他訂單的訂單項會被拒絕
+        """
+        if name != 'items':
+            object.__setattr__(self, name, value)
+            return
+        if 'items' in self.__dict__:
+            raise ValueError("訂單項請透過 Order.add_item / remove_item 修改")
+        value = list(value)
+        if any(item._order is not None for item in value):
+            raise ValueError("訂單項已屬於某個訂單")
+        object.__setattr__(self, name, OrderItemList(value, self))
+        self._total()
 
     def _validate_invariants(self) -> None:
         """驗證業務不變式"""
         if not self.items:
             raise ValueError("訂單至少需要一個訂單項")
 
-        if self.total_amount.amount <= 0:
+        if self._total() <= 0:
             raise ValueError("訂單總金額必須大於 0")
 
         # Validate all items have same currency
@@ -329,18 +597,49 @@ class Order:
 
         # Publish domain event
         order._add_domain_event(OrderCreated(
+            occurred_at=now,
             order_id=str(order.order_id),
             customer_id=customer_id,
             total_amount=order.total_amount.amount,
-            items_count=len(items)
+            items_count=len(items),
+            shipping_address=shipping_address,
+            lines=tuple(item.to_line() for item in items)
         ))
 
         return order
 
+    @classmethod
+    def from_history(cls, events: Iterable[DomainEvent]) -> 'Order':
+        """
+        由事件重建訂單（事件溯源）
+
+        第一個事件必須是 OrderCreated；重播不會產生新的領域事件
+        """
+        events = iter(events)
+        order = cls._from_created(next(events))
+        for event in events:
+            order._apply(event)
+        return order
+
+    @classmethod
+    def _from_created(cls, event: OrderCreated) -> 'Order':
+        return cls(
+            order_id=OrderId(event.order_id),
+            customer_id=event.customer_id,
+            items=[OrderItem.from_line(line) for line in event.lines],
+            shipping_address=event.shipping_address,
+            status=OrderStatus.PENDING,
+            created_at=event.occurred_at,
+            updated_at=event.occurred_at
+        )
+
     @property
     def total_amount(self) -> Money:
         """
-        計算訂單總金額
+        訂單總金額
+
+        建構時計算一次並快取，之後由 add_item、remove_item 與訂單項的數量變動增量更新，
+        讀取是 O(1)。
 
         注意：這裡簡化了計算邏輯，實際應用中可能需要：
         - 應用折扣
@@ -350,12 +649,24 @@ class Order:
         """
         if not self.items:
             return Money(Decimal('0'), Currency.TWD)
-
-        total = self.items[0].unit_price.multiply(Decimal('0'))  # Start with zero
-        for item in self.items:
-            total = total.add(item.subtotal)
-
-        return total
+        return Money._of(self._total(), self.items[0].unit_price.currency)
+
+    def _total(self) -> int:
+        """總金額（最小單位）；快取失效時重算，並把每個訂單項關聯到本訂單"""
+        if self._total_minor is None:
+            total = 0
+            for item in self.items:
+                item._order = self
+                total += item.unit_price.minor_units * item.quantity
+            self._total_minor = total
+        return self._total_minor
+
+    def _detach_items(self) -> None:
+        """解除訂單項與本訂單的關聯（建構失敗時）"""
+        for item in self.__dict__.get('items', ()):
+            if item._order is self:
+                item._order = None
+        self._total_minor = None
 
     # ========================================================================
     # 命令方法（Command Methods）
@@ -377,14 +688,8 @@ class Order:
         if self.status != OrderStatus.PENDING:
             raise ValueError(f"只有待支付訂單可以支付，當前狀態: {self.status.value}")
 
-        # Update state
-        self.status = OrderStatus.PAID
-        self.payment_id = payment_id
-        self.paid_at = datetime.now()
-        self.updated_at = datetime.now()
-
-        # Publish event
-        self._add_domain_event(OrderPaid(
+        # Update state and publish event
+        self._record(OrderPaid(
             order_id=str(self.order_id),
             payment_id=payment_id,
             paid_amount=self.total_amount.amount
@@ -409,12 +714,8 @@ class Order:
         if self.status == OrderStatus.PAID and self.shipped_at is not None:
             raise ValueError("已發貨訂單無法取消，請申請退貨")
 
-        # Update state
-        self.status = OrderStatus.CANCELLED
-        self.updated_at = datetime.now()
-
-        # Publish event
-        self._add_domain_event(OrderCancelled(
+        # Update state and publish event
+        self._record(OrderCancelled(
             order_id=str(self.order_id),
             cancellation_reason=reason,
             cancelled_by=cancelled_by
@@ -436,20 +737,94 @@ class Order:
         if self.status != OrderStatus.PAID:
             raise ValueError(f"只有已支付訂單可以發貨，當前狀態: {self.status.value}")
 
-        # Update state
-        self.status = OrderStatus.SHIPPED
-        self.tracking_number = tracking_number
-        self.carrier = carrier
-        self.shipped_at = datetime.now()
-        self.updated_at = datetime.now()
-
-        # Publish event
-        self._add_domain_event(OrderShipped(
+        # Update state and publish event
+        self._record(OrderShipped(
             order_id=str(self.order_id),
             tracking_number=tracking_number,
             carrier=carrier
         ))
 
+    def add_item(self, item: OrderItem) -> None:
+        """
+        加入訂單項
+
+        前置條件：
+        - 訂單狀態必須是 PENDING
+        - 幣種與訂單內其他商品相同
+        """
+        self._ensure_items_modifiable()
+        if item.unit_price.currency != self.items[0].unit_price.currency:
+            raise ValueError("訂單內所有商品必須使用相同幣種")
+        if item._order is not None:
+            raise ValueError("訂單項已屬於某個訂單")
+
+        event = OrderItemAdded(order_id=str(self.order_id), line=item.to_line())
+        self._append_item(item, event.occurred_at)
+        self._add_domain_event(event)
+
+    def remove_item(self, item_id: UUID) -> OrderItem:
+        """
+        移除訂單項
+
+        前置條件：
+        - 訂單狀態必須是 PENDING
+        - 移除後訂單仍至少包含一個訂單項
+        """
+        self._ensure_items_modifiable()
+        index = self._index_of(item_id)
+        if len(self.items) == 1:
+            raise ValueError("訂單至少需要一個訂單項")
+
+        event = OrderItemRemoved(order_id=str(self.order_id), item_id=item_id)
+        item = self._remove_item_at(index, event.occurred_at)
+        self._add_domain_event(event)
+        return item
+
+    def _change_item_quantity(self, item: OrderItem, quantity: int) -> None:
+        """
+        OrderItem.update_quantity 的實作
+
+        前置條件：
+        - 訂單狀態必須是 PENDING
+        """
+        self._ensure_items_modifiable()
+        event = OrderItemQuantityChanged(
+            order_id=str(self.order_id), item_id=item.item_id, quantity=quantity)
+        self._set_item_quantity(item, quantity, event.occurred_at)
+        self._add_domain_event(event)
+
+    def _ensure_items_modifiable(self) -> None:
+        if self.status != OrderStatus.PENDING:
+            raise ValueError(f"只有待支付訂單可以修改訂單項，當前狀態: {self.status.value}")
+
+    def _index_of(self, item_id: UUID) -> int:
+        for index, item in enumerate(self.items):
+            if item.item_id == item_id:
+                return index
+        raise ValueError(f"訂單項不存在: {item_id}")
+
+    def _append_item(self, item: OrderItem, at: datetime) -> None:
+        total = self._total()
+        list.append(self.items, item)
+        item._order = self
+        self._total_minor = total + item.unit_price.minor_units * item.quantity
+        self.updated_at = at
+
+    def _set_item_quantity(self, item: OrderItem, quantity: int, at: datetime) -> None:
+        total = self._total()
+        self._total_minor = total + item.unit_price.minor_units * (quantity - item.quantity)
+        object.__setattr__(item, 'quantity', quantity)  # 略過 OrderItem.__setattr__ 的保護
+        self.updated_at = at
+
+    def _remove_item_at(self, index: int, at: datetime) -> OrderItem:
+        total = self._total()
+        item = self.items[index]
+        list.__delitem__(self.items, index)
+        item._order = None
+        self._total_minor = total - item.unit_price.minor_units * item.quantity
+        self.updated_at = at
+        return item
+
     def mark_as_delivered(self) -> None:
         """
         標記為已送達（通常由物流系統回調）
@@ -459,12 +834,14 @@ class Order:
 
         後置條件：
         - 訂單狀態變更為 DELIVERED
+        - 發布 OrderDelivered 事件
         """
         if self.status != OrderStatus.SHIPPED:
             raise ValueError(f"只有已發貨訂單可以標記送達，當前狀態: {self.status.value}")
 
-        self.status = OrderStatus.DELIVERED
-        self.updated_at = datetime.now()
+        self._record(OrderDelivered(
+            order_id=str(self.order_id)
+        ))
 
     def complete(self) -> None:
         """
@@ -480,15 +857,56 @@ class Order:
         if self.status != OrderStatus.DELIVERED:
             raise ValueError(f"只有已送達訂單可以完成，當前狀態: {self.status.value}")
 
-        self.status = OrderStatus.COMPLETED
-        self.completed_at = datetime.now()
-        self.updated_at = datetime.now()
-
-        # Publish event
-        self._add_domain_event(OrderCompleted(
+        # Update state and publish event
+        self._record(OrderCompleted(
             order_id=str(self.order_id)
         ))
 
+    # ========================================================================
+    # 事件套用（命令執行與事件重播共用同一段狀態變更）
+    # ========================================================================
+
+    def _record(self, event: DomainEvent) -> None:
+        """套用事件並加入待發布的領域事件"""
+        self._apply(event)
+        self._add_domain_event(event)
+
+    def _apply(self, event: DomainEvent) -> None:
+        _EVENT_APPLIERS[type(event)](self, event)
+
+    def _apply_item_added(self, event: OrderItemAdded) -> None:
+        self._append_item(OrderItem.from_line(event.line), event.occurred_at)
+
+    def _apply_item_removed(self, event: OrderItemRemoved) -> None:
+        self._remove_item_at(self._index_of(event.item_id), event.occurred_at)
+
+    def _apply_item_quantity_changed(self, event: OrderItemQuantityChanged) -> None:
+        item = self.items[self._index_of(event.item_id)]
+        self._set_item_quantity(item, event.quantity, event.occurred_at)
+
+    def _apply_paid(self, event: OrderPaid) -> None:
+        self.status = OrderStatus.PAID
+        self.payment_id = event.payment_id
+        self.paid_at = self.updated_at = event.occurred_at
+
+    def _apply_cancelled(self, event: OrderCancelled) -> None:
+        self.status = OrderStatus.CANCELLED
+        self.updated_at = event.occurred_at
+
+    def _apply_shipped(self, event: OrderShipped) -> None:
+        self.status = OrderStatus.SHIPPED
+        self.tracking_number = event.tracking_number
+        self.carrier = event.carrier
+        self.shipped_at = self.updated_at = event.occurred_at
+
+    def _apply_delivered(self, event: OrderDelivered) -> None:
+        self.status = OrderStatus.DELIVERED
+        self.updated_at = event.occurred_at
+
+    def _apply_completed(self, event: OrderCompleted) -> None:
+        self.status = OrderStatus.COMPLETED
+        self.completed_at = self.updated_at = event.occurred_at
+
     # ========================================================================
     # 查詢方法（Query Methods）
     # ========================================================================
@@ -523,6 +941,19 @@ class Order:
         self._domain_events.clear()
 
 
+# OrderCreated 由 Order._from_created 處理（重播的起點）
+_EVENT_APPLIERS = {
+    OrderItemAdded: Order._apply_item_added,
+    OrderItemRemoved: Order._apply_item_removed,
+    OrderItemQuantityChanged: Order._apply_item_quantity_changed,
+    OrderPaid: Order._apply_paid,
+    OrderCancelled: Order._apply_cancelled,
+    OrderShipped: Order._apply_shipped,
+    OrderDelivered: Order._apply_delivered,
+    OrderCompleted: Order._apply_completed,
+}
+
+
 # ============================================================================
 # Domain Services (領域服務)
 # ============================================================================
@@ -559,6 +990,98 @@ class OrderValidationService:
                 raise ValueError(f"商品 {item.product_name} 數量超過限制 (最多 999)")
 
 
+# int64 可精確表示的上限；可能超過時改用 Python 的任意精度整數
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _discount_ratios(discount_rates: Optional[Sequence[Decimal]],
+                     order_count: int) -> Tuple[List[int], List[int]]:
+    """每筆訂單折扣率的分子與分母；與 calculate_total 相同，折扣率 <= 0 視為不打折"""
+    if discount_rates is None:
+        return [0] * order_count, [1] * order_count
+    if len(discount_rates) != order_count:
+        raise ValueError("折扣率的數量必須與訂單數量相同")
+
+    ratios: Dict[Decimal, Tuple[int, int]] = {}  # 促銷通常只有少數幾種折扣率
+    numerators, denominators = [], []
+    for rate in discount_rates:
+        ratio = ratios.get(rate)
+        if ratio is None:
+            if not isinstance(rate, Decimal):
+                raise TypeError("折扣率必須是 Decimal")
+            ratio = ratios[rate] = rate.as_integer_ratio() if rate > 0 else (0, 1)
+        numerators.append(ratio[0])
+        denominators.append(ratio[1])
+    return numerators, denominators
+
+
+def _batch_totals_python(quantities: Sequence[int], unit_prices: Sequence[int],
+                         order_offsets: Sequence[int], numerators: List[int],
+                         denominators: List[int]) -> List[int]:
+    """純 Python 版：任意精度整數，index() 同時擋下浮點數"""
+    if min(quantities, default=0) < 0 or min(unit_prices, default=0) < 0:
+        raise ValueError("金額不能為負數")
+    prefix = [0, *accumulate(map(operator.mul, map(operator.index, quantities),
+                                 map(operator.index, unit_prices)))]
+    offsets = list(map(operator.index, order_offsets))
+    totals = []
+    for start, end, numerator, denominator in zip(offsets, offsets[1:],
+                                                  numerators, denominators):
+        total = prefix[end] - prefix[start]
+        if numerator:
+            discount = _round_half_even(total * numerator, denominator)
+            if discount > total:
+                raise ValueError("結果金額不能為負數")
+            total -= discount
+        totals.append(total)
+    return totals
+
+
+def _int64_column(values):
+    """轉成 int64 陣列；值可能超出 int64（例如 Python 大整數）時回傳 None"""
+    array = np.asarray(values)
+    if array.dtype.kind == 'O':
+        return None
+    if array.dtype.kind not in 'iu':
+        raise TypeError("數量、單價與 order_offsets 必須是整數")
+    if array.size and int(array.max()) > _INT64_MAX:
+        return None
+    return array.astype(np.int64, copy=False)
+
+
+def _batch_totals_numpy(quantities, unit_prices, order_offsets,
+                        numerators: List[int], denominators: List[int]):
+    """NumPy int64 版；中間結果可能溢位時回傳 None，由呼叫端改用純 Python"""
+    columns = [_int64_column(values) for values in (quantities, unit_prices, order_offsets)]
+    if any(column is None for column in columns):
+        return None
+    q, p, offsets = columns
+    if q.size and (q.min() < 0 or p.min() < 0):
+        raise ValueError("金額不能為負數")
+    if q.size and int(q.max()) * int(p.max()) * q.size > _INT64_MAX:
+        return None
+
+    prefix = np.zeros(q.size + 1, dtype=np.int64)
+    np.cumsum(q * p, out=prefix[1:])
+    totals = prefix[offsets[1:]] - prefix[offsets[:-1]]
+    if not any(numerators):
+        return totals
+
+    if max(numerators) * int(totals.max(initial=0)) > _INT64_MAX \
+            or 2 * max(denominators) > _INT64_MAX:
+        return None
+    num = np.array(numerators, dtype=np.int64)
+    den = np.array(denominators, dtype=np.int64)
+
+    # Vectorized _round_half_even(totals * num, den)
+    discounts, remainders = np.divmod(totals * num, den)
+    twice = 2 * remainders
+    discounts += (twice > den) | ((twice == den) & (discounts & 1 == 1))
+    if np.any(discounts > totals):
+        raise ValueError("結果金額不能為負數")
+    return totals - discounts
+
+
 class OrderPricingService:
     """
     訂單定價領域服務
@@ -595,6 +1118,643 @@ class OrderPricingService:
 
         return total
 
+    @staticmethod
+    def calculate_totals_minor(quantities: Sequence[int], unit_prices: Sequence[int],
+                               order_offsets: Sequence[int],
+                               discount_rates: Optional[Sequence[Decimal]] = None
+                               ) -> Sequence[int]:
+        """
+        批次計算多筆訂單的總金額（最小單位），用於夜間重新定價與促銷試算
+
+        以欄位陣列表示訂單行：quantities[j] 與 unit_prices[j]（最小單位）是第 j 行，
+        第 i 筆訂單的行是 order_offsets[i] 到 order_offsets[i + 1]（不含），
+        所以 order_offsets 從 0 開始、以總行數結束，長度是訂單數 + 1。
+        discount_rates 是每筆訂單的折扣率。
+
+        數量與單價不得為負數（Money 無法表示負的金額），否則拋出 ValueError。
+        結果與逐筆呼叫 calculate_total 完全相同（折扣同樣以 ROUND_HALF_EVEN 捨入）。
+        有 NumPy 時以 int64 陣列運算並回傳 int64 陣列；可能溢位或沒有 NumPy 時
+        改用 Python 整數並回傳 list。
+        """
+        if len(quantities) != len(unit_prices):
+            raise ValueError("數量與單價的長度必須相同")
+        if len(order_offsets) == 0 or order_offsets[0] != 0 \
+                or order_offsets[-1] != len(quantities):
+            raise ValueError("order_offsets 必須從 0 開始，並以訂單行數結束")
+        numerators, denominators = _discount_ratios(discount_rates, len(order_offsets) - 1)
+
+        if np is not None:
+            totals = _batch_totals_numpy(quantities, unit_prices, order_offsets,
+                                         numerators, denominators)
+            if totals is not None:
+                return totals
+        return _batch_totals_python(quantities, unit_prices, order_offsets,
+                                    numerators, denominators)
+
+    @staticmethod
+    def calculate_totals(orders: Sequence[List[OrderItem]],
+                         discount_rates: Optional[Sequence[Decimal]] = None) -> List[Money]:
+        """
+        批次版的 calculate_total：orders 是每筆訂單的訂單項，discount_rates 是每筆訂單的折扣率
+
+        訂單項先轉成欄位陣列，再交給 calculate_totals_minor。
+        """
+        quantities: List[int] = []
+        unit_prices: List[int] = []
+        order_offsets = [0]
+        currencies = []
+        for items in orders:
+            currency = items[0].unit_price.currency if items else Currency.TWD
+            for item in items:
+                if item.unit_price.currency != currency:
+                    raise ValueError(
+                        f"不同幣種無法相加: {currency} vs {item.unit_price.currency}")
+                quantities.append(item.quantity)
+                unit_prices.append(item.unit_price.minor_units)
+            order_offsets.append(len(quantities))
+            currencies.append(currency)
+
+        totals = OrderPricingService.calculate_totals_minor(
+            quantities, unit_prices, order_offsets, discount_rates)
+        return [Money._of(int(total), currency) for total, currency in zip(totals, currencies)]
+
+
+# ============================================================================
+# Repository (倉儲) - 事件溯源
+# ============================================================================
+
+class ConcurrencyConflictError(ValueError):
+    """樂觀鎖衝突：訂單在讀取之後已被其他寫入者保存過"""
+
+
+EVENT_TYPES: Dict[str, type] = {cls.__name__: cls for cls in (
+    OrderCreated, OrderItemAdded, OrderItemRemoved, OrderItemQuantityChanged,
+    OrderPaid, OrderShipped, OrderDelivered, OrderCancelled, OrderCompleted,
+)}
+
+
+@lru_cache(maxsize=None)
+def _type_hints(cls: type) -> Dict[str, object]:
+    return get_type_hints(cls)
+
+
+def _to_json(value):
+    """領域物件轉成 JSON 可表示的值（Decimal 轉成字串以保留精度）"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if is_dataclass(value):
+        return {f.name: _to_json(getattr(value, f.name)) for f in fields(value)}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(annotation, value):
+    """依型別註記把 _to_json 的結果轉回領域物件"""
+    if value is None:
+        return None
+    origin = get_origin(annotation)
+    if origin is Union:  # Optional[X]
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        return _from_json(annotation, value)
+    if origin in (tuple, list):
+        item_type = get_args(annotation)[0]
+        return origin(_from_json(item_type, item) for item in value)
+    if annotation in (Decimal, UUID):
+        return annotation(value)
+    if annotation is datetime:
+        return datetime.fromisoformat(value)
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return annotation(value)
+    if is_dataclass(annotation):
+        hints = _type_hints(annotation)
+        return annotation(**{name: _from_json(hints[name], item) for name, item in value.items()})
+    return value
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+# 快照保存的訂單欄位；訂單項另外以 OrderLine 保存
+_SNAPSHOT_FIELDS = tuple(f.name for f in fields(Order) if f.init and f.name != 'items')
+
+
+def _snapshot_state(order: Order) -> dict:
+    state = {name: _to_json(getattr(order, name)) for name in _SNAPSHOT_FIELDS}
+    state['lines'] = [_to_json(item.to_line()) for item in order.items]
+    return state
+
+
+def _order_from_snapshot(state: dict) -> Order:
+    hints = _type_hints(Order)
+    values = {name: _from_json(hints[name], state[name]) for name in _SNAPSHOT_FIELDS}
+    items = [OrderItem.from_line(_from_json(OrderLine, line)) for line in state['lines']]
+    return Order(items=items, **values)
+
+
+_EVENT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_events (
+    aggregate_id TEXT NOT NULL,
+    version      INTEGER NOT NULL,
+    event_type   TEXT NOT NULL,
+    event_id     TEXT NOT NULL UNIQUE,
+    occurred_at  TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    PRIMARY KEY (aggregate_id, version)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS order_snapshots (
+    aggregate_id TEXT NOT NULL,
+    version      INTEGER NOT NULL,
+    state        TEXT NOT NULL,
+    PRIMARY KEY (aggregate_id, version)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS order_outbox (
+    position     INTEGER PRIMARY KEY AUTOINCREMENT,
+    aggregate_id TEXT NOT NULL,
+    version      INTEGER NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS order_outbox_aggregate ON order_outbox (aggregate_id, attempts);
+
+CREATE TRIGGER IF NOT EXISTS order_events_no_update BEFORE UPDATE ON order_events
+BEGIN SELECT RAISE(ABORT, 'order_events is append-only'); END;
+
+CREATE TRIGGER IF NOT EXISTS order_events_no_delete BEFORE DELETE ON order_events
+BEGIN SELECT RAISE(ABORT, 'order_events is append-only'); END;
+"""
+
+# 最新快照與其後的事件：一次查詢，兩段都是主鍵 (aggregate_id, version) 上的範圍讀取
+_LOAD_AGGREGATE = """
+WITH snapshot AS (
+    SELECT version, state FROM order_snapshots
+    WHERE aggregate_id = :id ORDER BY version DESC LIMIT 1
+)
+SELECT version, NULL, state FROM snapshot
+UNION ALL
+SELECT version, event_type, payload FROM order_events
+WHERE aggregate_id = :id AND version > COALESCE((SELECT version FROM snapshot), 0)
+ORDER BY version
+"""
+
+_PENDING_OUTBOX = """
+SELECT o.position, e.event_type, e.payload
+FROM order_outbox AS o
+JOIN order_events AS e ON e.aggregate_id = o.aggregate_id AND e.version = o.version
+WHERE o.attempts < :max_attempts
+  AND NOT EXISTS (SELECT 1 FROM order_outbox AS parked
+                  WHERE parked.aggregate_id = o.aggregate_id
+                    AND parked.attempts >= :max_attempts)
+ORDER BY o.position
+LIMIT :limit
+"""
+
+
+def _decode_event(event_type: str, payload: str) -> DomainEvent:
+    return _from_json(EVENT_TYPES[event_type], json.loads(payload))
+
+
+class SQLiteEventStore:
+    """
+    Append-only 事件儲存（SQLite）
+
+    - order_events：每個訂單的事件依 version 從 1 連續編號；主鍵 (aggregate_id, version)
+      讓同一個版本只能寫入一次（樂觀鎖），觸發器禁止修改與刪除
+    - order_snapshots：定期保存的訂單狀態，載入時只需重播最新快照之後的事件
+    - order_outbox：outbox=True 時，每個事件在同一個交易內登記一筆待投遞紀錄（見 OutboxRelay）
+    """
+
+    def __init__(self, path: str = ":memory:", outbox: bool = False):
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_EVENT_STORE_SCHEMA)
+        self.outbox = outbox
+
+    def append(self, aggregate_id: str, expected_version: int,
+               events: Sequence[DomainEvent], snapshot: Optional[dict] = None) -> int:
+        """在 expected_version 之後附加事件（快照在同一個交易內寫入），回傳新的版本"""
+        rows = [
+            (aggregate_id, expected_version + offset, type(event).__name__,
+             str(event.event_id), event.occurred_at.isoformat(), _dumps(_to_json(event)))
+            for offset, event in enumerate(events, 1)
+        ]
+        version = expected_version + len(rows)
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO order_events VALUES (?, ?, ?, ?, ?, ?)", rows)
+                if self.outbox:
+                    self._db.executemany(
+                        "INSERT INTO order_outbox (aggregate_id, version) VALUES (?, ?)",
+                        [row[:2] for row in rows])
+                if snapshot is not None:
+                    self._db.execute("INSERT INTO order_snapshots VALUES (?, ?, ?)",
+                                     (aggregate_id, version, _dumps(snapshot)))
+        except sqlite3.IntegrityError as exc:
+            raise ConcurrencyConflictError(
+                f"訂單 {aggregate_id} 已被更新（預期版本 {expected_version}）") from exc
+        return version
+
+    def load(self, aggregate_id: str
+             ) -> Tuple[Optional[Tuple[int, dict]], List[Tuple[int, DomainEvent]]]:
+        """讀取最新快照（version, state），沒有則為 None；以及快照之後的 (version, 事件)"""
+        snapshot, events = None, []
+        for version, event_type, data in self._db.execute(_LOAD_AGGREGATE,
+                                                           {"id": aggregate_id}):
+            if event_type is None:
+                snapshot = (version, json.loads(data))
+            else:
+                events.append((version, _decode_event(event_type, data)))
+        return snapshot, events
+
+    def pending_outbox(self, limit: int = 100,
+                       max_attempts: int = 5) -> List[Tuple[int, DomainEvent]]:
+        """
+        尚未投遞的 (position, 事件)，依寫入順序
+
+        略過已失敗 max_attempts 次的紀錄，以及同一張訂單的其他紀錄（不能越過失敗的事件投遞）
+        """
+        rows = self._db.execute(_PENDING_OUTBOX, {"max_attempts": max_attempts, "limit": limit})
+        return [(position, _decode_event(event_type, data)) for position, event_type, data in rows]
+
+    def ack_outbox(self, positions: Sequence[int]) -> None:
+        """投遞成功：刪除 outbox 紀錄"""
+        with self._db:
+            self._db.executemany("DELETE FROM order_outbox WHERE position = ?",
+                                 [(position,) for position in positions])
+
+    def retry_outbox(self, positions: Sequence[int]) -> None:
+        """投遞失敗：累計失敗次數，留待下一輪重送"""
+        with self._db:
+            self._db.executemany(
+                "UPDATE order_outbox SET attempts = attempts + 1 WHERE position = ?",
+                [(position,) for position in positions])
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class EventSourcedOrderRepository:
+    """
+    訂單倉儲（事件溯源）
+
+    保存：把訂單尚未保存的領域事件附加到事件儲存，每 snapshot_interval 個事件寫一次快照
+    讀取：從最新快照開始，重播其後的事件重建訂單
+    """
+
+    def __init__(self, store: SQLiteEventStore, snapshot_interval: int = 100):
+        if snapshot_interval <= 0:
+            raise ValueError("snapshot_interval 必須大於 0")
+        self.store = store
+        self.snapshot_interval = snapshot_interval
+
+    def save(self, order: Order) -> List[DomainEvent]:
+        """保存並清除訂單的領域事件，回傳已提交的事件（供提交後發布）"""
+        events = order.get_domain_events()
+        if not events:
+            return []
+
+        snapshot = None
+        version = order._version + len(events)
+        if version // self.snapshot_interval > order._version // self.snapshot_interval:
+            snapshot = _snapshot_state(order)
+        order._version = self.store.append(str(order.order_id), order._version, events, snapshot)
+        order.clear_domain_events()
+        return events
+
+    def get(self, order_id: str) -> Order:
+        """重建訂單；不存在時拋出 ValueError"""
+        snapshot, history = self.store.load(order_id)
+        if snapshot is not None:
+            version, state = snapshot
+            order = _order_from_snapshot(state)
+        elif history:
+            version, created = history[0]
+            order = Order._from_created(created)
+            history = history[1:]
+        else:
+            raise ValueError(f"訂單不存在: {order_id}")
+
+        for version, event in history:
+            order._apply(event)
+        order._version = version
+        return order
+
+
+# ============================================================================
+# Domain Event Bus (領域事件匯流排)
+# ============================================================================
+
+@dataclass(frozen=True)
+class _Subscription:
+    event_type: type
+    handler: Callable
+    name: str
+    batch: bool
+    is_async: bool
+
+
+class _LatencyStats:
+    """處理器延遲：次數、平均與最大值涵蓋全部呼叫，百分位數取最近 1024 次"""
+    __slots__ = ('count', 'total', 'max', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=1024)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        recent = sorted(self.recent)
+
+        def percentile(p: float) -> float:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.max * 1000,
+        }
+
+
+# 每次呼叫處理器的 (耗時秒數, 例外)；batch 訂閱一批只呼叫一次
+_CallResults = List[Tuple[float, Optional[Exception]]]
+
+
+def _call_sync(handler: Callable, payloads: list) -> _CallResults:
+    """在執行緒池中依序呼叫同步處理器"""
+    results = []
+    for payload in payloads:
+        start = perf_counter()
+        try:
+            handler(payload)
+            error = None
+        except Exception as exc:
+            error = exc
+        results.append((perf_counter() - start, error))
+    return results
+
+
+async def _call_async(handler: Callable, payloads: list) -> _CallResults:
+    results = []
+    for payload in payloads:
+        start = perf_counter()
+        try:
+            await handler(payload)
+            error = None
+        except Exception as exc:
+            error = exc
+        results.append((perf_counter() - start, error))
+    return results
+
+
+# 正在執行處理器的事件匯流排（worker task 內設定）
+_dispatching_bus: ContextVar[Optional['DomainEventBus']] = ContextVar('_dispatching_bus',
+                                                                      default=None)
+
+
+class DomainEventBus:
+    """
+    行程內的非同步領域事件匯流排
+
+    - 在保存（提交）之後投遞事件：await bus.publish(repository.save(order))
+    - 處理器可以是 async 函式或一般函式；一般函式在有界的執行緒池中執行，不阻塞事件迴圈
+    - 依 order_id 分區：每個 worker 一個有界佇列，同一張訂單的事件由同一個 worker 依序處理
+    - 佇列已滿時 publish 會等待，把壓力傳回發布端（背壓）；
+      處理器內的 publish 不等待、直接放入佇列（可暫時超過 queue_size），
+      否則 worker 會等待自己處理的佇列而死結
+    - worker 一次取出佇列中最多 batch_size 個事件一起投遞；
+      以 batch=True 訂閱的處理器一批只呼叫一次，收到事件列表
+    - 處理器失敗會記錄並計數，不影響其他處理器；需要重送時搭配 OutboxRelay
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 1000, batch_size: int = 100):
+        if workers <= 0 or queue_size <= 0 or batch_size <= 0:
+            raise ValueError("workers、queue_size 與 batch_size 必須大於 0")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+        self._subscriptions: List[_Subscription] = []
+        self._routes: Dict[type, List[_Subscription]] = {}
+        self._queues: List[asyncio.Queue] = []
+        self._has_space: List[asyncio.Condition] = []
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._latency: Dict[str, _LatencyStats] = {}
+        self._counters = dict.fromkeys(("published", "processed", "batches", "handler_errors"), 0)
+        self._started_at = 0.0
+
+    def subscribe(self, event_type: type, handler: Callable, batch: bool = False,
+                  name: Optional[str] = None) -> None:
+        """訂閱事件型別（含子類別，訂閱 DomainEvent 即收到全部事件）；name 為 metrics 中的名稱"""
+        name = name or getattr(handler, '__qualname__', repr(handler))
+        self._subscriptions.append(_Subscription(
+            event_type, handler, name, batch, inspect.iscoroutinefunction(handler)))
+        self._routes.clear()
+        self._latency.setdefault(name, _LatencyStats())
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        # 佇列本身不設上限，queue_size 由 _enqueue 控制，處理器內的發布才能略過它
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._has_space = [asyncio.Condition() for _ in range(self.workers)]
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="event-bus")
+        self._tasks = [asyncio.create_task(self._worker(queue, has_space))
+                       for queue, has_space in zip(self._queues, self._has_space)]
+        self._started_at = perf_counter()
+
+    async def stop(self) -> None:
+        """等佇列中的事件處理完畢後停止；尚未啟動或已停止時不做任何事"""
+        if self._executor is None:
+            return
+        for queue in self._queues:
+            await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown()
+        self._executor = None
+
+    async def __aenter__(self) -> 'DomainEventBus':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def publish(self, events: Iterable[DomainEvent]) -> None:
+        """投遞已提交的事件；分區佇列已滿時等待（背壓）"""
+        for event in events:
+            await self._enqueue(event, None)
+
+    async def deliver(self, events: Iterable[DomainEvent]) -> List[Optional[Exception]]:
+        """投遞並等待處理完成；回傳每個事件第一個失敗處理器的例外，成功為 None"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for event in events:
+            future = loop.create_future()
+            futures.append(future)
+            await self._enqueue(event, future)
+        return list(await asyncio.gather(*futures))
+
+    def metrics(self) -> dict:
+        """吞吐量、佇列深度與各處理器的延遲（毫秒）"""
+        elapsed = perf_counter() - self._started_at if self._started_at else 0.0
+        processed, batches = self._counters["processed"], self._counters["batches"]
+        return {
+            **self._counters,
+            "queue_depth": sum(queue.qsize() for queue in self._queues),
+            "throughput_per_sec": processed / elapsed if elapsed else 0.0,
+            "avg_batch_size": processed / batches if batches else 0.0,
+            "handlers": {name: stats.summary() for name, stats in self._latency.items()},
+        }
+
+    async def _enqueue(self, event: DomainEvent, future: Optional[asyncio.Future]) -> None:
+        if not self._tasks:
+            raise RuntimeError("事件匯流排尚未啟動")
+        partition = hash(getattr(event, 'order_id', None)) % len(self._queues)
+        queue = self._queues[partition]
+        if _dispatching_bus.get() is not self and queue.qsize() >= self.queue_size:
+            async with self._has_space[partition]:
+                await self._has_space[partition].wait_for(
+                    lambda: queue.qsize() < self.queue_size)
+        queue.put_nowait((event, future))
+        self._counters["published"] += 1
+
+    async def _worker(self, queue: asyncio.Queue, has_space: asyncio.Condition) -> None:
+        _dispatching_bus.set(self)
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            async with has_space:
+                has_space.notify_all()
+            try:
+                errors = await self._dispatch([event for event, _ in batch])
+            except Exception as exc:  # 保護 worker：不應發生，發生時整批視為失敗
+                logger.exception("Event dispatch failed")
+                errors = [exc] * len(batch)
+
+            for (_, future), error in zip(batch, errors):
+                if future is not None and not future.done():
+                    future.set_result(error)
+            self._counters["processed"] += len(batch)
+            self._counters["batches"] += 1
+            for _ in batch:
+                queue.task_done()
+
+    def _handlers_for(self, event_type: type) -> List[_Subscription]:
+        subscriptions = self._routes.get(event_type)
+        if subscriptions is None:
+            subscriptions = self._routes[event_type] = [
+                s for s in self._subscriptions if issubclass(event_type, s.event_type)
+            ]
+        return subscriptions
+
+    async def _dispatch(self, events: List[DomainEvent]) -> List[Optional[Exception]]:
+        """把一批事件交給各處理器；每個處理器依原本的順序收到它訂閱的事件"""
+        groups: Dict[_Subscription, List[int]] = {}
+        for index, event in enumerate(events):
+            for subscription in self._handlers_for(type(event)):
+                groups.setdefault(subscription, []).append(index)
+
+        errors: List[Optional[Exception]] = [None] * len(events)
+        for subscription, indexes in groups.items():
+            selected = [events[index] for index in indexes]
+            payloads = [selected] if subscription.batch else selected
+            if subscription.is_async:
+                results = await _call_async(subscription.handler, payloads)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, _call_sync, subscription.handler, payloads)
+
+            stats = self._latency[subscription.name]
+            for elapsed, error in results:
+                stats.observe(elapsed)
+                if error is not None:
+                    self._counters["handler_errors"] += 1
+                    logger.error("Event handler %s failed", subscription.name, exc_info=error)
+            if subscription.batch:
+                results = results * len(indexes)
+            for index, (_, error) in zip(indexes, results):
+                if errors[index] is None:
+                    errors[index] = error
+        return errors
+
+
+class OutboxRelay:
+    """
+    Outbox 轉送：把 outbox 中尚未投遞的事件交給事件匯流排
+
+    事件與 outbox 紀錄在同一個交易內寫入（SQLiteEventStore(outbox=True)），
+    所有處理器都成功後才刪除紀錄；處理器失敗或行程中途停止時，下一輪會重送。
+    因此是 at-least-once 投遞，處理器應以 event_id 去重。
+    同一張訂單的事件依寫入順序逐一投遞，遇到失敗就停止，後面的事件等它重送成功後才投遞；
+    不同訂單的事件同時投遞。
+    失敗 max_attempts 次的紀錄不再重送，留在 outbox 供人工處理，該訂單之後的事件也不再投遞。
+    """
+
+    def __init__(self, store: SQLiteEventStore, bus: DomainEventBus, batch_size: int = 100,
+                 poll_interval: float = 0.5, max_attempts: int = 5):
+        self.store = store
+        self.bus = bus
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+    async def relay_once(self) -> int:
+        """轉送一批事件，回傳成功投遞的數量"""
+        pending = self.store.pending_outbox(self.batch_size, self.max_attempts)
+        if not pending:
+            return 0
+        # 同一張訂單的事件依序投遞；沒有 order_id 的事件各自獨立
+        streams: Dict[object, List[Tuple[int, DomainEvent]]] = {}
+        for position, event in pending:
+            order_id = getattr(event, 'order_id', None)
+            key = position if order_id is None else order_id
+            streams.setdefault(key, []).append((position, event))
+        results = await asyncio.gather(*map(self._relay_stream, streams.values()))
+
+        delivered = [position for positions, _ in results for position in positions]
+        self.store.ack_outbox(delivered)
+        self.store.retry_outbox([failed for _, failed in results if failed is not None])
+        return len(delivered)
+
+    async def _relay_stream(self, stream: List[Tuple[int, DomainEvent]]
+                            ) -> Tuple[List[int], Optional[int]]:
+        """依序投遞同一張訂單的事件，遇到失敗就停止；回傳成功投遞的 position 與失敗的 position"""
+        delivered = []
+        for position, event in stream:
+            [error] = await self.bus.deliver([event])
+            if error is not None:
+                return delivered, position
+            delivered.append(position)
+        return delivered, None
+
+    async def run(self) -> None:
+        """持續轉送（取消 task 即停止）；沒有成功投遞時每 poll_interval 秒檢查一次"""
+        while True:
+            if not await self.relay_once():
+                await asyncio.sleep(self.poll_interval)
+
 
 # ============================================================================
 # 使用範例（Example Usage）
@@ -680,4 +1840,39 @@ if __name__ == "__main__":
     for i, event in enumerate(order.get_domain_events(), 1):
         print(f"   {i}. {event.__class__.__name__} at {event.occurred_at}")
 
+    # 9. 事件溯源：保存事件並重建訂單
+    print("\n9. 事件溯源")
+    repository = EventSourcedOrderRepository(SQLiteEventStore())
+    committed = repository.save(order)
+    restored = repository.get(str(order.order_id))
+    print(f"   已保存事件: {len(committed)} 個")
+    print(f"   重建訂單: {restored.status.value}, 總金額 {restored.total_amount}")
+
+    # 10. 事件匯流排：保存後經由 outbox 非同步投遞
+    print("\n10. 事件匯流排")
+
+    async def run_event_bus():
+        store = SQLiteEventStore(outbox=True)
+        received = []
+
+        async def send_receipt(event: OrderPaid) -> None:
+            received.append(f"收據 {event.payment_id}")
+
+        async with DomainEventBus(workers=2) as bus:
+            bus.subscribe(OrderPaid, send_receipt, name="send_receipt")
+            bus.subscribe(DomainEvent, lambda events: received.append(f"{len(events)} 個事件入帳"),
+                          batch=True)
+            case = OrderItem(item_id=uuid4(), product_id="PROD-003", product_name="手機殼",
+                             quantity=2, unit_price=Money(Decimal('990'), Currency.TWD))
+            another = Order.create("CUST-12345", [case], address)
+            another.pay(payment_id="PAY-67891")
+            EventSourcedOrderRepository(store).save(another)
+            delivered = await OutboxRelay(store, bus).relay_once()
+        return delivered, received, bus.metrics()
+
+    delivered, received, metrics = asyncio.run(run_event_bus())
+    print(f"   已投遞: {delivered} 個事件 {received}")
+    print(f"   批次: {metrics['batches']} 批, "
+          f"處理器延遲 p95: {metrics['handlers']['send_receipt']['p95_ms']:.3f} ms")
+
     print("\n=== 範例完成 ===")